@@ -1,40 +1,130 @@
 from datetime import datetime, timedelta, date as dt_date
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
+from flask import Flask, Response, render_template, request, redirect, url_for, flash, jsonify, make_response, session, stream_with_context, has_request_context
 from flask_sqlalchemy import SQLAlchemy
+from markupsafe import Markup
 from flask_login import LoginManager, UserMixin, login_user, logout_user, current_user, login_required
-from flask_migrate import Migrate
-from werkzeug.security import generate_password_hash, check_password_hash
-from wtforms import StringField, PasswordField, BooleanField, SelectField
-from wtforms.validators import DataRequired, Email, Length, EqualTo
+from sqlalchemy import and_, func, inspect, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, make_transient_to_detached, object_session
+from wtforms import StringField, PasswordField, BooleanField, SelectField, TimeField
+from wtforms.validators import DataRequired, Email, Length, EqualTo, Optional
 import os
 import json
+import base64
+import hashlib
+import io
 import logging
+import click
+import time
+from collections import Counter
+from functools import wraps
+from heapq import merge
+from itertools import groupby
 from dotenv import load_dotenv
+from werkzeug.exceptions import RequestEntityTooLarge
+from history import HabitHistory
+import periods
+from user_cache import UserCache
+from metrics import Metrics
+from fragment_cache import FragmentCache
+from write_behind import WriteBehind
+from passwords import PasswordHasher, PasswordHasherBusy
+from reminders import Reminders
+from assets import Assets
+import assets
+import reminders
+import rollups
+import archive
+import export
+import importer
+from logging_setup import configure_logging
+import database
 load_dotenv()  # Загрузка переменных окружения
 
-# Настройка логирования
-logging.basicConfig(level=logging.DEBUG)
-
 # Инициализация расширений
-db = SQLAlchemy()
-migrate = Migrate()
+db = SQLAlchemy(session_options={'class_': database.RoutingSession})
 login_manager = LoginManager()
+user_cache = UserCache()
+metrics = Metrics()
+fragment_cache = FragmentCache()
+write_behind = WriteBehind()
+password_hasher = PasswordHasher()
+reminder_service = Reminders()
+asset_manifest = Assets()
 
 def create_app():
     app = Flask(__name__)
     
     # Конфигурация приложения
     app.config.from_prefixed_env()
+    # Настройка логирования: INFO по умолчанию, JSON-записи пишутся фоновым потоком
+    app.config.setdefault('LOG_LEVEL', os.environ.get('LOGGING_LEVEL', 'INFO'))
+    app.config.setdefault('LOG_FORMAT', 'json')  # json или text
+    app.config.setdefault('LOG_FILE', None)  # по умолчанию stderr
+    configure_logging(app.config['LOG_LEVEL'], app.config['LOG_FORMAT'], app.config['LOG_FILE'])
+    # Создание таблиц и администратора при старте — только для локальной разработки;
+    # в продакшене схемой управляет Alembic (flask db upgrade), данные — flask seed-admin
+    app.config.setdefault('INIT_DB_ON_STARTUP', False)
+    # Импорт истории: максимальный размер файла и строк на одну транзакцию
+    app.config.setdefault('IMPORT_MAX_BYTES', 32 * 1024 * 1024)
+    app.config.setdefault('IMPORT_BATCH_SIZE', 1000)
+    # Предел тела запроса — самый большой запрос приложения это импорт. Werkzeug
+    # проверяет его и для потоковых загрузок без Content-Length (chunked)
+    app.config.setdefault('MAX_CONTENT_LENGTH', app.config['IMPORT_MAX_BYTES'] + 64 * 1024)
+    # Горизонт горячей истории: годы, закончившиеся раньше, compact-history переносит в архив.
+    # Не короче окна календаря — иначе панель читала бы архив
+    app.config['HISTORY_HOT_DAYS'] = max(int(app.config.get('HISTORY_HOT_DAYS', archive.DEFAULT_HOT_DAYS)),
+                                         CALENDAR_HOT_DAYS)
     app.config.update({
         'SQLALCHEMY_DATABASE_URI': os.environ.get('DATABASE_URL'),
         'SECRET_KEY': os.environ.get('SECRET_KEY'),
         'SQLALCHEMY_TRACK_MODIFICATIONS': False
     })
+    # Пул соединений на воркер; с PgBouncer (DB_PGBOUNCER) пул держит он, а не приложение
+    app.config.setdefault('DB_POOL_SIZE', 5)
+    app.config.setdefault('DB_MAX_OVERFLOW', 10)
+    app.config.setdefault('DB_POOL_TIMEOUT', 30)
+    app.config.setdefault('DB_POOL_RECYCLE', 1800)  # секунды; -1 — без пересоздания
+    app.config.setdefault('DB_POOL_PRE_PING', True)
+    app.config.setdefault('DB_PGBOUNCER', False)
+    # Реплика для чтения: dashboard, API и выгрузки; после записи пользователь
+    # DB_REPLICA_STICKY_SECONDS читает с основной базы, чтобы не увидеть отставание
+    app.config.setdefault('DATABASE_REPLICA_URL', os.environ.get('DATABASE_REPLICA_URL'))
+    app.config.setdefault('DB_REPLICA_STICKY_SECONDS', 5)
+    if app.config['SQLALCHEMY_DATABASE_URI']:
+        app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS',
+                              database.engine_options(app.config['SQLALCHEMY_DATABASE_URI'], app.config))
+    if app.config['DATABASE_REPLICA_URL']:
+        app.config.setdefault('SQLALCHEMY_BINDS', {}).setdefault(database.REPLICA_BIND, {
+            'url': app.config['DATABASE_REPLICA_URL'],
+            **database.engine_options(app.config['DATABASE_REPLICA_URL'], app.config)
+        })
     
     # Инициализация расширений
     db.init_app(app)
-    migrate.init_app(app, db)
+    with app.app_context():
+        database.dispose_after_fork(db.engines.values())
+    # Flask-Migrate тянет за собой alembic, а нужен только командам flask db
+    if os.environ.get('FLASK_RUN_FROM_CLI') == 'true':
+        from flask_migrate import Migrate
+        Migrate(app, db)
     login_manager.init_app(app)
+    user_cache.init_app(app)
+    fragment_cache.init_app(app)
+    write_behind.init_app(app)
+    password_hasher.init_app(app)
+    reminder_service.init_app(app)
+    asset_manifest.init_app(app)
+    metrics.init_app(app)
+    metrics.register_collector(lambda: database.pool_metrics(db.engines))
+    for prefix, title, cache in (('user_cache', 'Кэш пользователей', user_cache),
+                                 ('fragment_cache', 'Кэш фрагментов', fragment_cache),
+                                 ('write_behind', 'Отложенная запись', write_behind),
+                                 ('password_hash', 'Хеширование паролей', password_hasher)):
+        metrics.register_collector(lambda prefix=prefix, title=title, cache=cache: [
+            (f'{prefix}_{name}', 'gauge' if name in ('size', 'pending') else 'counter', f'{title}: {name}', value)
+            for name, value in cache.stats().items()
+        ])
     
     # Настройка аутентификации
     login_manager.login_view = 'login'
@@ -49,20 +139,28 @@ def create_app():
         }
         return frequency_map.get(freq, freq)
     
-    def format_tooltip(date_str, habit):
-        try:
-            date_obj = dt_date.fromisoformat(date_str)
-            status_map = {
-                'completed': '✅ Выполнено',
-                'missed': '❌ Пропущено',
-                'current': '🕒 Сегодня'
-            }
-            return f"{date_obj.strftime('%d %B %Y')}\n{status_map.get(habit.progress.get(date_str, 'current'))}"
-        except ValueError:
-            return "Неверный формат даты"
+    def period_label(period, habit):
+        """Подпись ячейки календаря: день, неделя или месяц"""
+        start, end = period.start, period.end
+        if habit.period == 'weekly':
+            return f"{start.strftime('%d.%m')} — {end.strftime('%d.%m.%Y')}"
+        if habit.period == 'monthly':
+            return f"{MONTH_NAMES[start.month - 1]} {start.year}"
+        return f"{start.day:02d} {MONTH_NAMES_GENITIVE[start.month - 1]} {start.year}"
+
+    def format_tooltip(period, habit):
+        status_map = {
+            'completed': '✅ Выполнено',
+            'missed': '❌ Пропущено',
+            'current': '🕒 Сегодня' if habit.period == 'daily' else '🕒 Текущий период',
+            'future': '',
+            'inactive': 'Привычка ещё не создана'
+        }
+        return f"{period_label(period, habit)}\n{status_map[period.status]}".strip()
 
     app.jinja_env.filters.update({
         'ru_frequency': ru_frequency,
+        'period_label': period_label,
         'format_tooltip': format_tooltip
     })
 
@@ -70,22 +168,10 @@ def create_app():
     @app.context_processor
     def inject_utilities():
         def generate_calendar(habit):
-            today = dt_date.today()
-            start_date = max(
-                habit.created_at.date(),
-                today - timedelta(days=14)  # Показываем 2 недели назад от текущей даты
-            )
-        
-            calendar_days = []
-            for i in range(30):  # Всего 30 дней в календаре
-                current_date = start_date + timedelta(days=i)
-                status = 'future' if current_date > today else (
-                    'completed' if habit.progress.get(current_date.isoformat(), False)
-                    else 'current' if current_date == today
-                    else 'missed'
-                )
-                calendar_days.append((current_date.isoformat(), status))
-            return calendar_days
+            """Ячейки календаря привычки (periods.Period); подгружает данные, если view не сделал этого заранее"""
+            if getattr(habit, 'calendar', None) is None:
+                load_calendars([habit], dt_date.today())
+            return habit.calendar
 
         def is_future_date(date_str):
             try:
@@ -100,52 +186,1050 @@ def create_app():
             'current_year': datetime.utcnow().year
         }
 
-    # Инициализация базы данных
-    with app.app_context():
-        db.create_all()
-        # Пример добавления начальных данных
-        if not User.query.filter_by(email='admin@example.com').first():
-            admin = User(email='admin@example.com')
-            admin.set_password('securepassword')
-            db.session.add(admin)
-            db.session.commit()
-            logging.info("Создан администратор с email: admin@example.com")
+    # Версия разметки для ETag панели: меняется при изменении шаблонов и сборки статики
+    app.config.setdefault('DASHBOARD_RENDER_VERSION', '-'.join(
+        part for part in (templates_digest(app), asset_manifest.version) if part))
+
+    # Инициализация базы данных (режим разработки)
+    if app.config['INIT_DB_ON_STARTUP']:
+        with app.app_context():
+            db.create_all()
+            # Пример добавления начальных данных: пароль известен всем, поэтому без прав
+            # администратора — их выдают только flask seed-admin и flask grant-admin
+            seed_admin('admin@example.com', 'securepassword', is_admin=False)
 
     return app
 
+def templates_digest(app):
+    """Короткий хеш содержимого каталога шаблонов"""
+    digest = hashlib.sha1()
+    folder = os.path.join(app.root_path, app.template_folder)
+    for name in sorted(os.listdir(folder)):
+        with open(os.path.join(folder, name), 'rb') as f:
+            digest.update(name.encode() + f.read())
+    return digest.hexdigest()[:12]
+
+def seed_admin(email, password, is_admin=True):
+    """Создаёт учётную запись (при is_admin — с правами администратора), если её ещё нет; возвращает True, если создана"""
+    if User.query.filter_by(email=email).first():
+        return False
+    admin = User(email=email, is_admin=is_admin)
+    admin.set_password(password)
+    db.session.add(admin)
+    db.session.commit()
+    logging.info("Создана учётная запись%s с email: %s", ' администратора' if is_admin else '', email)
+    return True
+
 # Модели
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(100), unique=True)
     password_hash = db.Column(db.String(256))
+    # Увеличивается при любом изменении привычек пользователя (ETag панели)
+    dashboard_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    is_admin = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
     habits = db.relationship('Habit', backref='user', lazy='dynamic')
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        """Проверяет пароль; хеш с устаревшими параметрами пересчитывается (изменение нужно сохранить)"""
+        if not password_hasher.verify(self.password_hash, password):
+            return False
+        if password_hasher.needs_rehash(self.password_hash):
+            self.set_password(password)
+            password_hasher.rehashed()
+            logging.info("Хеш пароля пользователя %s пересчитан с новыми параметрами", self.email)
+        return True
+
+    # Колонки, которые кэшируются для Flask-Login (хеш пароля в кэш не попадает)
+    CACHED_FIELDS = ('id', 'email')
+
+    def cache_identity(self):
+        return {field: getattr(self, field) for field in self.CACHED_FIELDS}
+
+    @classmethod
+    def from_cache(cls, values):
+        """Восстанавливает пользователя из кэша и присоединяет к сессии без запроса к БД.
+
+        Некэшированные колонки загрузятся из базы при первом обращении.
+        """
+        user = cls(**values)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+
+# Сброс кэша пользователей после фиксации изменений (смена пароля, удаление)
+@db.event.listens_for(User, 'after_update')
+@db.event.listens_for(User, 'after_delete')
+def _queue_user_invalidation(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('invalidated_users', set()).add(target.id)
+
+@db.event.listens_for(Session, 'after_commit')
+def _invalidate_cached_users(session):
+    for user_id in session.info.pop('invalidated_users', ()):
+        user_cache.invalidate(user_id)
+
+@db.event.listens_for(Session, 'after_soft_rollback')
+def _discard_user_invalidation(session, previous_transaction):
+    session.info.pop('invalidated_users', None)
 
 class Habit(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100))
     frequency = db.Column(db.String(20))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    progress = db.Column(db.JSON, default=dict)  # Исправлено на dict
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
-    
+    checkins = db.relationship('CheckIn', backref='habit', lazy='dynamic', passive_deletes=True)
+
+    # Агрегаты, поддерживаемые при каждом переключении (см. apply_checkin)
+    completed_days = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    tracked_days = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    current_streak = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Серия, заканчивающаяся в last_checkin_on
+    longest_streak = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    last_checkin_on = db.Column(db.Date)  # Последний выполненный день
+    # Те же агрегаты в периодах недельных и месячных привычек (см. apply_period_checkin);
+    # у ежедневных периоды совпадают с днями, колонки не заполняются
+    completed_periods = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    period_streak = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Серия, заканчивающаяся в last_period
+    longest_period_streak = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    last_period = db.Column(db.Integer)  # Номер последнего выполненного периода (periods.period_index)
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Ключ кэша карточки
+    # Напоминание: время суток (UTC) и момент ближайшей отправки (см. reminders)
+    reminder_time = db.Column(db.Time)
+    next_reminder_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        # Частичный индекс: в нём только привычки с напоминаниями, планировщик читает наступившие
+        db.Index('ix_habit_next_reminder_at', 'next_reminder_at',
+                 postgresql_where=db.text('next_reminder_at IS NOT NULL'),
+                 sqlite_where=db.text('next_reminder_at IS NOT NULL')),
+    )
+
+    def touch(self):
+        """Отмечает изменение отображаемых данных привычки"""
+        self.version = (self.version or 0) + 1
+
+    def set_reminder(self, reminder_time, now):
+        """Включает (время суток) или выключает (None) напоминание и назначает ближайшее"""
+        self.reminder_time = reminder_time
+        self.next_reminder_at = None if reminder_time is None else reminders.next_reminder(self.frequency, reminder_time, now)
+
     def reset_progress(self):
-        self.progress = {}
+        CheckIn.query.filter_by(habit_id=self.id).delete(synchronize_session=False)
+        CheckInArchive.query.filter_by(habit_id=self.id).delete(synchronize_session=False)
         self.created_at = datetime.utcnow()
+        self.completed_days = self.tracked_days = 0
+        self.current_streak = self.longest_streak = 0
+        self.last_checkin_on = None
+        self.completed_periods = self.period_streak = self.longest_period_streak = 0
+        self.last_period = None
+        self.touch()
+
+    def streak_as_of(self, today):
+        """Текущая серия: обнуляется, если вчера и сегодня привычка не выполнялась"""
+        if self.last_checkin_on is None or self.last_checkin_on < today - timedelta(days=1):
+            return 0
+        return self.current_streak
+
+    def apply_checkin(self, day, previous, completed, pending=None):
+        """Обновляет агрегаты после изменения отметки за day (previous=None — отметки не было).
+
+        Типичный случай — отметка последнего дня — обрабатывается за O(1)
+        (у недельных и месячных привычек — с чтением отметок одного периода);
+        правка истории в прошлом пересчитывает серии через recalculate_stats.
+        pending — ещё не записанные в базу отметки {день: значение} для пересчёта.
+        """
+        if previous is None:
+            self.tracked_days += 1
+        self.completed_days += int(completed) - int(bool(previous))
+        if bool(previous) == completed:
+            return
+
+        last = self.last_checkin_on
+        if completed and (last is None or day > last):
+            # Продление серии или начало новой
+            self.current_streak = self.current_streak + 1 if last == day - timedelta(days=1) else 1
+            self.last_checkin_on = day
+            self.longest_streak = max(self.longest_streak, self.current_streak)
+        elif not completed and day == last and 1 < self.current_streak < self.longest_streak:
+            # Укорачивание текущей серии, которая не является рекордной
+            self.current_streak -= 1
+            self.last_checkin_on = day - timedelta(days=1)
+        else:
+            self.recalculate_stats(counters=False, pending=pending)
+            return
+        if self.period in periods.PERIODIC and not self.apply_period_checkin(day, completed, pending):
+            self.recalculate_stats(counters=False, pending=pending)
+
+    def apply_period_checkin(self, day, completed, pending=None):
+        """Обновляет агрегаты периодов после изменения выполнения дня day.
+
+        Читаются отметки только недели или месяца, в которые попадает день.
+        Возвращает False, если серии нужно пересчитать по всей истории.
+        """
+        index = periods.period_index(day, self.period)
+        if index < periods.period_index(self.created_at.date(), self.period):
+            return True  # Периоды до создания привычки не считаются
+        start, end = periods.period_bounds(index, self.period)
+        others = load_histories([self.id], start, end)[self.id]
+        for other, value in (pending or {}).items():
+            if start <= other <= end:
+                others.set(other, value)
+        others.set(day, False)
+        if others:
+            return True  # Период выполнен другими днями и до, и после изменения
+
+        self.completed_periods += 1 if completed else -1
+        last = self.last_period
+        if completed and (last is None or index > last):
+            self.period_streak = self.period_streak + 1 if last == index - 1 else 1
+            self.last_period = index
+            self.longest_period_streak = max(self.longest_period_streak, self.period_streak)
+        elif not completed and index == last and 1 < self.period_streak < self.longest_period_streak:
+            self.period_streak -= 1
+            self.last_period = index - 1
+        else:
+            return False
+        return True
+
+    def load_history(self, start=None, end=None):
+        """Выполненные дни привычки в виде битовой карты HabitHistory (с архивом)"""
+        return load_histories([self.id], start, end)[self.id]
+
+    def recalculate_stats(self, counters=True, pending=None):
+        """Полный пересчёт агрегатов по check_in и архиву (для ремонта и правки истории)"""
+        history = self.load_history()
+        for day, completed in (pending or {}).items():
+            history.set(day, completed)
+        if counters:
+            self.completed_days = history.count()
+            self.tracked_days = count_tracked_days(self.id)
+        self.last_checkin_on = history.last_day()
+        self.current_streak = history.current_run(self.last_checkin_on) if history else 0
+        self.longest_streak = history.longest_run()
+        runs = periods.period_runs(history, self.period, self.created_at.date()) \
+            if self.period in periods.PERIODIC else periods.PeriodRuns(0, None, 0, 0)
+        self.completed_periods, self.last_period, self.period_streak, self.longest_period_streak = runs
+
+    @property
+    def period(self):
+        """Частота для расчёта периодов; неизвестные значения считаются ежедневными"""
+        return self.frequency if self.frequency in periods.FREQUENCIES else 'daily'
+
+    def period_summary(self, today):
+        """Выполнение и серии по периодам частоты привычки (periods.PeriodStats) — по агрегатам, без чтения истории"""
+        if self.period not in periods.PERIODIC:
+            return periods.PeriodStats(
+                self.completed_days, max((today - self.created_at.date()).days + 1, 0),
+                self.streak_as_of(today), self.longest_streak, self.last_checkin_on == today
+            )
+        runs = periods.PeriodRuns(self.completed_periods, self.last_period, self.period_streak, self.longest_period_streak)
+        return periods.period_stats(runs, self.period, self.created_at.date(), today)
+
+    def stats(self, today=None):
+        """Агрегаты привычки для JSON-ответов; серии и выполнение — в периодах её частоты"""
+        today = today or dt_date.today()
+        summary = self.period_summary(today)
+        return {
+            'completed_days': self.completed_days,
+            'total_days': self.tracked_days,
+            'completed_periods': summary.completed_periods,
+            'total_periods': summary.total_periods,
+            'current_streak': summary.current_streak,
+            'longest_streak': summary.longest_streak,
+            'period_completed': summary.period_completed
+        }
+
+class CheckIn(db.Model):
+    """Отметка привычки за один день: одна строка на пару (habit_id, day)"""
+    __tablename__ = 'check_in'
+    habit_id = db.Column(db.Integer, db.ForeignKey('habit.id', ondelete='CASCADE'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    completed = db.Column(db.Boolean, nullable=False, default=True)
+
+class CheckInArchive(db.Model):
+    """Сжатые отметки привычки за год старше горизонта горячей истории (см. archive)"""
+    __tablename__ = 'check_in_archive'
+    habit_id = db.Column(db.Integer, db.ForeignKey('habit.id', ondelete='CASCADE'), primary_key=True)
+    year = db.Column(db.Integer, primary_key=True)
+    data = db.Column(db.LargeBinary, nullable=False)
+
+# Агрегаты для аналитики (см. rollups)
+class DailyRollup(db.Model):
+    """Выполненные отметки и число привычек за день для одной частоты"""
+    __tablename__ = 'rollup_day'
+    day = db.Column(db.Date, primary_key=True)
+    frequency = db.Column(db.String(20), primary_key=True)
+    checkins = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    habits = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Снимок flask rollup-catch-up
+
+class ActivityRollup(db.Model):
+    """Выполненные отметки пользователя за день или месяц (scope) — для счёта активных"""
+    __tablename__ = 'rollup_activity'
+    scope = db.Column(db.String(5), primary_key=True)
+    start = db.Column(db.Date, primary_key=True)
+    user_id = db.Column(db.Integer, primary_key=True)  # Без внешнего ключа: история переживает удаление
+    checkins = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+class ActiveUsersRollup(db.Model):
+    """Число пользователей с выполненными отметками за день или месяц"""
+    __tablename__ = 'rollup_active'
+    scope = db.Column(db.String(5), primary_key=True)
+    start = db.Column(db.Date, primary_key=True)
+    active_users = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+class RollupDirty(db.Model):
+    """День, агрегаты которого нужно пересчитать из check_in"""
+    __tablename__ = 'rollup_dirty'
+    day = db.Column(db.Date, primary_key=True)
+
+# Уровни истории (см. archive)
+def hot_history_start(today=None):
+    """Первый день, начиная с которого история целиком лежит в check_in"""
+    return archive.hot_start(today or dt_date.today(), app.config['HISTORY_HOT_DAYS'])
+
+def load_histories(habit_ids, start=None, end=None):
+    """Выполненные дни привычек за [start, end] из обоих уровней: {habit_id: HabitHistory}.
+
+    Архив читается, только если период начинается раньше горячей истории, —
+    окно календаря обходится одним запросом по диапазону check_in.
+    """
+    years = {habit_id: {} for habit_id in habit_ids}
+    if not years:
+        return {}
+    archived = set()
+    if start is None or start < hot_history_start():
+        query = db.session.query(CheckInArchive.habit_id, CheckInArchive.year, CheckInArchive.data).filter(
+            CheckInArchive.habit_id.in_(years.keys())
+        )
+        if start:
+            query = query.filter(CheckInArchive.year >= start.year)
+        if end:
+            query = query.filter(CheckInArchive.year <= end.year)
+        for habit_id, year, data in query:
+            years[habit_id][year] = archive.decode(year, data, start, end)[0]
+            archived.add(habit_id)
+    histories = {habit_id: HabitHistory(bits) for habit_id, bits in years.items()}
+
+    query = db.session.query(CheckIn.habit_id, CheckIn.day, CheckIn.completed).filter(CheckIn.habit_id.in_(years.keys()))
+    if start:
+        query = query.filter(CheckIn.day >= start)
+    if end:
+        query = query.filter(CheckIn.day <= end)
+    if not archived:
+        query = query.filter(CheckIn.completed)
+    for habit_id, day, completed in query:
+        # Строка check_in важнее архива: снятая отметка архивного года его перекрывает
+        histories[habit_id].set(day, completed)
+    return histories
+
+def count_tracked_days(habit_id):
+    """Число отмеченных дней привычки (включая снятые отметки) в check_in и архиве"""
+    hot = db.session.query(CheckIn.day).filter_by(habit_id=habit_id)
+    tracked = HabitHistory({
+        year: archive.decode(year, data)[1]
+        for year, data in db.session.query(CheckInArchive.year, CheckInArchive.data).filter_by(habit_id=habit_id)
+    })
+    if not tracked:
+        return hot.count()
+    last = dt_date(tracked.last_day().year, 12, 31)
+    for day, in hot.filter(CheckIn.day <= last):
+        tracked.set(day)
+    return tracked.count() + hot.filter(CheckIn.day > last).count()
+
+def archived_checkin(habit_id, day):
+    """Значение отметки дня из архива или None, если в архиве её нет"""
+    data = db.session.query(CheckInArchive.data).filter_by(habit_id=habit_id, year=day.year).scalar()
+    for _, completed in archive.archived_days(day.year, data, day, day) if data is not None else ():
+        return completed
+    return None
+
+# Окно календаря: 2 недели назад от текущей даты (отметки в будущем невозможны)
+CALENDAR_LOOKBACK_DAYS = 14
+
+def load_progress_window(habits, start, end):
+    """Загружает выполненные дни за период [start, end] для всех привычек одним запросом по диапазону.
+
+    Результат сохраняется в habit.recent_progress как битовая карта HabitHistory.
+    """
+    habits = list(habits)
+    windows = load_histories([habit.id for habit in habits], start, end)
+    for habit in habits:
+        habit.recent_progress = windows[habit.id]
+    return windows
+
+# Раскладка календаря по частоте: (периодов до текущего, всего ячеек)
+CALENDAR_PERIODS = {
+    'daily': (CALENDAR_LOOKBACK_DAYS, 30),
+    'weekly': (8, 12),
+    'monthly': (8, 12),
+}
+
+# Сколько дней до сегодня может захватывать окно календаря (месяц — не длиннее 31 дня).
+# Горизонт горячей истории не короче: панель не читает архив
+CALENDAR_HOT_DAYS = max(CALENDAR_LOOKBACK_DAYS, 7 * (CALENDAR_PERIODS['weekly'][0] + 1),
+                        31 * (CALENDAR_PERIODS['monthly'][0] + 1))
+
+MONTH_NAMES = ('Январь', 'Февраль', 'Март', 'Апрель', 'Май', 'Июнь',
+               'Июль', 'Август', 'Сентябрь', 'Октябрь', 'Ноябрь', 'Декабрь')
+MONTH_NAMES_GENITIVE = ('января', 'февраля', 'марта', 'апреля', 'мая', 'июня',
+                        'июля', 'августа', 'сентября', 'октября', 'ноября', 'декабря')
+
+def calendar_window(habit, today):
+    """Номер первого периода календаря и количество ячеек.
+
+    Ежедневный календарь начинается не раньше дня создания привычки;
+    недельный и месячный показывают фиксированное окно, периоды до создания — inactive.
+    """
+    lookback, length = CALENDAR_PERIODS[habit.period]
+    first = periods.period_index(today, habit.period) - lookback
+    if habit.period == 'daily':
+        first = max(first, habit.created_at.date().toordinal())
+    return first, length
+
+def load_calendars(habits, today):
+    """Календари всех привычек (habit.calendar): окна отметок читаются одним запросом на частоту"""
+    windows = {habit.id: calendar_window(habit, today) for habit in habits}
+    by_period = {}
+    for habit in habits:
+        by_period.setdefault(habit.period, []).append(habit)
+    for period, group in by_period.items():
+        start = min(periods.period_bounds(windows[habit.id][0], period)[0] for habit in group)
+        load_progress_window(group, start, today)
+    for habit in habits:
+        habit.calendar = periods.calendar_periods(
+            habit.recent_progress, habit.period, habit.created_at.date(), today, *windows[habit.id]
+        )
+
+def _upsert_checkin(habit_id, day, completed=None):
+    """Записывает отметку одной строкой INSERT ... ON CONFLICT — без агрегатов привычки (см. set_checkin).
+
+    При completed=None статус переключается атомарно на стороне БД,
+    поэтому параллельные клики не перезаписывают друг друга.
+    Возвращает новый статус.
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        stmt = insert(CheckIn).values(
+            habit_id=habit_id,
+            day=day,
+            completed=True if completed is None else completed
+        )
+        new_value = ~CheckIn.completed if completed is None else stmt.excluded.completed
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[CheckIn.habit_id, CheckIn.day],
+            set_={'completed': new_value}
+        ).returning(CheckIn.completed)
+        return db.session.execute(stmt).scalar_one()
+
+    # Прочие СУБД: блокирующее чтение и обновление строки
+    checkin = CheckIn.query.filter_by(habit_id=habit_id, day=day).with_for_update().first()
+    if checkin is None:
+        checkin = CheckIn(habit_id=habit_id, day=day, completed=True if completed is None else completed)
+        db.session.add(checkin)
+    else:
+        checkin.completed = (not checkin.completed) if completed is None else completed
+    db.session.flush()
+    return checkin.completed
+
+def upsert_checkins(rows):
+    """Пакетная запись отметок [{habit_id, day, completed}] одним INSERT ... ON CONFLICT.
+
+    Пары (habit_id, day) в пакете должны быть уникальны.
+    """
+    if not rows:
+        return
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        stmt = insert(CheckIn)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[CheckIn.habit_id, CheckIn.day],
+            set_={'completed': stmt.excluded.completed}
+        )
+        db.session.execute(stmt, rows)
+        return
+
+    # Прочие СУБД: merge по первичному ключу
+    for row in rows:
+        db.session.merge(CheckIn(**row))
+    db.session.flush()
+
+def set_checkin(habit, day, completed=None):
+    """Устанавливает (или при completed=None переключает) отметку и обновляет агрегаты привычки.
+
+    Вызывающий код должен держать блокировку строки привычки (with_for_update),
+    чтобы параллельные переключения одной привычки выполнялись последовательно.
+    """
+    previous = db.session.query(CheckIn.completed).filter_by(habit_id=habit.id, day=day).scalar()
+    if previous is None and day < hot_history_start():
+        previous = archived_checkin(habit.id, day)
+    new_status = (not previous) if completed is None else completed
+    if previous is not None and previous == new_status:
+        return new_status
+    _upsert_checkin(habit.id, day, new_status)
+    habit.apply_checkin(day, previous, new_status)
+    habit.touch()
+    record_rollup_delta(habit, day, previous, new_status)
+    return new_status
+
+# Агрегаты аналитики (см. rollups)
+def rollup_insert(session):
+    """insert() с ON CONFLICT для СУБД сессии (PostgreSQL или SQLite)"""
+    return postgresql.insert if session.get_bind().dialect.name == 'postgresql' else sqlite.insert
+
+def record_rollup_delta(habit, day, previous, completed):
+    """Учитывает изменение отметки в агрегатах; запись — перед фиксацией транзакции"""
+    delta = int(completed) - int(bool(previous))
+    if delta:
+        deltas = db.session.info.setdefault('rollup_deltas', rollups.RollupDeltas())
+        deltas.add(day, habit.frequency, habit.user_id, delta)
+
+def apply_rollup_deltas(session, deltas):
+    """Прибавляет накопленные изменения к агрегатам; строки обновляются в порядке ключа,
+    чтобы параллельные транзакции блокировали их в одном порядке"""
+    insert = rollup_insert(session)
+    rows = [{'day': day, 'frequency': frequency, 'checkins': delta}
+            for (day, frequency), delta in sorted(deltas.checkins.items()) if delta]
+    if rows:
+        stmt = insert(DailyRollup)
+        session.execute(stmt.on_conflict_do_update(
+            index_elements=[DailyRollup.day, DailyRollup.frequency],
+            set_={'checkins': DailyRollup.checkins + stmt.excluded.checkins}
+        ), rows)
+    active = {}
+    for (scope, start, user_id), delta in sorted(deltas.activity.items()):
+        if not delta:
+            continue
+        stmt = insert(ActivityRollup).values(scope=scope, start=start, user_id=user_id, checkins=delta)
+        total = session.execute(stmt.on_conflict_do_update(
+            index_elements=[ActivityRollup.scope, ActivityRollup.start, ActivityRollup.user_id],
+            set_={'checkins': ActivityRollup.checkins + delta}
+        ).returning(ActivityRollup.checkins)).scalar_one()
+        # Пользователь стал активным (было 0, стало больше) или перестал им быть
+        change = int(total > 0) - int(total - delta > 0)
+        if change:
+            active[scope, start] = active.get((scope, start), 0) + change
+    rows = [{'scope': scope, 'start': start, 'active_users': change}
+            for (scope, start), change in sorted(active.items()) if change]
+    if rows:
+        stmt = insert(ActiveUsersRollup)
+        session.execute(stmt.on_conflict_do_update(
+            index_elements=[ActiveUsersRollup.scope, ActiveUsersRollup.start],
+            set_={'active_users': ActiveUsersRollup.active_users + stmt.excluded.active_users}
+        ), rows)
+
+@db.event.listens_for(Session, 'before_commit')
+def _apply_rollup_deltas(session):
+    deltas = session.info.pop('rollup_deltas', None)
+    if deltas:
+        apply_rollup_deltas(session, deltas)
+
+@db.event.listens_for(Session, 'after_soft_rollback')
+def _discard_rollup_deltas(session, previous_transaction):
+    session.info.pop('rollup_deltas', None)
+
+def mark_rollup_days(days):
+    """Помечает дни для пересчёта агрегатов заданием rollup-catch-up"""
+    days = sorted(set(days))
+    if days:
+        stmt = rollup_insert(db.session)(RollupDirty).on_conflict_do_nothing()
+        db.session.execute(stmt, [{'day': day} for day in days])
+
+def habit_counts(start, end):
+    """Число привычек каждой частоты, созданных не позже дня: {(день, частота): n} за [start, end]"""
+    created = {}
+    for frequency, day, count in db.session.query(
+        Habit.frequency, func.date(Habit.created_at), func.count()
+    ).filter(Habit.frequency.isnot(None)).group_by(Habit.frequency, func.date(Habit.created_at)):
+        created.setdefault(frequency, []).append((dt_date.fromisoformat(str(day)), count))
+    counts = {}
+    for frequency, days in created.items():
+        days.sort()
+        total = sum(count for day, count in days if day < start)
+        pending = [(day, count) for day, count in days if day >= start]
+        day = start
+        while day <= end:
+            while pending and pending[0][0] <= day:
+                total += pending.pop(0)[1]
+            counts[day, frequency] = total
+            day += timedelta(days=1)
+    return counts
+
+def snapshot_habit_counts(start, end):
+    """Записывает число привычек за дни [start, end], не трогая счётчики отметок"""
+    rows = [{'day': day, 'frequency': frequency, 'habits': count}
+            for (day, frequency), count in sorted(habit_counts(start, end).items())]
+    if rows:
+        stmt = rollup_insert(db.session)(DailyRollup)
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=[DailyRollup.day, DailyRollup.frequency],
+            set_={'habits': stmt.excluded.habits}
+        ), rows)
+
+def archived_checkin_counts(start, end):
+    """Выполненные отметки архива за [start, end]: Counter {(день, user_id, частота): n}"""
+    counts = Counter()
+    for year in range(start.year, end.year + 1):
+        # Дни архива, записанные с тех пор в check_in, считаются по check_in
+        overrides = set(db.session.query(CheckIn.habit_id, CheckIn.day).join(
+            CheckInArchive, and_(CheckInArchive.habit_id == CheckIn.habit_id, CheckInArchive.year == year)
+        ).filter(CheckIn.day.between(start, end)))
+        for habit_id, data, user_id, frequency in db.session.query(
+            CheckInArchive.habit_id, CheckInArchive.data, Habit.user_id, Habit.frequency
+        ).join(Habit, Habit.id == CheckInArchive.habit_id).filter(CheckInArchive.year == year):
+            for day, completed in archive.archived_days(year, data, start, end):
+                if completed and (habit_id, day) not in overrides:
+                    counts[day, user_id, frequency] += 1
+    return counts
+
+def recompute_rollups(start, end, batch_size=5000):
+    """Пересчитывает агрегаты за дни [start, end] из check_in и архива.
+
+    Дневные строки диапазона перезаписываются, месячные затронутых месяцев
+    собираются заново из дневных. Отметки, переключённые во время пересчёта
+    того же дня, могут в нём не учесться — их исправит повторный пересчёт.
+    """
+    DailyRollup.query.filter(DailyRollup.day.between(start, end)).delete(synchronize_session=False)
+    for model in (ActivityRollup, ActiveUsersRollup):
+        model.query.filter(model.scope == rollups.DAY, model.start.between(start, end)).delete(synchronize_session=False)
+
+    habits = habit_counts(start, end)
+    # Один проход по check_in, разбитый на месяцы; к каждому месяцу добавляется архив
+    hot = groupby(db.session.query(CheckIn.day, Habit.user_id, Habit.frequency, func.count()).join(
+        Habit, Habit.id == CheckIn.habit_id
+    ).filter(CheckIn.day.between(start, end), CheckIn.completed.is_(True)).group_by(
+        CheckIn.day, Habit.user_id, Habit.frequency
+    ).order_by(CheckIn.day).yield_per(batch_size), key=lambda row: rollups.month_start(row[0]))
+    pending = next(hot, None)
+    month = rollups.month_start(start)
+    while month <= end:
+        first, last = max(start, month), min(end, rollups.month_end(month))
+        counts = archived_checkin_counts(first, last)
+        if pending is not None and pending[0] == month:
+            for day, user_id, frequency, count in pending[1]:
+                counts[day, user_id, frequency] += count
+            pending = next(hot, None)
+        checkins, activity, active = Counter(), Counter(), Counter()
+        for (day, user_id, frequency), count in counts.items():
+            checkins[day, frequency] += count
+            activity[day, user_id] += count
+        for day, _ in activity:
+            active[day] += 1
+        rows = [{'scope': rollups.DAY, 'start': day, 'user_id': user_id, 'checkins': count}
+                for (day, user_id), count in sorted(activity.items())]
+        for offset in range(0, len(rows), batch_size):
+            db.session.execute(db.insert(ActivityRollup), rows[offset:offset + batch_size])
+        keys = sorted(key for key in set(habits) | set(checkins) if first <= key[0] <= last)
+        if keys:
+            db.session.execute(db.insert(DailyRollup), [
+                {'day': day, 'frequency': frequency, 'checkins': checkins.get((day, frequency), 0),
+                 'habits': habits.get((day, frequency), 0)} for day, frequency in keys
+            ])
+        if active:
+            db.session.execute(db.insert(ActiveUsersRollup), [
+                {'scope': rollups.DAY, 'start': day, 'active_users': count} for day, count in sorted(active.items())
+            ])
+        rebuild_month_rollup(month)
+        month = rollups.month_end(month) + timedelta(days=1)
+
+def rebuild_month_rollup(month):
+    """Месячная активность пользователей из дневных строк rollup_activity"""
+    for model in (ActivityRollup, ActiveUsersRollup):
+        model.query.filter_by(scope=rollups.MONTH, start=month).delete(synchronize_session=False)
+    totals = db.session.query(ActivityRollup.user_id, func.sum(ActivityRollup.checkins)).filter(
+        ActivityRollup.scope == rollups.DAY,
+        ActivityRollup.start.between(month, rollups.month_end(month))
+    ).group_by(ActivityRollup.user_id).all()
+    totals = [(user_id, int(total)) for user_id, total in totals if total]
+    if totals:
+        db.session.execute(db.insert(ActivityRollup), [
+            {'scope': rollups.MONTH, 'start': month, 'user_id': user_id, 'checkins': total} for user_id, total in totals
+        ])
+    db.session.execute(db.insert(ActiveUsersRollup), [{
+        'scope': rollups.MONTH, 'start': month, 'active_users': sum(1 for _, total in totals if total > 0)
+    }])
+
+def compact_history(before, batch_size=200):
+    """Переносит отметки check_in раньше before (начало года) в годовые архивы привычек.
+
+    Привычки обрабатываются пачками по batch_size, транзакция на пачку; уже
+    существующий архив года дополняется. Прочитанные строки блокируются до
+    конца транзакции (FOR UPDATE); если удалено больше строк, чем прочитано
+    (отметки импортировали во время переноса), пачка повторяется. Агрегаты
+    привычек не меняются. Возвращает (привычек, строк) перенесённых.
+    """
+    habits = moved = 0
+    last_id = 0
+    while True:
+        ids = [habit_id for habit_id, in db.session.query(Habit.id).filter(Habit.id > last_id)
+               .order_by(Habit.id).limit(batch_size)]
+        if not ids:
+            break
+        rows = db.session.query(CheckIn.habit_id, CheckIn.day, CheckIn.completed).filter(
+            CheckIn.habit_id.in_(ids), CheckIn.day < before
+        ).with_for_update().all()
+        if not rows:
+            db.session.rollback()
+            last_id = ids[-1]
+            continue
+        years = {}
+        for habit_id, day, completed in rows:
+            years.setdefault((habit_id, day.year), []).append((day, completed))
+        stored = {(habit_id, year): data for habit_id, year, data in db.session.query(
+            CheckInArchive.habit_id, CheckInArchive.year, CheckInArchive.data
+        ).filter(CheckInArchive.habit_id.in_({habit_id for habit_id, _ in years}), CheckInArchive.year < before.year)}
+        archived = []
+        for (habit_id, year), days in sorted(years.items()):
+            completed, tracked = archive.decode(year, stored[habit_id, year]) if (habit_id, year) in stored else (0, 0)
+            completed, tracked = HabitHistory({year: completed}), HabitHistory({year: tracked})
+            for day, value in days:
+                completed.set(day, value)
+                tracked.set(day)
+            archived.append({'habit_id': habit_id, 'year': year, 'data': archive.encode(
+                year, completed.years.get(year, 0), tracked.years.get(year, 0))})
+        stmt = rollup_insert(db.session)(CheckInArchive)
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=[CheckInArchive.habit_id, CheckInArchive.year],
+            set_={'data': stmt.excluded.data}
+        ), archived)
+        deleted = CheckIn.query.filter(CheckIn.habit_id.in_(ids), CheckIn.day < before).delete(synchronize_session=False)
+        if deleted != len(rows):
+            db.session.rollback()
+            continue
+        db.session.commit()
+        last_id = ids[-1]
+        habits += len({habit_id for habit_id, _ in years})
+        moved += len(rows)
+        logging.debug("Архив истории: привычки до %s, строк %s", last_id, len(rows))
+    return habits, moved
+
+def catch_up_rollups(today):
+    """Пересчитывает помеченные дни и записывает число привычек за дни с прошлого запуска.
+
+    Возвращает число пересчитанных помеченных дней.
+    """
+    dirty = [day for day, in db.session.query(RollupDirty.day).order_by(RollupDirty.day)]
+    if dirty:
+        recompute_rollups(dirty[0], dirty[-1])
+        RollupDirty.query.filter(RollupDirty.day.in_(dirty)).delete(synchronize_session=False)
+    last = db.session.query(func.max(DailyRollup.day)).filter(DailyRollup.habits > 0).scalar()
+    snapshot_habit_counts(min(last or today, today), today)
+    db.session.commit()
+    return len(dirty)
+
+# Не более стольких ошибок строк сохраняется в отчёте импорта
+MAX_IMPORT_ERRORS = 1000
+
+def import_checkins(user_id, records, batch_size=1000, backdate=False):
+    """Импорт отметок из importer.parse: пакетные upsert, транзакция на пакет.
+
+    Генератор: после каждого пакета отдаёт текущий отчёт, последним —
+    итоговый (done=True) после пересчёта агрегатов затронутых привычек.
+    Строки с ошибками попадают в отчёт и не прерывают импорт. При backdate=True
+    отметки раньше даты создания привычки принимаются, а created_at сдвигается
+    в той же транзакции, что и пакет. Агрегаты и версии привычек с
+    записанными пакетами пересчитываются и при обрыве импорта (закрытие
+    генератора, ошибка в строке или базе).
+    """
+    today = dt_date.today()
+    habits = Habit.query.filter_by(user_id=user_id).all()
+    by_id = {habit.id: habit for habit in habits}
+    by_title = {}
+    for habit in habits:
+        # Одинаковые названия неоднозначны: такие строки должны указывать habit_id
+        by_title[habit.title] = None if habit.title in by_title else habit
+    created = {habit.id: habit.created_at.date() for habit in habits}
+    report = {'processed': 0, 'imported': 0, 'failed': 0, 'batches': 0, 'done': False, 'errors': []}
+    batch = {}
+    committed = set()
+
+    def fail(line, message):
+        report['failed'] += 1
+        if len(report['errors']) < MAX_IMPORT_ERRORS:
+            report['errors'].append({'line': line, 'message': message})
+
+    def flush():
+        upsert_checkins(list(batch.values()))
+        mark_rollup_days(day for _, day in batch)
+        for habit_id in {habit_id for habit_id, _ in batch}:
+            habit = by_id[habit_id]
+            if created[habit_id] < habit.created_at.date():
+                habit.created_at = datetime.combine(created[habit_id], datetime.min.time())
+            committed.add(habit_id)
+        db.session.commit()
+        report['imported'] += len(batch)
+        report['batches'] += 1
+        batch.clear()
+
+    def finalize():
+        """Агрегаты и версии привычек, отметки которых уже записаны"""
+        for habit_id in committed:
+            habit = by_id[habit_id]
+            habit.recalculate_stats()
+            habit.touch()
+        if committed:
+            bump_dashboard_version(user_id)
+        db.session.commit()
+
+    try:
+        for record in records:
+            report['processed'] += 1
+            if isinstance(record, importer.RowError):
+                fail(record.line, record.message)
+                continue
+            habit = by_id.get(record.habit_id)
+            if habit is None and record.title in by_title and by_title[record.title] is None:
+                fail(record.line, f'Несколько привычек с названием «{record.title}» — укажите habit_id')
+                continue
+            habit = habit or by_title.get(record.title)
+            if habit is None:
+                fail(record.line, 'Привычка не найдена')
+                continue
+            if record.day > today:
+                fail(record.line, 'Нельзя отмечать будущие дни')
+                continue
+            if record.day < created[habit.id]:
+                if not backdate:
+                    fail(record.line, 'Дата раньше создания привычки')
+                    continue
+                created[habit.id] = record.day
+            # Повтор дня в пакете: побеждает последняя строка
+            batch[(habit.id, record.day)] = {'habit_id': habit.id, 'day': record.day, 'completed': record.completed}
+            if len(batch) >= batch_size:
+                flush()
+                yield report
+        if batch:
+            flush()
+            yield report
+    finally:
+        # Незаписанный пакет при обрыве отбрасывается, записанные доводятся до согласованного вида
+        db.session.rollback()
+        finalize()
+    report['done'] = True
+    yield report
+
+def write_pending_checkins(changes):
+    """Запись пачки отложенных отметок {(habit_id, day): Pending} одной транзакцией"""
+    by_habit = {}
+    for (habit_id, day), pending in changes.items():
+        by_habit.setdefault(habit_id, []).append((day, pending.value))
+    users = set()
+    # Блокировки в порядке id; удалённые тем временем привычки пропускаются
+    for habit in Habit.query.filter(Habit.id.in_(by_habit)).order_by(Habit.id).with_for_update():
+        for day, completed in sorted(by_habit[habit.id]):
+            set_checkin(habit, day, completed)
+        users.add(habit.user_id)
+    for user_id in users:
+        bump_dashboard_version(user_id)
+    db.session.commit()
+    logging.debug("Записано отложенных отметок: %s, пользователей: %s", len(changes), len(users))
+
+def queue_checkins(changes):
+    """Переключения через очередь write-behind: [(habit, day, status)] -> {habit_id: {день: значение}}.
+
+    Агрегаты и статистика привычек пересчитываются только в памяти сессии —
+    для ответа клиенту; вызывающий код откатывает сессию, а не фиксирует её.
+    """
+    results, previews = {}, {}
+    for habit, day, status in changes:
+        def read_base(habit_id=habit.id, day=day):
+            return db.session.query(CheckIn.completed).filter_by(habit_id=habit_id, day=day).scalar()
+        base, value = write_behind.apply((habit.id, day), habit.user_id, read_base, status)
+        results.setdefault(habit.id, {})[day] = value
+        previews[habit, day] = base, value
+    applied = {}
+    with db.session.no_autoflush:
+        for (habit, day), (base, value) in previews.items():
+            # В pending — уже применённые к агрегатам отметки запроса: в базе их ещё нет
+            pending = applied.setdefault(habit.id, {})
+            pending[day] = value
+            if bool(base) != value:
+                habit.apply_checkin(day, base, value, pending=dict(pending))
+    return results
+
+REMINDER_COLUMNS = (Habit.id, Habit.user_id, Habit.title, Habit.frequency, Habit.reminder_time,
+                    Habit.last_checkin_on, Habit.next_reminder_at, User.email)
+
+def claim_due_reminders(now, batch_size):
+    """Захватывает до batch_size наступивших напоминаний, самые ранние первыми.
+
+    PostgreSQL: строки блокируются до конца транзакции, а захваченные другим
+    планировщиком пропускаются (SKIP LOCKED). Остальные базы: next_reminder_at
+    пачки сдвигается на REMINDER_LEASE_SECONDS отдельной транзакцией, и строки,
+    которые успел захватить другой планировщик, уже не считаются наступившими.
+    """
+    due = select(*REMINDER_COLUMNS).join(User, User.id == Habit.user_id).where(
+        Habit.next_reminder_at <= now
+    ).order_by(Habit.next_reminder_at).limit(batch_size)
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return db.session.execute(due.with_for_update(of=Habit, skip_locked=True)).all()
+    rows = db.session.execute(due).all()
+    if not rows:
+        return rows
+    claimed = set(db.session.execute(
+        update(Habit).where(Habit.id.in_([row.id for row in rows]), Habit.next_reminder_at <= now)
+        .values(next_reminder_at=now + timedelta(seconds=reminder_service.lease))
+        .returning(Habit.id)
+    ).scalars())
+    db.session.commit()
+    return [row for row in rows if row.id in claimed]
+
+def dispatch_due_reminders(now=None):
+    """Обрабатывает одну пачку наступивших напоминаний; возвращает число захваченных строк"""
+    now = now or datetime.utcnow()
+    rows = claim_due_reminders(now, reminder_service.batch_size)
+    if not rows:
+        db.session.rollback()
+        return 0
+    due, schedule = [], []
+    skipped = {'completed': 0, 'stale': 0}
+    for row in rows:
+        # После простоя планировщика вместо пропущенных отправляется последнее наступившее
+        due_at = max(row.next_reminder_at, reminders.previous_reminder(row.frequency, row.reminder_time, now))
+        state = reminders.reminder_state(row.frequency, due_at, row.last_checkin_on, now)
+        if state == 'send':
+            due.append(reminders.Reminder(row.id, row.user_id, row.email, row.title, row.frequency, due_at))
+        else:
+            skipped[state] += 1
+        schedule.append({'id': row.id, 'next_reminder_at': reminders.next_reminder(row.frequency, row.reminder_time, now)})
+    try:
+        reminder_service.deliver(due, **skipped)
+    except Exception:
+        # Блокировки снимаются, а аренда истечёт — пачка повторится
+        db.session.rollback()
+        raise
+    db.session.execute(update(Habit), schedule)
+    db.session.commit()
+    logging.debug("Напоминания: отправлено %s, пропущено %s", len(due), skipped)
+    return len(rows)
+
+def iter_history_rows(user_id, start=None, end=None, batch_size=1000):
+    """Строки истории пользователя для выгрузки: привычки с отметками, по batch_size за раз.
+
+    Читаются только колонки (без объектов в identity map), курсор на стороне
+    сервера — память не растёт с объёмом истории.
+    """
+    condition = CheckIn.habit_id == Habit.id
+    if start:
+        condition = and_(condition, CheckIn.day >= start)
+    if end:
+        condition = and_(condition, CheckIn.day <= end)
+    rows = db.session.query(
+        Habit.id, Habit.title, Habit.frequency, Habit.created_at, CheckIn.day, CheckIn.completed
+    ).outerjoin(CheckIn, condition).filter(
+        Habit.user_id == user_id
+    ).order_by(Habit.id, CheckIn.day).yield_per(batch_size)
+    archived = {}
+    if start is None or start < hot_history_start():
+        query = db.session.query(CheckInArchive.habit_id, CheckInArchive.year, CheckInArchive.data).join(
+            Habit, Habit.id == CheckInArchive.habit_id
+        ).filter(Habit.user_id == user_id)
+        if start:
+            query = query.filter(CheckInArchive.year >= start.year)
+        if end:
+            query = query.filter(CheckInArchive.year <= end.year)
+        for habit_id, year, data in query.order_by(CheckInArchive.habit_id, CheckInArchive.year):
+            archived.setdefault(habit_id, []).append((year, data))
+    return merge_archived_rows(rows, archived, start, end) if archived else rows
+
+def merge_archived_rows(rows, archived, start=None, end=None):
+    """Добавляет в строки выгрузки дни из архива {habit_id: [(год, data)]}, сохраняя порядок.
+
+    Горячих строк у привычки — в пределах горизонта, поэтому они собираются в список.
+    """
+    for habit_id, group in groupby(rows, key=lambda row: row[0]):
+        group = [tuple(row) for row in group]
+        if habit_id not in archived:
+            yield from group
+            continue
+        hot = [row for row in group if row[4] is not None]
+        seen = {row[4] for row in hot}
+        cold = [group[0][:4] + (day, completed)
+                for year, data in archived[habit_id]
+                for day, completed in archive.archived_days(year, data, start, end) if day not in seen]
+        if not cold and not hot:
+            yield group[0]
+        yield from merge(cold, hot, key=lambda row: row[4])
+
+def user_data_etag(*parts):
+    """ETag данных текущего пользователя: версия панели плюс переданные части"""
+    version = db.session.query(User.dashboard_version).filter_by(id=current_user.id).scalar()
+    return '-'.join(str(part) for part in (current_user.id, version) + parts)
+
+def conditional_response(response, etag):
+    """Слабый ETag и обязательная перепроверка кэша браузера"""
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def bump_dashboard_version(user_id):
+    """Делает недействительным ETag панели пользователя (без загрузки строки User)"""
+    User.query.filter_by(id=user_id).update(
+        {User.dashboard_version: User.dashboard_version + 1},
+        synchronize_session=False
+    )
+    if has_request_context():
+        stick_to_primary()
+
+def stick_to_primary():
+    """После записи пользователь некоторое время читает с основной базы, а не с отстающей реплики"""
+    if app.config['DATABASE_REPLICA_URL']:
+        session['db_primary_until'] = time.time() + app.config['DB_REPLICA_STICKY_SECONDS']
+
+def read_replica(view):
+    """Чтение представления с реплики, если она настроена и пользователь недавно ничего не менял"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if session.get('db_primary_until', 0) < time.time():
+            db.session.info['use_replica'] = True
+        return view(*args, **kwargs)
+    return wrapper
+
+def admin_required(view):
+    """Доступ только администраторам; флаг читается из базы, а не из кэша пользователя"""
+    @wraps(view)
+    @login_required
+    def wrapper(*args, **kwargs):
+        if not db.session.query(User.is_admin).filter_by(id=current_user.id).scalar():
+            logging.warning("Пользователь %s запросил %s без прав администратора", current_user.email, request.path)
+            return jsonify({'status': 'error', 'message': 'Доступ запрещен'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+def parse_checkin_date(date_str):
+    """Разбор даты отметки в формате YYYY-MM-DD"""
+    if not isinstance(date_str, str) or len(date_str) != 10:
+        raise ValueError("Неверный формат даты. Используйте YYYY-MM-DD")
+    return dt_date.fromisoformat(date_str)
+
+def checkin_date_error(habit, date_obj, today):
+    """Сообщение об ошибке, если отметку за date_obj менять нельзя, иначе None"""
+    if date_obj != today:
+        return 'Можно изменять только текущий день'
+    if date_obj < habit.created_at.date():
+        return 'Нельзя изменять исторические данные'
+    return None
 
 # Фабрика приложения
 app = create_app()
+write_behind.register_writer(write_pending_checkins)
 
 # Инициализация Flask-Login
 @login_manager.user_loader
 def load_user(user_id):
-    logging.debug(f"Загрузка пользователя с ID: {user_id}")
-    return User.query.get(int(user_id))
+    logging.debug("Загрузка пользователя с ID: %s", user_id)
+    values = user_cache.get(user_id)
+    if values is not None:
+        return User.from_cache(values)
+    user = User.query.get(int(user_id))
+    if user is not None:
+        user_cache.set(user.id, user.cache_identity())
+    return user
 
 # Формы
 from flask_wtf import FlaskForm
@@ -183,6 +1267,7 @@ class HabitForm(FlaskForm):
         ('weekly', 'Еженедельно'), 
         ('monthly', 'Ежемесячно')
     ])
+    reminder_time = TimeField('Напоминание (UTC)', validators=[Optional()])
 
 # Роуты
 @app.route('/')
@@ -196,14 +1281,31 @@ def login():
     form = LoginForm()
     if form.validate_on_submit():
         user = User.query.filter_by(email=form.email.data).first()
-        if user and user.check_password(form.password.data):
+        # Пока считается хеш, соединение возвращается в пул: иначе всплеск входов занимает весь пул
+        db.session.close()
+        try:
+            valid = user is not None and user.check_password(form.password.data)
+        except PasswordHasherBusy:
+            return hasher_busy('login.html', form)
+        if valid:
+            if inspect(user).modified:
+                user = db.session.merge(user)  # пересчитанный хеш пароля
+                db.session.commit()
             login_user(user, remember=form.remember.data)
-            logging.info(f"Пользователь {form.email.data} успешно вошел в систему")
+            logging.info("Пользователь %s успешно вошел в систему", form.email.data)
             return redirect(url_for('dashboard'))
         flash('Неверный email или пароль', 'error')
-        logging.warning(f"Неверный вход для email: {form.email.data}")
+        logging.warning("Неверный вход для email: %s", form.email.data)
     return render_template('login.html', form=form)
 
+def hasher_busy(template, form):
+    """Ответ при переполненной очереди хеширования паролей: 503 с Retry-After"""
+    flash('Сервер перегружен, повторите попытку через несколько секунд', 'error')
+    logging.warning("Очередь хеширования паролей заполнена: %s отклонён", request.path)
+    response = make_response(render_template(template, form=form), 503)
+    response.headers['Retry-After'] = '5'
+    return response
+
 @app.route('/register', methods=['GET', 'POST'])
 def register():
     logging.debug("Попытка регистрации")
@@ -212,28 +1314,228 @@ def register():
         if User.query.filter_by(email=form.email.data).first():
             flash('Этот email уже зарегистрирован', 'error')
             return redirect(url_for('register'))
-        
+        db.session.close()  # соединение не держится, пока считается хеш
+
         user = User(email=form.email.data)
-        user.set_password(form.password.data)
+        try:
+            user.set_password(form.password.data)
+        except PasswordHasherBusy:
+            return hasher_busy('register.html', form)
         db.session.add(user)
         db.session.commit()
         flash('Регистрация прошла успешно! Теперь войдите в систему', 'success')
-        logging.info(f"Пользователь {form.email.data} зарегистрирован")
+        logging.info("Пользователь %s зарегистрирован", form.email.data)
         return redirect(url_for('login'))
     return render_template('register.html', form=form)
 
 @app.route('/dashboard')
 @login_required
+@read_replica
 def dashboard():
     logging.debug("Загрузка страницы dashboard")
+    today = dt_date.today()
+    render_version = app.config['DASHBOARD_RENDER_VERSION']
+
+    # Условный GET: ETag меняется при изменении привычек, смене даты или шаблонов.
+    # Страницу с flash-сообщениями не кэшируем — они показываются один раз
+    etag = None
+    if not session.get('_flashes'):
+        etag = user_data_etag(today.isoformat(), render_version)
+        if request.if_none_match.contains_weak(etag):
+            return conditional_response(make_response('', 304), etag)
+
     habits = Habit.query.filter_by(user_id=current_user.id).all()
-    
-    total_days = 30  # Установите количество дней, которое вы хотите отображать
 
-    for habit in habits:
-        logging.debug(f"Habit {habit.id}: Progress values: {list(habit.progress.values())}, Total days: {len(habit.progress.values())}")
-    
-    return render_template('dashboard.html', habits=habits, total_days=total_days)
+    # Карточки берутся из кэша; окно календаря загружается только для промахов
+    keys = {habit.id: f"habit:{habit.id}:{habit.version}:{today.isoformat()}:{render_version}" for habit in habits}
+    fragments = {habit.id: fragment_cache.get(keys[habit.id]) for habit in habits}
+    misses = [habit for habit in habits if fragments[habit.id] is None]
+    load_calendars(misses, today)
+    for habit in misses:
+        logging.debug("Habit %s: Completed days: %s, Total days: %s", habit.id, habit.completed_days, habit.tracked_days)
+        fragments[habit.id] = render_template('_habit_card.html', habit=habit, today=today)
+        fragment_cache.set(keys[habit.id], fragments[habit.id])
+    fragments = {habit_id: Markup(fragment) for habit_id, fragment in fragments.items()}
+
+    response = make_response(render_template('dashboard.html', habits=habits, fragments=fragments))
+    return conditional_response(response, etag) if etag else response
+
+# Максимальная длина окна календаря в API
+MAX_API_WINDOW_DAYS = 366
+
+@app.route('/api/habits')
+@login_required
+@read_replica
+def api_habits():
+    """Привычки пользователя с отметками за окно дат ?from=YYYY-MM-DD&to=YYYY-MM-DD.
+
+    Отметки передаются битовой строкой в base64: бит i (little-endian) —
+    выполнение в день from + i. По умолчанию — окно календаря панели.
+    ?frequency=daily|weekly|monthly ограничивает ответ привычками одной частоты.
+    """
+    today = dt_date.today()
+    try:
+        start = parse_checkin_date(request.args['from']) if 'from' in request.args \
+            else today - timedelta(days=CALENDAR_LOOKBACK_DAYS)
+        end = parse_checkin_date(request.args['to']) if 'to' in request.args \
+            else start + timedelta(days=29)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': f'Ошибка формата данных: {e}'}), 400
+    if end < start or (end - start).days >= MAX_API_WINDOW_DAYS:
+        return jsonify({
+            'status': 'error',
+            'message': f'Окно должно быть от 1 до {MAX_API_WINDOW_DAYS} дней'
+        }), 400
+    frequency = request.args.get('frequency')
+    if frequency is not None and frequency not in periods.FREQUENCIES:
+        return jsonify({'status': 'error', 'message': 'Частота должна быть daily, weekly или monthly'}), 400
+
+    etag = user_data_etag(today.isoformat(), start.isoformat(), end.isoformat(), frequency or 'all')
+    if request.if_none_match.contains_weak(etag):
+        return conditional_response(make_response('', 304), etag)
+
+    query = Habit.query.filter_by(user_id=current_user.id)
+    if frequency is not None:
+        query = query.filter_by(frequency=frequency)
+    habits = query.order_by(Habit.id).all()
+    load_progress_window(habits, start, end)
+    response = jsonify({
+        'status': 'success',
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'today': today.isoformat(),
+        'habits': [{
+            'id': habit.id,
+            'title': habit.title,
+            'frequency': habit.frequency,
+            'created_at': habit.created_at.date().isoformat(),
+            'bits': base64.b64encode(habit.recent_progress.window_bytes(start, end)).decode('ascii'),
+            **habit.stats(today)
+        } for habit in habits]
+    })
+    return conditional_response(response, etag)
+
+@app.route('/export')
+@login_required
+@read_replica
+def export_history():
+    """Потоковая выгрузка истории: ?format=ndjson|csv&from=&to=&gzip=1"""
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in export.FORMATS:
+        return jsonify({'status': 'error', 'message': 'Формат должен быть ndjson или csv'}), 400
+    try:
+        start = parse_checkin_date(request.args['from']) if request.args.get('from') else None
+        end = parse_checkin_date(request.args['to']) if request.args.get('to') else None
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': f'Ошибка формата данных: {e}'}), 400
+
+    mimetype, extension = export.FORMATS[export_format]
+    filename = f"habitminder-{dt_date.today().isoformat()}.{extension}"
+    chunks = export.encode(iter_history_rows(current_user.id, start, end), export_format)
+    if request.args.get('gzip') in ('1', 'true'):
+        chunks = export.gzip_chunks(chunks)
+        mimetype, filename = 'application/gzip', filename + '.gz'
+
+    logging.info("Выгрузка истории в %s пользователем %s", export_format, current_user.email)
+    response = Response(stream_with_context(chunks), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@app.route('/import', methods=['POST'])
+@login_required
+def import_history():
+    """Импорт истории из файла (поле file, format=csv|ndjson, backdate=1).
+
+    Ответ — NDJSON: строка {"type": "progress"} после каждого пакета
+    и итоговая {"type": "report"} с ошибками строк.
+    """
+    too_large = jsonify({'status': 'error', 'message': 'Файл слишком большой'}), 413
+    if (request.content_length or 0) > app.config['IMPORT_MAX_BYTES']:
+        return too_large
+    try:
+        # Тело без Content-Length ограничивает MAX_CONTENT_LENGTH при разборе формы
+        import_format = request.form.get('format', 'ndjson')
+        upload = request.files.get('file')
+    except RequestEntityTooLarge:
+        return too_large
+    if import_format not in importer.FORMATS:
+        return jsonify({'status': 'error', 'message': 'Формат должен быть ndjson или csv'}), 400
+    if upload is None:
+        return jsonify({'status': 'error', 'message': 'Не передан файл'}), 400
+    # Размер самого файла: заголовок описывает всё тело, и его может не быть
+    upload.stream.seek(0, io.SEEK_END)
+    if upload.stream.tell() > app.config['IMPORT_MAX_BYTES']:
+        return too_large
+    upload.stream.seek(0)
+
+    user_id, email = current_user.id, current_user.email
+    backdate = request.form.get('backdate') in ('1', 'true')
+    lines = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', errors='replace', newline='')
+
+    def generate():
+        records = importer.parse(lines, import_format)
+        for report in import_checkins(user_id, records, app.config['IMPORT_BATCH_SIZE'], backdate):
+            if not report['done']:
+                yield json.dumps({'type': 'progress', 'processed': report['processed'],
+                                  'imported': report['imported'], 'failed': report['failed']}) + '\n'
+        logging.info("Импорт истории пользователем %s: строк %s, записано %s, ошибок %s",
+                     email, report['processed'], report['imported'], report['failed'])
+        yield json.dumps({'type': 'report', **report}, ensure_ascii=False) + '\n'
+
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@app.route('/admin/stats')
+@admin_required
+@read_replica
+def admin_stats():
+    """Аналитика по всем пользователям из агрегатов: день (?date=YYYY-MM-DD, по умолчанию
+    вчера) и месяц (?month=YYYY-MM, по умолчанию текущий). История отметок не читается.
+
+    Доля выполнения за день — отмеченные привычки от существовавших, за месяц —
+    выполненные отметки от ожидаемых (одна за период, см. rollups.completion_rate).
+    """
+    today = dt_date.today()
+    try:
+        day = dt_date.fromisoformat(request.args['date']) if 'date' in request.args else today - timedelta(days=1)
+        month = datetime.strptime(request.args['month'], '%Y-%m').date() if 'month' in request.args else today.replace(day=1)
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'Неверный формат даты'}), 400
+
+    active = dict(db.session.query(ActiveUsersRollup.scope, ActiveUsersRollup.active_users).filter(
+        ((ActiveUsersRollup.scope == rollups.DAY) & (ActiveUsersRollup.start == day)) |
+        ((ActiveUsersRollup.scope == rollups.MONTH) & (ActiveUsersRollup.start == month))
+    ))
+    day_frequencies = {
+        row.frequency: {'checkins': row.checkins, 'habits': row.habits,
+                        'completion_rate': round(row.checkins / row.habits, 4) if row.habits else None}
+        for row in DailyRollup.query.filter_by(day=day)
+    }
+    month_frequencies = {
+        frequency: {'checkins': int(checkins), 'habit_days': int(habit_days),
+                    'completion_rate': rollups.completion_rate(frequency, int(checkins), int(habit_days), month)}
+        for frequency, checkins, habit_days in db.session.query(
+            DailyRollup.frequency, func.sum(DailyRollup.checkins), func.sum(DailyRollup.habits)
+        ).filter(DailyRollup.day.between(month, rollups.month_end(month))).group_by(DailyRollup.frequency)
+    }
+    return jsonify({
+        'day': {
+            'date': day.isoformat(),
+            'active_users': active.get(rollups.DAY, 0),
+            'checkins': sum(item['checkins'] for item in day_frequencies.values()),
+            'frequencies': day_frequencies,
+        },
+        'month': {
+            'month': month.strftime('%Y-%m'),
+            'active_users': active.get(rollups.MONTH, 0),
+            'checkins': sum(item['checkins'] for item in month_frequencies.values()),
+            'frequencies': month_frequencies,
+        },
+        # Дни, ожидающие пересчёта: пока они есть, цифры за них могут быть неточными
+        'pending_days': db.session.query(func.count(RollupDirty.day)).scalar(),
+    })
 
 @app.route('/habit/create', methods=['GET', 'POST'])
 @login_required
@@ -247,26 +1549,30 @@ def create_habit():
                 frequency=form.frequency.data,
                 user_id=current_user.id
             )
+            habit.set_reminder(form.reminder_time.data, datetime.utcnow())
             db.session.add(habit)
+            bump_dashboard_version(current_user.id)
             db.session.commit()
             flash('Привычка успешно создана', 'success')
-            logging.info(f"Привычка '{habit.title}' успешно создана пользователем {current_user.email}")
+            logging.info("Привычка '%s' успешно создана пользователем %s", habit.title, current_user.email)
             return redirect(url_for('dashboard'))
         except Exception as e:
             flash(f'Ошибка при создании привычки: {str(e)}', 'error')
-            logging.error(f'Ошибка при создании привычки: {str(e)}')
+            logging.error('Ошибка при создании привычки: %s', e)
     return render_template('create_habit.html', form=form)
 
 @app.route('/habit/<int:habit_id>/update', methods=['POST'])
 @login_required
 def update_habit(habit_id):
     """Обработчик обновления статуса привычки"""
-    logging.debug(f"Попытка обновления привычки с ID: {habit_id}")
-    habit = Habit.query.get_or_404(habit_id)
+    logging.debug("Попытка обновления привычки с ID: %s", habit_id)
+    # В режиме write-behind строка привычки не блокируется: запись делает фоновый поток
+    query = Habit.query if write_behind.enabled else Habit.query.with_for_update()
+    habit = query.get_or_404(habit_id)
     
     # Проверка прав доступа
     if habit.user_id != current_user.id:
-        logging.warning(f"Неавторизованный доступ к привычке {habit_id} от {current_user.email}")
+        logging.warning("Неавторизованный доступ к привычке %s от %s", habit_id, current_user.email)
         return jsonify({'status': 'error', 'message': 'Доступ запрещен'}), 403
 
     try:
@@ -277,54 +1583,147 @@ def update_habit(habit_id):
         else:  # Для форм-данных
             date_str = request.form.get('date')
 
-        # Валидация формата даты
-        if not isinstance(date_str, str) or len(date_str) != 10:
-            raise ValueError("Неверный формат даты. Используйте YYYY-MM-DD")
-
-        # Преобразование даты
-        date_obj = dt_date.fromisoformat(date_str)
+        # Валидация и преобразование даты
+        date_obj = parse_checkin_date(date_str)
         today = dt_date.today()
         
         # Проверка допустимости даты
-        if date_obj != today:
-            logging.warning(f"Попытка изменения не текущей даты: {date_str}")
+        error = checkin_date_error(habit, date_obj, today)
+        if error:
+            logging.warning("Недопустимая дата %s для привычки %s: %s", date_str, habit_id, error)
             return jsonify({
                 'status': 'error',
-                'message': 'Можно изменять только текущий день'
-            }), 400
-            
-        if date_obj < habit.created_at.date():
-            logging.warning(f"Дата {date_str} раньше создания привычки")
-            return jsonify({
-                'status': 'error',
-                'message': 'Нельзя изменять исторические данные'
+                'message': error
             }), 400
 
-        # Обновление прогресса
-        progress = habit.progress.copy() or {}
-        current_status = progress.get(date_str, False)
-        progress[date_str] = not current_status
+        if write_behind.enabled:
+            new_status = queue_checkins([(habit, date_obj, None)])[habit.id][date_obj]
+            response = jsonify({'status': 'success', 'new_status': new_status, **habit.stats(today)})
+            db.session.rollback()
+            return response
+
+        # Обновление прогресса: одна строка в check_in и агрегаты привычки
+        new_status = set_checkin(habit, date_obj)
+        bump_dashboard_version(current_user.id)
         
         # Сохранение изменений
-        habit.progress = progress
         db.session.commit()
         
-        logging.info(f"Обновлен статус привычки {habit_id} за {date_str}")
+        logging.info("Обновлен статус привычки %s за %s", habit_id, date_str)
         return jsonify({
             'status': 'success',
-            'new_status': progress[date_str],
-            'completed_days': sum(1 for v in progress.values() if v),
-            'total_days': len(progress)
+            'new_status': new_status,
+            **habit.stats(today)
         })
         
     except ValueError as e:
-        logging.error(f'Ошибка валидации: {str(e)}')
+        logging.error('Ошибка валидации: %s', e)
         return jsonify({
             'status': 'error',
             'message': f'Ошибка формата данных: {str(e)}'
         }), 400
     except Exception as e:
-        logging.error(f'Критическая ошибка обновления: {str(e)}')
+        logging.error('Критическая ошибка обновления: %s', e)
+        db.session.rollback()
+        return jsonify({
+            'status': 'error',
+            'message': 'Внутренняя ошибка сервера: ' + str(e)
+        }), 500
+
+# Максимальное количество операций в одном пакетном запросе
+MAX_BATCH_OPERATIONS = 500
+
+@app.route('/habits/checkins', methods=['POST'])
+@login_required
+def batch_update_habits():
+    """Пакетное обновление отметок: список {habit_id, date, status} в одной транзакции.
+
+    status — новое значение (true/false); если не указан, отметка переключается.
+    Операции применяются только если все они корректны.
+    """
+    data = request.get_json(silent=True) or {}
+    operations = data.get('operations')
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'status': 'error', 'message': 'Ожидается непустой список operations'}), 400
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return jsonify({
+            'status': 'error',
+            'message': f'Не более {MAX_BATCH_OPERATIONS} операций за запрос'
+        }), 400
+
+    # Разбор операций
+    parsed, errors = [], []
+    for index, operation in enumerate(operations):
+        try:
+            if not isinstance(operation, dict):
+                raise ValueError("Операция должна быть объектом")
+            habit_id = operation.get('habit_id')
+            if not isinstance(habit_id, int) or isinstance(habit_id, bool):
+                raise ValueError("Неверный habit_id")
+            status = operation.get('status')
+            if status is not None and not isinstance(status, bool):
+                raise ValueError("status должен быть true, false или отсутствовать")
+            parsed.append((index, habit_id, parse_checkin_date(operation.get('date')), status))
+        except ValueError as e:
+            errors.append({'index': index, 'message': str(e)})
+    if errors:
+        return jsonify({'status': 'error', 'errors': errors}), 400
+
+    try:
+        # Проверка прав доступа одним запросом; блокировки берутся в порядке id
+        habit_ids = {habit_id for _, habit_id, _, _ in parsed}
+        query = Habit.query.filter(Habit.id.in_(habit_ids), Habit.user_id == current_user.id).order_by(Habit.id)
+        if not write_behind.enabled:
+            query = query.with_for_update()
+        habits = {habit.id: habit for habit in query}
+        missing = habit_ids - habits.keys()
+        if missing:
+            db.session.rollback()
+            logging.warning("Пакетный доступ к чужим или несуществующим привычкам %s от %s", sorted(missing), current_user.email)
+            return jsonify({'status': 'error', 'message': 'Доступ запрещен', 'habit_ids': sorted(missing)}), 403
+
+        today = dt_date.today()
+        for index, habit_id, date_obj, _ in parsed:
+            error = checkin_date_error(habits[habit_id], date_obj, today)
+            if error:
+                errors.append({'index': index, 'message': error})
+        if errors:
+            db.session.rollback()
+            return jsonify({'status': 'error', 'errors': errors}), 400
+
+        if write_behind.enabled:
+            results = queue_checkins([(habits[habit_id], date_obj, status) for _, habit_id, date_obj, status in parsed])
+            response = jsonify({
+                'status': 'success',
+                'habits': {
+                    str(habit_id): {
+                        'checkins': {day.isoformat(): value for day, value in checkins.items()},
+                        **habits[habit_id].stats(today)
+                    }
+                    for habit_id, checkins in results.items()
+                }
+            })
+            db.session.rollback()
+            return response
+
+        results = {}
+        for _, habit_id, date_obj, status in parsed:
+            new_status = set_checkin(habits[habit_id], date_obj, status)
+            results.setdefault(habit_id, {})[date_obj.isoformat()] = new_status
+        bump_dashboard_version(current_user.id)
+        logging.info("Пакетное обновление %s отметок пользователем %s", len(parsed), current_user.email)
+        db.session.commit()
+
+        return jsonify({
+            'status': 'success',
+            'habits': {
+                str(habit_id): {'checkins': checkins, **habits[habit_id].stats(today)}
+                for habit_id, checkins in results.items()
+            }
+        })
+
+    except Exception as e:
+        logging.error('Критическая ошибка пакетного обновления: %s', e)
         db.session.rollback()
         return jsonify({
             'status': 'error',
@@ -345,38 +1744,235 @@ def update_habit_meta(habit_id):
         new_title = request.form.get('title')
         if new_title and new_title != habit.title:
             habit.title = new_title
+            habit.touch()
+            bump_dashboard_version(current_user.id)
             db.session.commit()
             flash('Название успешно обновлено', 'success')
-        
+
+        # Время напоминания ЧЧ:ММ (UTC); пустое значение выключает напоминание
+        if 'reminder_time' in request.form:
+            value = request.form['reminder_time'].strip()
+            try:
+                reminder_time = datetime.strptime(value, '%H:%M').time() if value else None
+            except ValueError:
+                flash('Некорректное время напоминания', 'danger')
+                return redirect(url_for('dashboard'))
+            # Форма карточки присылает поле всегда — сохраняется только изменение
+            if reminder_time != habit.reminder_time:
+                habit.set_reminder(reminder_time, datetime.utcnow())
+                habit.touch()
+                bump_dashboard_version(current_user.id)
+                db.session.commit()
+                flash('Напоминание обновлено' if reminder_time else 'Напоминание выключено', 'success')
+
         return redirect(url_for('dashboard'))
 
     except Exception as e:
         db.session.rollback()
-        logging.error(f'Ошибка обновления: {str(e)}')
+        logging.error('Ошибка обновления: %s', e)
         flash('Ошибка при обновлении привычки', 'danger')
         return redirect(url_for('dashboard'))
 
 @app.route('/habit/<int:habit_id>/delete', methods=['DELETE'])
 @login_required
 def delete_habit(habit_id):
-    logging.debug(f"Попытка удаления привычки с ID: {habit_id}")
+    logging.debug("Попытка удаления привычки с ID: %s", habit_id)
     habit = Habit.query.get_or_404(habit_id)
     if habit.user_id != current_user.id:
-        logging.warning(f"Попытка удаления привычки {habit_id} пользователем {current_user.email}, у которого нет прав")
+        logging.warning("Попытка удаления привычки %s пользователем %s, у которого нет прав", habit_id, current_user.email)
         return {'status': 'error', 'message': 'Нет прав для удаления'}, 403
     
+    # Агрегаты дней с отметками привычки пересчитает rollup-catch-up
+    mark_rollup_days(habit.load_history().days())
+    CheckIn.query.filter_by(habit_id=habit.id).delete(synchronize_session=False)
+    CheckInArchive.query.filter_by(habit_id=habit.id).delete(synchronize_session=False)
     db.session.delete(habit)
+    bump_dashboard_version(current_user.id)
     db.session.commit()
-    logging.info(f"Привычка {habit_id} успешно удалена пользователем {current_user.email}")
+    logging.info("Привычка %s успешно удалена пользователем %s", habit_id, current_user.email)
     return {'status': 'success'}
 
 @app.route('/logout')
 @login_required
 def logout():
+    email = current_user.email
     logout_user()
     flash('Вы успешно вышли из системы', 'info')
-    logging.info(f"Пользователь {current_user.email} вышел из системы")
+    logging.info("Пользователь %s вышел из системы", email)
     return redirect(url_for('index'))
 
+# CLI-команды
+@app.cli.command('init-db')
+def init_db():
+    """Создаёт схему в пустой базе и помечает её последней ревизией Alembic"""
+    from flask_migrate import stamp
+    db.create_all()
+    stamp()
+    click.echo("Схема создана")
+
+@app.cli.command('export-history')
+@click.argument('email')
+@click.option('--format', 'export_format', type=click.Choice(list(export.FORMATS)), default='ndjson', show_default=True)
+@click.option('--from', 'start', type=click.DateTime(['%Y-%m-%d']), help='Начало периода (YYYY-MM-DD)')
+@click.option('--to', 'end', type=click.DateTime(['%Y-%m-%d']), help='Конец периода (YYYY-MM-DD)')
+@click.option('--gzip', 'compress', is_flag=True, help='Сжать вывод в gzip')
+@click.option('--output', type=click.File('wb'), default='-', show_default=True)
+def export_history_command(email, export_format, start, end, compress, output):
+    """Потоковая выгрузка истории пользователя в NDJSON или CSV"""
+    user = User.query.filter_by(email=email).first()
+    if user is None:
+        raise click.ClickException(f"Пользователь {email} не найден")
+    rows = iter_history_rows(user.id, start.date() if start else None, end.date() if end else None)
+    chunks = export.encode(rows, export_format)
+    if compress:
+        chunks = export.gzip_chunks(chunks)
+    for chunk in chunks:
+        output.write(chunk)
+
+@app.cli.command('import-history')
+@click.argument('email')
+@click.argument('source', type=click.File('r', encoding='utf-8-sig'))
+@click.option('--format', 'import_format', type=click.Choice(importer.FORMATS), default='ndjson', show_default=True)
+@click.option('--batch-size', default=1000, show_default=True, help='Строк на одну транзакцию')
+@click.option('--backdate', is_flag=True, help='Принимать отметки раньше даты создания привычки')
+def import_history_command(email, source, import_format, batch_size, backdate):
+    """Импорт истории пользователя из CSV или NDJSON (формат выгрузки export-history)"""
+    user = User.query.filter_by(email=email).first()
+    if user is None:
+        raise click.ClickException(f"Пользователь {email} не найден")
+    for report in import_checkins(user.id, importer.parse(source, import_format), batch_size, backdate):
+        if not report['done']:
+            click.echo(f"Обработано строк: {report['processed']}, записано: {report['imported']}, "
+                       f"ошибок: {report['failed']}", err=True)
+    for error in report['errors']:
+        click.echo(f"Строка {error['line']}: {error['message']}", err=True)
+    click.echo(f"Обработано строк: {report['processed']}, записано: {report['imported']}, "
+               f"ошибок: {report['failed']}, пакетов: {report['batches']}")
+
+@app.cli.command('seed-admin')
+@click.option('--email', default='admin@example.com', show_default=True)
+@click.password_option(help='Пароль администратора')
+def seed_admin_command(email, password):
+    """Создаёт учётную запись администратора"""
+    if seed_admin(email, password):
+        click.echo(f"Создан администратор {email}")
+    else:
+        click.echo(f"Пользователь {email} уже существует")
+
+@app.cli.command('rebuild-stats')
+@click.option('--check', is_flag=True, help='Только проверить согласованность, не исправляя')
+@click.option('--batch-size', default=500, show_default=True, help='Привычек на одну транзакцию')
+def rebuild_stats(check, batch_size):
+    """Сверяет агрегаты привычек с историей (check_in и архив) и пересчитывает расхождения"""
+    fields = ('completed_days', 'tracked_days', 'current_streak', 'longest_streak', 'last_checkin_on',
+              'completed_periods', 'period_streak', 'longest_period_streak', 'last_period')
+    checked = mismatched = 0
+    last_id = 0
+    while True:
+        habits = Habit.query.filter(Habit.id > last_id).order_by(Habit.id).limit(batch_size).all()
+        if not habits:
+            break
+        for habit in habits:
+            stored = tuple(getattr(habit, field) for field in fields)
+            habit.recalculate_stats()
+            actual = tuple(getattr(habit, field) for field in fields)
+            checked += 1
+            if stored != actual:
+                mismatched += 1
+                habit.touch()
+                bump_dashboard_version(habit.user_id)
+                click.echo(f"Привычка {habit.id}: {dict(zip(fields, stored))} -> {dict(zip(fields, actual))}")
+        last_id = habits[-1].id
+        if check:
+            db.session.rollback()
+        else:
+            db.session.commit()
+    action = 'найдено' if check else 'исправлено'
+    click.echo(f"Проверено привычек: {checked}, {action} расхождений: {mismatched}")
+
+@app.cli.command('run-reminders')
+@click.option('--once', is_flag=True, help='Обработать наступившие напоминания и выйти')
+def run_reminders(once):
+    """Планировщик напоминаний: раз в REMINDER_TICK_SECONDS отправляет наступившие"""
+    click.echo(f"Планировщик напоминаний: пачка {reminder_service.batch_size}, тик {reminder_service.tick:g} с")
+    while True:
+        started = time.monotonic()
+        try:
+            # Полная пачка — значит, наступивших может быть больше
+            while dispatch_due_reminders() >= reminder_service.batch_size:
+                pass
+        except Exception:
+            logging.exception("Ошибка отправки напоминаний")
+        if once:
+            break
+        time.sleep(max(0.0, reminder_service.tick - (time.monotonic() - started)))
+    click.echo(f"Напоминания: {reminder_service.stats()}")
+
+@app.cli.command('rollup-catch-up')
+def rollup_catch_up():
+    """Пересчитывает агрегаты помеченных дней и записывает число привычек (запускать по cron)"""
+    days = catch_up_rollups(dt_date.today())
+    click.echo(f"Пересчитано помеченных дней: {days}")
+
+@app.cli.command('rebuild-rollups')
+@click.option('--from', 'start', type=click.DateTime(['%Y-%m-%d']), help='Начало периода (по умолчанию — первая отметка)')
+@click.option('--to', 'end', type=click.DateTime(['%Y-%m-%d']), help='Конец периода (по умолчанию — сегодня)')
+def rebuild_rollups(start, end):
+    """Заполняет агрегаты из истории за период — после миграции или для проверки"""
+    if start:
+        start = start.date()
+    else:
+        year = db.session.query(func.min(CheckInArchive.year)).scalar()
+        first = [day for day in (db.session.query(func.min(CheckIn.day)).scalar(),
+                                 dt_date(year, 1, 1) if year else None) if day]
+        start = min(first) if first else dt_date.today()
+    end = end.date() if end else dt_date.today()
+    started = time.perf_counter()
+    recompute_rollups(start, end)
+    RollupDirty.query.filter(RollupDirty.day.between(start, end)).delete(synchronize_session=False)
+    db.session.commit()
+    click.echo(f"Агрегаты за {start} — {end} пересчитаны за {time.perf_counter() - started:.1f} с")
+
+@app.cli.command('compact-history')
+@click.option('--batch-size', default=200, show_default=True, help='Привычек на одну транзакцию')
+def compact_history_command(batch_size):
+    """Переносит отметки старше горизонта HISTORY_HOT_DAYS в сжатые архивы (запускать по cron)"""
+    before = hot_history_start()
+    started = time.perf_counter()
+    habits, moved = compact_history(before, batch_size)
+    click.echo(f"Перенесено в архив отметок до {before}: {moved} у {habits} привычек "
+               f"за {time.perf_counter() - started:.1f} с")
+
+@app.cli.command('build-assets')
+def build_assets():
+    """Собирает статику с хешами в именах и сжатыми копиями; манифест читается при старте воркеров"""
+    manifest = assets.build(app.static_folder)
+    for name, built in sorted(manifest.items()):
+        click.echo(f"{name} -> {built}")
+    click.echo(f"Собрано файлов: {len(manifest)}; перезапустите воркеры, чтобы подхватить манифест")
+
+@app.cli.command('grant-admin')
+@click.argument('email')
+@click.option('--revoke', is_flag=True, help='Снять права администратора')
+def grant_admin(email, revoke):
+    """Выдаёт (или снимает) права администратора существующему пользователю"""
+    user = User.query.filter_by(email=email).first()
+    if user is None:
+        raise click.ClickException(f"Пользователь {email} не найден")
+    user.is_admin = not revoke
+    db.session.commit()
+    click.echo(f"{email}: права администратора {'сняты' if revoke else 'выданы'}")
+
+@app.cli.command('user-cache-stats')
+@click.option('--clear', is_flag=True, help='Очистить кэш и счётчики')
+def user_cache_stats(clear):
+    """Счётчики кэша пользователей (суммарные по воркерам для бэкенда sqlite)"""
+    stats = user_cache.stats()
+    click.echo(f"Бэкенд: {app.config['USER_CACHE_BACKEND']}, попаданий: {stats['hits']}, "
+               f"промахов: {stats['misses']}, записей: {stats['size']}")
+    if clear:
+        user_cache.clear()
+        click.echo("Кэш очищен")
+
 #if __name__ == '__main__':
 #    app.run(host='0.0.0.0', port=os.environ.get('PORT', 3001))
\ No newline at end of file
@@ -0,0 +1,58 @@
+"""Холодный уровень истории отметок: сжатые годовые архивы.
+
+Строки check_in за годы, целиком закончившиеся раньше горизонта
+HISTORY_HOT_DAYS, flask compact-history переносит в check_in_archive —
+одну строку на привычку и год. Данные строки — две битовые карты
+HabitHistory (выполненные дни и все отмеченные, в том числе снятые
+отметки), сжатые zlib. Горячая таблица остаётся ограниченной по размеру,
+а календарь и переключения читают только её.
+
+Чтение полной истории объединяет оба уровня; строка check_in важнее
+архива за тот же день — импорт может записать день архивного года, и до
+следующего compact-history он живёт в горячей таблице.
+"""
+import zlib
+from datetime import date, timedelta
+
+from history import HabitHistory, days_in_year
+
+# Достаточно для окна календаря и API (до года), с запасом на границу года
+DEFAULT_HOT_DAYS = 400
+
+
+def year_size(year):
+    return (days_in_year(year) + 7) // 8
+
+
+def hot_start(today, hot_days):
+    """Первый день, который не бывает в архиве: начало года, в который попадает горизонт"""
+    return date((today - timedelta(days=hot_days)).year, 1, 1)
+
+
+def encode(year, completed, tracked):
+    """Сжатая запись года из битов выполненных и отмеченных дней (целые числа)"""
+    size = year_size(year)
+    return zlib.compress(completed.to_bytes(size, 'little') + tracked.to_bytes(size, 'little'), 9)
+
+
+def decode(year, data, start=None, end=None):
+    """Биты (выполненных, отмеченных) дней года из encode, только дни в пределах [start, end]"""
+    raw = zlib.decompress(data)
+    size = year_size(year)
+    mask = (1 << days_in_year(year)) - 1
+    first = date(year, 1, 1)
+    if start and start > first:
+        mask &= ~((1 << (start - first).days) - 1)
+    if end and end.year == year:
+        mask &= (1 << ((end - first).days + 1)) - 1
+    elif end and end.year < year:
+        mask = 0
+    return int.from_bytes(raw[:size], 'little') & mask, int.from_bytes(raw[size:], 'little') & mask
+
+
+def archived_days(year, data, start=None, end=None):
+    """Отмеченные дни года по возрастанию: (день, выполнен) в пределах [start, end]"""
+    completed, tracked = decode(year, data, start, end)
+    completed = HabitHistory({year: completed})
+    for day in HabitHistory({year: tracked}).days(start, end):
+        yield day, day in completed
@@ -0,0 +1,131 @@
+"""Сборка статики с хешами в именах и отдача с долгим кэшированием.
+
+flask build-assets копирует файлы static/ в static/dist/ под именами с
+хешем содержимого (css/styles.3f2a9c1b7d4e.css), рядом кладёт сжатые
+варианты .gz и пишет manifest.json {исходное имя: собранное}. Манифест
+читается один раз при старте: url_for('static', filename='css/styles.css')
+подставляет собранное имя, а собранные файлы отдаются с
+Cache-Control: public, max-age=ASSETS_MAX_AGE, immutable и, если клиент
+принимает gzip, в сжатом виде. Без манифеста всё работает как раньше.
+
+Старые собранные файлы не удаляются: во время выкладки страницы прежней
+версии ещё ссылаются на них.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+
+from flask import current_app, request, send_from_directory
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+# Файлы меньше этого размера не сжимаются: выигрыш меньше заголовков
+MIN_GZIP_SIZE = 256
+COMPRESSIBLE = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+
+
+def hashed_name(name, data):
+    root, ext = os.path.splitext(name)
+    return f"{root}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+
+
+def compressible(name):
+    mimetype = mimetypes.guess_type(name)[0] or ''
+    return mimetype.startswith(COMPRESSIBLE)
+
+
+def build(static_folder, output_dir=OUTPUT_DIR):
+    """Собирает статику в static_folder/output_dir; возвращает манифест {имя: собранное имя}"""
+    output = os.path.join(static_folder, output_dir)
+    manifest = {}
+    for root, dirs, files in os.walk(static_folder):
+        if os.path.abspath(root) == os.path.abspath(static_folder):
+            dirs[:] = [name for name in dirs if name != output_dir]
+        dirs.sort()
+        for filename in sorted(files):
+            if filename.startswith('.') or filename.endswith('.gz'):
+                continue
+            path = os.path.join(root, filename)
+            name = os.path.relpath(path, static_folder).replace(os.sep, '/')
+            with open(path, 'rb') as f:
+                data = f.read()
+            built = hashed_name(name, data)
+            target = os.path.join(output, built)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as f:
+                f.write(data)
+            if compressible(name) and len(data) >= MIN_GZIP_SIZE:
+                # mtime=0: одинаковое содержимое даёт одинаковый архив
+                compressed = gzip.compress(data, compresslevel=9, mtime=0)
+                if len(compressed) < len(data):
+                    with open(target + '.gz', 'wb') as f:
+                        f.write(compressed)
+            manifest[name] = f"{output_dir}/{built}"
+    path = os.path.join(output, MANIFEST_NAME)
+    os.makedirs(output, exist_ok=True)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+    return manifest
+
+
+class Assets:
+    """Расширение Flask: ASSETS_MANIFEST (путь; пустое значение отключает), ASSETS_MAX_AGE (секунды)"""
+
+    def __init__(self, app=None):
+        self.manifest = {}
+        self.built = {}  # собранное имя -> есть ли вариант .gz
+        self.version = ''
+        self.max_age = 365 * 24 * 3600
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ASSETS_MANIFEST', os.path.join(app.static_folder, OUTPUT_DIR, MANIFEST_NAME))
+        app.config.setdefault('ASSETS_MAX_AGE', 365 * 24 * 3600)
+        self.max_age = int(app.config['ASSETS_MAX_AGE'])
+        self.load(app.config['ASSETS_MANIFEST'], app.static_folder)
+        app.url_defaults(self.url_defaults)
+        app.view_functions['static'] = self.send_static
+        app.extensions['assets'] = self
+
+    def load(self, path, static_folder):
+        """Читает манифест; без него url_for отдаёт исходные имена"""
+        self.manifest, self.built, self.version = {}, {}, ''
+        if not path or not os.path.exists(path):
+            logger.info("Манифест статики не найден (%s), файлы отдаются без хешей", path)
+            return
+        with open(path, 'rb') as f:
+            data = f.read()
+        self.manifest = json.loads(data)
+        self.built = {
+            built: os.path.exists(os.path.join(static_folder, built + '.gz'))
+            for built in self.manifest.values()
+        }
+        self.version = hashlib.sha1(data).hexdigest()[:12]
+
+    def url_defaults(self, endpoint, values):
+        """url_for('static', filename=...) подставляет имя из манифеста"""
+        if endpoint == 'static' and values.get('filename') in self.manifest:
+            values['filename'] = self.manifest[values['filename']]
+
+    def send_static(self, filename):
+        """Собранные файлы — с долгим кэшем и gzip по Accept-Encoding, остальные — как в Flask"""
+        if filename not in self.built:
+            return current_app.send_static_file(filename)
+        encoded = self.built[filename] and 'gzip' in request.accept_encodings
+        response = send_from_directory(
+            current_app.static_folder, filename + '.gz' if encoded else filename,
+            mimetype=mimetypes.guess_type(filename)[0], max_age=self.max_age
+        )
+        if encoded:
+            response.content_encoding = 'gzip'
+        response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
@@ -0,0 +1,109 @@
+"""Байты и запросы при холодной и повторной загрузке панели: статика без сборки и после flask build-assets.
+
+Запуск: python benchmarks/bench_assets.py [--habits 10] [--reload-after 60]
+Браузер моделируется кэшем по Cache-Control и ETag: при холодной загрузке
+кэш пуст, повторная выполняется через --reload-after секунд. Ресурс со
+свежим max-age не запрашивается, устаревший перепроверяется условным
+запросом. Учитываются только ресурсы приложения (Bootstrap грузится с CDN);
+байты — тело ответа плюс заголовки. Сборка пишется во временный каталог,
+исходный static/ не меняется.
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--habits', type=int, default=10)
+    parser.add_argument('--reload-after', type=int, default=60, help='Секунд между загрузками')
+    return parser.parse_args()
+
+
+ARGS = parse_args()
+
+import datagen  # noqa: E402
+import assets  # noqa: E402
+from app import app, asset_manifest  # noqa: E402
+
+LOCAL_URL = re.compile(r'(?:href|src)="(/static/[^"]+)"')
+
+
+class Browser:
+    """Кэш браузера: URL -> (ETag, момент устаревания, тело)"""
+
+    def __init__(self, client):
+        self.client = client
+        self.cache = {}
+
+    def fetch(self, url, now, stats):
+        entry = self.cache.get(url)
+        if entry and entry['expires'] > now:
+            stats['from_cache'] += 1
+            return entry['body']
+        headers = {'Accept-Encoding': 'gzip, deflate, br'}
+        if entry and entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        response = self.client.get(url, headers=headers)
+        stats['requests'] += 1
+        stats['bytes'] += len(response.data) + sum(len(key) + len(value) + 4 for key, value in response.headers)
+        if response.status_code == 304:
+            stats['not_modified'] += 1
+            body = entry['body']
+        else:
+            assert response.status_code == 200, (url, response.status_code)
+            body = response.data
+        max_age = response.cache_control.max_age or 0
+        self.cache[url] = {'etag': response.headers.get('ETag'), 'expires': now + max_age, 'body': body}
+        return body
+
+    def load(self, now):
+        stats = {'requests': 0, 'bytes': 0, 'not_modified': 0, 'from_cache': 0}
+        html = self.fetch('/dashboard', now, stats).decode('utf-8')
+        page_bytes = stats['bytes']
+        for url in LOCAL_URL.findall(html):
+            self.fetch(url, now, stats)
+        stats['asset_bytes'] = stats['bytes'] - page_bytes
+        return stats
+
+
+def measure(email):
+    client = app.test_client()
+    client.post('/login', data={'email': email, 'password': datagen.PASSWORD})
+    browser = Browser(client)
+    return {'cold': browser.load(0), 'warm': browser.load(ARGS.reload_after)}
+
+
+def main():
+    email, = datagen.seed(users=1, habits=ARGS.habits, years=1)
+    asset_manifest.load(None, app.static_folder)
+    before = measure(email)
+    # Сборка — во временную копию static/: манифест в исходном дереве подхватил бы
+    # каждый следующий запуск приложения и отдавал устаревшие файлы с immutable
+    source = app.static_folder
+    folder = tempfile.mkdtemp(prefix='habitminder-static-')
+    try:
+        shutil.copytree(source, folder, dirs_exist_ok=True, ignore=shutil.ignore_patterns(assets.OUTPUT_DIR))
+        built = assets.build(folder)
+        app.static_folder = folder
+        asset_manifest.load(os.path.join(folder, assets.OUTPUT_DIR, assets.MANIFEST_NAME), folder)
+        after = measure(email)
+    finally:
+        app.static_folder = source
+        asset_manifest.load(None, source)
+        shutil.rmtree(folder, ignore_errors=True)
+    print(json.dumps({
+        'assets': built,
+        'reload_after_seconds': ARGS.reload_after,
+        'before': before,
+        'after': after,
+    }, ensure_ascii=False, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Календари и статистика по периодам для пользователя со 100 привычками.
+
+Запуск: python benchmarks/bench_calendar.py [--habits 100] [--years 2] [--repeat 20]
+Сравнивает один пакетный проход load_calendars по всем привычкам с
+загрузкой по одной привычке (как при вызове из шаблона) и измеряет
+/dashboard без кэша фрагментов. Данные — benchmarks/datagen.py.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import date
+
+os.environ['FLASK_FRAGMENT_CACHE_BACKEND'] = 'none'
+sys.path.insert(0, os.path.dirname(__file__))
+
+import datagen  # noqa: E402
+from app import Habit, User, app, db, load_calendars  # noqa: E402
+from common import percentile  # noqa: E402
+
+
+def measure(callback, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        callback()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), percentile(timings, 95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--habits', type=int, default=100)
+    parser.add_argument('--years', type=int, default=2)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    email, = datagen.seed(users=1, habits=args.habits, years=args.years)
+    today = date.today()
+    with app.app_context():
+        user_id = db.session.query(User.id).filter_by(email=email).scalar()
+    print(f"Привычек: {args.habits}, истории: {args.years} г., повторов: {args.repeat}")
+
+    with app.app_context():
+        def batched():
+            db.session.expunge_all()
+            load_calendars(Habit.query.filter_by(user_id=user_id).all(), today)
+
+        def per_habit():
+            db.session.expunge_all()
+            for habit in Habit.query.filter_by(user_id=user_id).all():
+                load_calendars([habit], today)
+
+        for label, callback in (('один проход', batched), ('по привычке', per_habit)):
+            median, p95 = measure(callback, args.repeat)
+            print(f"{label:>12}: медиана {median:.2f} мс, p95 {p95:.2f} мс")
+
+    client = app.test_client()
+    client.post('/login', data={'email': email, 'password': datagen.PASSWORD})
+    median, p95 = measure(lambda: client.get('/dashboard', headers={'Cache-Control': 'no-cache'}), args.repeat)
+    print(f"{'/dashboard':>12}: медиана {median:.2f} мс, p95 {p95:.2f} мс")
+
+
+if __name__ == '__main__':
+    main()
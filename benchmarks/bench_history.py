@@ -0,0 +1,85 @@
+"""Микробенчмарк: история привычки в JSON-словаре против битовой карты HabitHistory.
+
+Запуск: python benchmarks/bench_history.py
+"""
+import json
+import os
+import random
+import sys
+import timeit
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from history import HabitHistory  # noqa: E402
+
+YEARS = (1, 5, 10)
+COMPLETION_RATE = 0.7
+REPEAT = 200
+
+
+def make_progress(years, today):
+    """Прежний формат: {'YYYY-MM-DD': bool} за каждый день периода"""
+    random.seed(years)
+    start = today - timedelta(days=365 * years)
+    return {
+        (start + timedelta(days=i)).isoformat(): random.random() < COMPLETION_RATE
+        for i in range((today - start).days + 1)
+    }
+
+
+def dict_count(progress, start, end):
+    start, end = start.isoformat(), end.isoformat()
+    return sum(1 for key, value in progress.items() if value and start <= key <= end)
+
+
+def dict_longest_run(progress):
+    best = run = 0
+    previous = None
+    for key in sorted(key for key, value in progress.items() if value):
+        day = date.fromisoformat(key)
+        run = run + 1 if previous == day - timedelta(days=1) else 1
+        best = max(best, run)
+        previous = day
+    return best
+
+
+def dict_current_run(progress, day):
+    run = 0
+    while progress.get(day.isoformat()):
+        run += 1
+        day -= timedelta(days=1)
+    return run
+
+
+def measure(statement):
+    return min(timeit.repeat(statement, number=REPEAT, repeat=3)) / REPEAT * 1e6
+
+
+def main():
+    today = date.today()
+    window_start = today - timedelta(days=29)
+    print(f"{'лет':>4} {'JSON, байт':>11} {'биты, байт':>11} "
+          f"{'count dict/bit, мкс':>22} {'longest dict/bit, мкс':>24} {'current dict/bit, мкс':>24}")
+    for years in YEARS:
+        progress = make_progress(years, today)
+        history = HabitHistory.from_progress(progress)
+        assert history.count(window_start, today) == dict_count(progress, window_start, today)
+        assert history.longest_run() == dict_longest_run(progress)
+        assert history.current_run(today) == dict_current_run(progress, today)
+
+        json_size = len(json.dumps(progress))
+        bitmap_size = sum(len(data) for data in history.to_bytes().values())
+        count = (measure(lambda: dict_count(progress, window_start, today)),
+                 measure(lambda: history.count(window_start, today)))
+        longest = (measure(lambda: dict_longest_run(progress)),
+                   measure(lambda: history.longest_run()))
+        current = (measure(lambda: dict_current_run(progress, today)),
+                   measure(lambda: history.current_run(today)))
+        print(f"{years:>4} {json_size:>11} {bitmap_size:>11} "
+              f"{count[0]:>10.1f} / {count[1]:<9.1f} {longest[0]:>11.1f} / {longest[1]:<10.1f} "
+              f"{current[0]:>11.1f} / {current[1]:<10.1f}")
+
+
+if __name__ == '__main__':
+    main()
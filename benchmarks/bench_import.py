@@ -0,0 +1,95 @@
+"""Пропускная способность импорта истории (строк в секунду).
+
+Запуск: python benchmarks/bench_import.py [--habits 50] [--days 1000]
+        [--batch-size 100 1000 5000] [--database-url postgresql://...]
+По умолчанию используется временная база SQLite. С --database-url замер
+идёт на указанной базе (схема должна существовать): данные создаются
+под отдельным пользователем и удаляются после замера.
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--habits', type=int, default=50)
+    parser.add_argument('--days', type=int, default=1000)
+    parser.add_argument('--batch-size', type=int, nargs='+', default=[100, 1000, 5000])
+    parser.add_argument('--database-url')
+    return parser.parse_args()
+
+
+ARGS = parse_args()
+if ARGS.database_url:
+    os.environ['DATABASE_URL'] = ARGS.database_url
+else:
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+os.environ.setdefault('SECRET_KEY', 'bench')
+os.environ['LOGGING_LEVEL'] = 'WARNING'
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import importer  # noqa: E402
+from app import CheckIn, Habit, User, app, db, import_checkins  # noqa: E402
+
+
+def seed(email, habits, days):
+    user = User(email=email, password_hash='-')
+    db.session.add(user)
+    db.session.flush()
+    created_at = datetime.utcnow() - timedelta(days=days)
+    db.session.add_all(Habit(title=f'Привычка {number}', frequency='daily', user_id=user.id, created_at=created_at)
+                       for number in range(habits))
+    db.session.commit()
+    return user.id
+
+
+def source(user_id, days):
+    """CSV в памяти: по строке на каждый день каждой привычки"""
+    today = date.today()
+    buffer = io.StringIO()
+    buffer.write('habit_id,date,completed\n')
+    for (habit_id,) in db.session.query(Habit.id).filter_by(user_id=user_id):
+        for offset in range(days):
+            buffer.write(f'{habit_id},{(today - timedelta(days=offset)).isoformat()},{int(offset % 3 != 0)}\n')
+    return buffer.getvalue()
+
+
+def cleanup(user_id):
+    habit_ids = db.session.query(Habit.id).filter_by(user_id=user_id)
+    CheckIn.query.filter(CheckIn.habit_id.in_(habit_ids.scalar_subquery())).delete(synchronize_session=False)
+    Habit.query.filter_by(user_id=user_id).delete()
+    User.query.filter_by(id=user_id).delete()
+    db.session.commit()
+
+
+def main():
+    with app.app_context():
+        if not ARGS.database_url:
+            db.create_all()
+        dialect = db.engine.dialect.name
+        print(f"База: {dialect}, привычек: {ARGS.habits}, дней: {ARGS.days}, строк: {ARGS.habits * ARGS.days}")
+        for batch_size in ARGS.batch_size:
+            user_id = seed(f'bench-{uuid.uuid4().hex[:8]}@example.com', ARGS.habits, ARGS.days)
+            data = source(user_id, ARGS.days)
+            try:
+                # Первый проход — вставка, второй — обновление существующих строк
+                for label in ('вставка', 'upsert'):
+                    started = time.perf_counter()
+                    for report in import_checkins(user_id, importer.parse(io.StringIO(data), 'csv'), batch_size):
+                        pass
+                    elapsed = time.perf_counter() - started
+                    assert report['failed'] == 0, report['errors'][:5]
+                    print(f"пакет {batch_size:>5}, {label:>7}: {report['processed'] / elapsed:>9.0f} строк/с "
+                          f"({elapsed:.2f} с, транзакций {report['batches']})")
+            finally:
+                cleanup(user_id)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""Задержка /dashboard при уровне логирования DEBUG и INFO.
+
+Запуск: python benchmarks/bench_logging.py [--habits 100] [--requests 200]
+Данные — benchmarks/datagen.py во временной базе SQLite; записи журнала пишутся в os.devnull
+через тот же фоновый конвейер, что и в продакшене. Кэш фрагментов отключён:
+иначе повторные запросы не рендерят карточки и не пишут их отладочные записи.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+os.environ['FLASK_FRAGMENT_CACHE_BACKEND'] = 'none'
+sys.path.insert(0, os.path.dirname(__file__))
+
+import datagen  # noqa: E402
+from app import app  # noqa: E402
+from common import percentile  # noqa: E402
+from logging_setup import configure_logging  # noqa: E402
+
+
+def measure(client, requests):
+    timings = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = client.get('/dashboard')
+        timings.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200
+    return statistics.median(timings), percentile(timings, 95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--habits', type=int, default=100)
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    email, = datagen.seed(users=1, habits=args.habits, years=1, frequencies=('daily',))
+    client = app.test_client()
+    client.post('/login', data={'email': email, 'password': datagen.PASSWORD})
+
+    print(f"Привычек: {args.habits}, запросов: {args.requests}")
+    for level in ('DEBUG', 'INFO', 'DEBUG', 'INFO'):
+        configure_logging(level, 'json', os.devnull)
+        measure(client, 10)  # прогрев
+        median, p95 = measure(client, args.requests)
+        print(f"{level:>6}: медиана {median:.2f} мс, p95 {p95:.2f} мс")
+
+
+if __name__ == '__main__':
+    main()
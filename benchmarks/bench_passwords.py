@@ -0,0 +1,114 @@
+"""Входы в секунду на ядро и задержка dashboard во время всплеска входов.
+
+Запуск: python benchmarks/bench_passwords.py [--methods scrypt pbkdf2:sha256:600000]
+        [--workers 1 2] [--storm 24] [--seconds 5]
+Каждая конфигурация (метод хеширования × PASSWORD_HASH_WORKERS) замеряется
+в отдельном процессе. Сначала измеряется задержка /dashboard без нагрузки,
+затем --storm потоков непрерывно входят в систему, а один поток продолжает
+запрашивать /dashboard. Отказы 503 — попытки, не попавшие в очередь
+хеширования (PASSWORD_HASH_QUEUE).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from common import percentile
+
+
+def rounded_percentile(values, p):
+    value = percentile(values, p)
+    return round(value, 3) if value is not None else None
+
+
+def child(storm, seconds):
+    sys.path.insert(0, os.path.dirname(__file__))
+    import datagen
+    from app import app, password_hasher
+
+    email, = datagen.seed(users=1, habits=10, years=1)
+    viewer = app.test_client()
+    viewer.post('/login', data={'email': email, 'password': datagen.PASSWORD})
+
+    def dashboard_timings(stop):
+        timings = []
+        while not stop.is_set():
+            started = time.perf_counter()
+            viewer.get('/dashboard')
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    idle = threading.Event()
+    threading.Timer(min(seconds, 2), idle.set).start()
+    baseline = dashboard_timings(idle)
+
+    stop = threading.Event()
+    codes = []
+    lock = threading.Lock()
+
+    def login_loop():
+        client = app.test_client()
+        local = []
+        while not stop.is_set():
+            local.append(client.post('/login', data={'email': email, 'password': datagen.PASSWORD}).status_code)
+            client.get('/logout')
+        with lock:
+            codes.extend(local)
+
+    threads = [threading.Thread(target=login_loop) for _ in range(storm)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    threading.Timer(seconds, stop.set).start()
+    during = dashboard_timings(stop)
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    logins = codes.count(302)
+    cores = min(password_hasher.workers, os.cpu_count() or 1)
+    print(json.dumps({
+        'method': password_hasher.method,
+        'workers': password_hasher.workers,
+        'logins_per_second': round(logins / elapsed, 1),
+        'logins_per_second_per_core': round(logins / elapsed / cores, 1),
+        'rejected': codes.count(503),
+        'dashboard_idle_p50_ms': rounded_percentile(baseline, 50),
+        'dashboard_storm_p50_ms': rounded_percentile(during, 50),
+        'dashboard_storm_p95_ms': rounded_percentile(during, 95),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--methods', nargs='+', default=['scrypt', 'pbkdf2:sha256:600000'])
+    parser.add_argument('--workers', nargs='+', type=int, default=[1, max(1, os.cpu_count() or 1)])
+    parser.add_argument('--storm', type=int, default=24, help='Потоков, непрерывно выполняющих вход')
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.storm, args.seconds)
+        return
+
+    results = []
+    for method in args.methods:
+        for workers in sorted(set(args.workers)):
+            env = dict(os.environ, FLASK_PASSWORD_HASH_METHOD=method, FLASK_PASSWORD_HASH_WORKERS=str(workers))
+            output = subprocess.run(
+                [sys.executable, __file__, '--child', '--storm', str(args.storm), '--seconds', str(args.seconds)],
+                env=env, check=True, capture_output=True, text=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{method} × {workers}: {result['logins_per_second_per_core']} входов/с на ядро, "
+                  f"dashboard p50 {result['dashboard_idle_p50_ms']} → {result['dashboard_storm_p50_ms']} мс",
+                  file=sys.stderr)
+            results.append(result)
+    print(json.dumps({'cpu_count': os.cpu_count(), 'results': results}, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""Пропускная способность планировщика напоминаний на большой таблице привычек.
+
+Запуск: python benchmarks/bench_reminders.py [--habits 1000000] [--due 3000]
+        [--ticks 5] [--batch-size 500] [--database-url postgresql://...]
+Привычки вставляются пачками напрямую (без истории отметок). Время
+напоминаний разнесено так, что на каждый тик наступает --due напоминаний;
+тик обрабатывается как в flask run-reminders — пачками до исчерпания.
+Для сравнения замеряется наивный проход по всем привычкам с напоминаниями.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--habits', type=int, default=1_000_000)
+    parser.add_argument('--due', type=int, default=3000, help='Наступивших напоминаний на тик')
+    parser.add_argument('--ticks', type=int, default=5)
+    parser.add_argument('--tick-seconds', type=int, default=60)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--habits-per-user', type=int, default=1000)
+    parser.add_argument('--database-url', help='База для замера (по умолчанию временная SQLite)')
+    return parser.parse_args()
+
+
+ARGS = parse_args()
+if ARGS.database_url:
+    os.environ['BENCH_DATABASE_URL'] = ARGS.database_url
+os.environ['FLASK_REMINDER_NOTIFIER'] = 'memory'
+os.environ['FLASK_REMINDER_BATCH_SIZE'] = str(ARGS.batch_size)
+sys.path.insert(0, os.path.dirname(__file__))
+
+import datagen  # noqa: E402
+from app import Habit, User, app, db, dispatch_due_reminders, reminder_service  # noqa: E402
+from sqlalchemy import insert, select, text  # noqa: E402
+
+CHUNK = 50_000
+
+
+def seed(start):
+    """Пользователи и привычки; напоминания i-й привычки наступают в тике i // due"""
+    db.create_all()
+    datagen.cleanup()
+    users = -(-ARGS.habits // ARGS.habits_per_user)
+    db.session.execute(insert(User), [
+        {'email': datagen.email(number), 'password_hash': 'x'} for number in range(users)
+    ])
+    user_ids = [user_id for user_id, in db.session.execute(
+        select(User.id).where(User.email.like('bench%@example.com')).order_by(User.id))]
+    for offset in range(0, ARGS.habits, CHUNK):
+        rows = []
+        for number in range(offset, min(offset + CHUNK, ARGS.habits)):
+            # Наступление внутри тика равномерное; привычки после последнего тика — в будущем
+            due_at = start + timedelta(seconds=number // ARGS.due * ARGS.tick_seconds + number % ARGS.tick_seconds)
+            rows.append({
+                'title': f'Привычка {number}', 'frequency': 'daily', 'created_at': start,
+                'user_id': user_ids[number // ARGS.habits_per_user],
+                'reminder_time': due_at.time(), 'next_reminder_at': due_at,
+            })
+        db.session.execute(insert(Habit), rows)
+        db.session.commit()
+
+
+def naive_scan(now):
+    """Наивный вариант: прочитать все привычки с напоминаниями и отфильтровать в Python"""
+    started = time.perf_counter()
+    due = sum(1 for _, next_at in db.session.execute(
+        select(Habit.id, Habit.next_reminder_at).where(Habit.reminder_time.isnot(None)))
+        if next_at <= now)
+    db.session.rollback()
+    return due, time.perf_counter() - started
+
+
+def main():
+    start = datetime.utcnow().replace(microsecond=0)
+    with app.app_context():
+        started = time.perf_counter()
+        seed(start)
+        seed_seconds = time.perf_counter() - started
+        dialect = db.engine.dialect.name
+        plan = None
+        if dialect == 'sqlite':
+            plan = [row[-1] for row in db.session.execute(text(
+                'EXPLAIN QUERY PLAN SELECT id FROM habit WHERE next_reminder_at <= :now '
+                'ORDER BY next_reminder_at LIMIT 500'), {'now': start})]
+
+        ticks = []
+        for tick in range(ARGS.ticks):
+            now = start + timedelta(seconds=(tick + 1) * ARGS.tick_seconds - 1)
+            sent_before = reminder_service.stats()['sent']
+            started = time.perf_counter()
+            claimed = batches = 0
+            while True:
+                count = dispatch_due_reminders(now)
+                claimed += count
+                batches += 1
+                if count < reminder_service.batch_size:
+                    break
+            elapsed = time.perf_counter() - started
+            ticks.append({
+                'claimed': claimed,
+                'sent': reminder_service.stats()['sent'] - sent_before,
+                'batches': batches,
+                'seconds': round(elapsed, 3),
+                'reminders_per_second': round(claimed / elapsed) if elapsed else None,
+            })
+            print(f"тик {tick + 1}: {claimed} напоминаний за {elapsed:.3f} с", file=sys.stderr)
+
+        naive_due, naive_seconds = naive_scan(start + timedelta(seconds=ARGS.ticks * ARGS.tick_seconds))
+        result = {
+            'database': dialect,
+            'params': {key: getattr(ARGS, key) for key in ('habits', 'due', 'ticks', 'tick_seconds', 'batch_size')},
+            'seed_seconds': round(seed_seconds, 1),
+            'query_plan': plan,
+            'ticks': ticks,
+            'naive_scan': {'due': naive_due, 'seconds': round(naive_seconds, 3)},
+        }
+        if ARGS.database_url:
+            datagen.cleanup()
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+"""Нагрузочный бенчмарк основных маршрутов: задержки (перцентили) и пропускная способность.
+
+Запуск:
+    python benchmarks/bench_routes.py [--users 4] [--habits 30] [--years 2]
+        [--requests 100] [--concurrency 4] [--database-url postgresql://...]
+        [--output results.json] [--compare baseline.json]
+
+Данные генерируются через модели (benchmarks/datagen.py). Последовательный
+режим измеряет каждый маршрут отдельно, конкурентный — смешанную нагрузку
+из нескольких потоков, у каждого свой клиент и пользователь. Результат
+выводится в JSON; --compare печатает изменение перцентилей относительно
+сохранённого прогона.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import date, datetime
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=4)
+    parser.add_argument('--habits', type=int, default=30)
+    parser.add_argument('--years', type=int, default=2)
+    parser.add_argument('--requests', type=int, default=100, help='Запросов на маршрут (на поток в конкурентном режиме)')
+    parser.add_argument('--concurrency', type=int, default=4, help='Потоков в конкурентном режиме (0 — не запускать)')
+    parser.add_argument('--routes', nargs='+', help='Маршруты последовательного режима (по умолчанию все)')
+    parser.add_argument('--database-url', help='База для замера (по умолчанию временная SQLite)')
+    parser.add_argument('--output', help='Файл для JSON-результата (по умолчанию stdout)')
+    parser.add_argument('--compare', help='JSON предыдущего прогона для сравнения')
+    parser.add_argument('--seed', type=int, default=0)
+    return parser.parse_args()
+
+
+ARGS = parse_args()
+if ARGS.database_url:
+    os.environ['BENCH_DATABASE_URL'] = ARGS.database_url
+sys.path.insert(0, os.path.dirname(__file__))
+
+import datagen  # noqa: E402
+from app import Habit, User, app, db  # noqa: E402
+from common import percentile  # noqa: E402
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+class Session:
+    """Клиент одного пользователя с id его привычек"""
+
+    def __init__(self, email):
+        self.email = email
+        self.client = app.test_client()
+        response = self.client.post('/login', data={'email': email, 'password': datagen.PASSWORD})
+        assert response.status_code == 302, f'Не удалось войти как {email}'
+        with app.app_context():
+            user_id = db.session.query(User.id).filter_by(email=email).scalar()
+            self.habit_ids = [habit_id for habit_id, in db.session.query(Habit.id).filter_by(user_id=user_id)]
+
+
+# Сценарии: функция (сессия, генератор случайных чисел) -> ответ
+def login(session, rng):
+    return app.test_client().post('/login', data={'email': session.email, 'password': datagen.PASSWORD})
+
+
+def dashboard(session, rng):
+    return session.client.get('/dashboard')
+
+
+def dashboard_conditional(session, rng):
+    response = session.client.get('/dashboard')
+    return session.client.get('/dashboard', headers={'If-None-Match': response.headers.get('ETag', '')})
+
+
+def api_habits(session, rng):
+    return session.client.get('/api/habits')
+
+
+def update_habit(session, rng):
+    return session.client.post(f'/habit/{rng.choice(session.habit_ids)}/update', json={'date': date.today().isoformat()})
+
+
+def batch_checkins(session, rng):
+    habit_ids = rng.sample(session.habit_ids, min(5, len(session.habit_ids)))
+    return session.client.post('/habits/checkins', json={
+        'operations': [{'habit_id': habit_id, 'date': date.today().isoformat()} for habit_id in habit_ids]
+    })
+
+
+ROUTES = {
+    'login': login,
+    'dashboard': dashboard,
+    'dashboard_304': dashboard_conditional,
+    'api_habits': api_habits,
+    'update_habit': update_habit,
+    'batch_checkins': batch_checkins,
+}
+
+# Доли маршрутов в конкурентном режиме
+MIX = (('dashboard', 5), ('api_habits', 3), ('update_habit', 2), ('dashboard_304', 2), ('login', 1))
+
+
+def summarize(timings, errors, elapsed):
+    timings = sorted(timings)
+    count = len(timings)
+    result = {'count': count, 'errors': errors,
+              'throughput_rps': round(count / elapsed, 2) if elapsed else None}
+    if timings:
+        result.update({f'p{p}_ms': round(percentile(timings, p), 3) for p in PERCENTILES})
+        result['mean_ms'] = round(sum(timings) / count, 3)
+        result['max_ms'] = round(timings[-1], 3)
+    return result
+
+
+def run_sequential(sessions, routes, requests, rng):
+    results = {}
+    for name in routes:
+        scenario = ROUTES[name]
+        for _ in range(min(5, requests)):  # прогрев
+            scenario(sessions[0], rng)
+        timings, errors = [], 0
+        started = time.perf_counter()
+        for number in range(requests):
+            session = sessions[number % len(sessions)]
+            request_started = time.perf_counter()
+            response = scenario(session, rng)
+            timings.append((time.perf_counter() - request_started) * 1000)
+            errors += response.status_code >= 400
+        results[name] = summarize(timings, errors, time.perf_counter() - started)
+        print(f"{name:>15}: p50 {results[name].get('p50_ms')} мс, p95 {results[name].get('p95_ms')} мс, "
+              f"{results[name]['throughput_rps']} запр/с", file=sys.stderr)
+    return results
+
+
+def run_concurrent(sessions, threads, requests, seed):
+    names = [name for name, weight in MIX for _ in range(weight)]
+    timings = {name: [] for name, _ in MIX}
+    errors = {name: 0 for name, _ in MIX}
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(number):
+        rng = random.Random(seed + number)
+        session = sessions[number % len(sessions)]
+        local = []
+        barrier.wait()
+        for _ in range(requests):
+            name = rng.choice(names)
+            started = time.perf_counter()
+            try:
+                failed = ROUTES[name](session, rng).status_code >= 400
+            except Exception:
+                failed = True
+            local.append((name, (time.perf_counter() - started) * 1000, failed))
+        with lock:
+            for name, elapsed, failed in local:
+                timings[name].append(elapsed)
+                errors[name] += failed
+
+    workers = [threading.Thread(target=worker, args=(number,)) for number in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    all_timings = [value for values in timings.values() for value in values]
+    result = {
+        'threads': threads,
+        'total': summarize(all_timings, sum(errors.values()), elapsed),
+        'routes': {name: summarize(timings[name], errors[name], elapsed) for name in timings if timings[name]},
+    }
+    print(f"{'конкурентно':>15}: {threads} потоков, p50 {result['total'].get('p50_ms')} мс, "
+          f"p95 {result['total'].get('p95_ms')} мс, {result['total']['throughput_rps']} запр/с", file=sys.stderr)
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(result, baseline):
+    """Изменение p50/p95 относительно прежнего прогона, в процентах"""
+    print("Сравнение с базовым прогоном (p50 / p95):", file=sys.stderr)
+    for name, current in result['sequential'].items():
+        previous = baseline.get('sequential', {}).get(name)
+        if not previous:
+            continue
+        changes = []
+        for key in ('p50_ms', 'p95_ms'):
+            if previous.get(key):
+                changes.append(f"{(current[key] - previous[key]) / previous[key] * 100:+.1f}%")
+        print(f"{name:>15}: {' / '.join(changes)}", file=sys.stderr)
+
+
+def main():
+    rng = random.Random(ARGS.seed)
+    started = time.perf_counter()
+    emails = datagen.seed(ARGS.users, ARGS.habits, ARGS.years, random_seed=ARGS.seed)
+    seed_seconds = time.perf_counter() - started
+    sessions = [Session(email) for email in emails]
+    with app.app_context():
+        dialect = db.engine.dialect.name
+
+    result = {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'database': dialect,
+            'params': {key: getattr(ARGS, key) for key in ('users', 'habits', 'years', 'requests', 'concurrency', 'seed')},
+            'seed_seconds': round(seed_seconds, 2),
+        },
+        'sequential': run_sequential(sessions, ARGS.routes or list(ROUTES), ARGS.requests, rng),
+    }
+    if ARGS.concurrency:
+        result['concurrent'] = run_concurrent(sessions, ARGS.concurrency, ARGS.requests, ARGS.seed)
+
+    if ARGS.compare:
+        with open(ARGS.compare) as baseline:
+            compare(result, json.load(baseline))
+    output = json.dumps(result, ensure_ascii=False, indent=2)
+    if ARGS.output:
+        with open(ARGS.output, 'w') as target:
+            target.write(output + '\n')
+    else:
+        print(output)
+    if ARGS.database_url:
+        with app.app_context():
+            datagen.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Время старта воркера: от импорта app до первого ответа.
+
+Запуск: python benchmarks/bench_startup.py [--runs 10]
+Каждый замер — отдельный процесс Python, как у пре-форкнутого WSGI-воркера.
+Сравниваются продакшен-режим и INIT_DB_ON_STARTUP=true (create_all и
+проверка администратора при каждом старте).
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PROJECT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+sys.path.insert(0, {path!r})
+from app import app
+imported = time.perf_counter()
+response = app.test_client().get('/')
+assert response.status_code == 200, response.status_code
+done = time.perf_counter()
+print(json.dumps({{'import': imported - started, 'first_response': done - imported}}))
+"""
+
+
+def run_child(env):
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD.format(path=PROJECT_PATH)],
+        env=env, check=True, capture_output=True, text=True
+    ).stdout
+    total = time.perf_counter() - started
+    result = json.loads(output.strip().splitlines()[-1])
+    result['process'] = total
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'startup.db')
+    base_env = dict(os.environ, DATABASE_URL=f'sqlite:///{db_path}', SECRET_KEY='bench', LOGGING_LEVEL='WARNING')
+    base_env.pop('FLASK_RUN_FROM_CLI', None)
+    # Схема создаётся один раз, как это сделал бы flask db upgrade
+    run_child(dict(base_env, FLASK_INIT_DB_ON_STARTUP='true'))
+
+    modes = {
+        'production': base_env,
+        'init_db_on_startup': dict(base_env, FLASK_INIT_DB_ON_STARTUP='true'),
+    }
+    results = {}
+    for name, env in modes.items():
+        runs = [run_child(env) for _ in range(args.runs)]
+        results[name] = {
+            key: round(statistics.median(run[key] for run in runs) * 1000, 1)
+            for key in ('import', 'first_response', 'process')
+        }
+        print(f"{name:>20}: импорт {results[name]['import']} мс, первый ответ "
+              f"{results[name]['first_response']} мс, процесс целиком {results[name]['process']} мс")
+    print(json.dumps(results))
+
+
+if __name__ == '__main__':
+    main()
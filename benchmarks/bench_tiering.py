@@ -0,0 +1,154 @@
+"""Размер истории и скорость панели до и после переноса старых отметок в архив.
+
+Запуск: python benchmarks/bench_tiering.py [--users 20] [--habits 30] [--years 5]
+        [--requests 50] [--database-url postgresql://...]
+Сначала замеряется база с полной историей в check_in, затем выполняется
+compact-history (горизонт HISTORY_HOT_DAYS) и замеры повторяются. Панель
+запрашивается без кэша фрагментов и без ETag — каждый раз с чтением
+календарей из базы. Результаты выгрузки и статистики сверяются до и после.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--habits', type=int, default=30)
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--requests', type=int, default=50, help='Запросов панели на замер')
+    parser.add_argument('--database-url', help='База для замера (по умолчанию временная SQLite)')
+    return parser.parse_args()
+
+
+ARGS = parse_args()
+if ARGS.database_url:
+    os.environ['BENCH_DATABASE_URL'] = ARGS.database_url
+
+import datagen  # noqa: E402
+import export  # noqa: E402
+from app import (CheckIn, CheckInArchive, Habit, User, app, compact_history, db,  # noqa: E402
+                 fragment_cache, hot_history_start, iter_history_rows)
+from common import percentile  # noqa: E402
+from sqlalchemy import event, func, text  # noqa: E402
+
+statements = 0
+
+
+def table_bytes(name):
+    """Размер таблицы с индексами в байтах (None, если СУБД не сообщает)"""
+    dialect = db.engine.dialect.name
+    try:
+        if dialect == 'postgresql':
+            return db.session.execute(text('SELECT pg_total_relation_size(:name)'), {'name': name}).scalar()
+        if dialect == 'sqlite':
+            return db.session.execute(text(
+                "SELECT SUM(pgsize) FROM dbstat WHERE name = :name OR name LIKE :index"
+            ), {'name': name, 'index': f'sqlite_autoindex_{name}_%'}).scalar() or 0
+    except Exception:
+        db.session.rollback()
+    return None
+
+
+def storage():
+    rows = db.session.query(func.count()).select_from(CheckIn).scalar()
+    archives = db.session.query(func.count(), func.sum(func.length(CheckInArchive.data))).one()
+    result = {
+        'check_in_rows': rows,
+        'check_in_bytes': table_bytes('check_in'),
+        'archive_rows': archives[0],
+        'archive_data_bytes': int(archives[1] or 0),
+        'archive_bytes': table_bytes('check_in_archive'),
+    }
+    db.session.rollback()
+    return result
+
+
+def dashboard(clients):
+    """p50/p95 холодной панели и число SQL-запросов на запрос"""
+    global statements
+    timings, counted = [], []
+    for number in range(ARGS.requests):
+        client = clients[number % len(clients)]
+        fragment_cache.clear()
+        statements = 0
+        started = time.perf_counter()
+        response = client.get('/dashboard')
+        timings.append((time.perf_counter() - started) * 1000)
+        counted.append(statements)
+        assert response.status_code == 200, response.status_code
+    return {
+        'p50_ms': round(percentile(timings, 50), 2),
+        'p95_ms': round(percentile(timings, 95), 2),
+        'statements': round(statistics.mean(counted), 1),
+    }
+
+
+def snapshot(emails):
+    """Выгрузка и агрегаты всех пользователей — для сверки уровней"""
+    users = [user_id for user_id, in db.session.query(User.id).filter(User.email.in_(emails)).order_by(User.id)]
+    exported = [b''.join(export.encode(iter_history_rows(user_id), 'ndjson')) for user_id in users]
+    stats = []
+    for habit in Habit.query.filter(Habit.user_id.in_(users)).order_by(Habit.id):
+        habit.recalculate_stats()
+        stats.append(habit.stats())
+    db.session.rollback()
+    return exported, stats
+
+
+def main():
+    started = time.perf_counter()
+    emails = datagen.seed(users=ARGS.users, habits=ARGS.habits, years=ARGS.years)
+    print(f"Данные созданы за {time.perf_counter() - started:.1f} с", file=sys.stderr)
+    clients = []
+    for email in emails:
+        client = app.test_client()
+        client.post('/login', data={'email': email, 'password': datagen.PASSWORD})
+        clients.append(client)
+
+    with app.app_context():
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def _count(*args):
+            global statements
+            statements += 1
+
+        before = {'storage': storage(), 'dashboard': dashboard(clients)}
+        expected = snapshot(emails)
+        boundary = hot_history_start()
+        started = time.perf_counter()
+        habits, moved = compact_history(boundary)
+        compact_seconds = time.perf_counter() - started
+        print(f"В архив перенесено {moved} строк за {compact_seconds:.1f} с", file=sys.stderr)
+        if db.engine.dialect.name == 'sqlite':
+            db.session.execute(text('VACUUM'))
+        after = {'storage': storage(), 'dashboard': dashboard(clients)}
+        consistent = snapshot(emails) == expected
+        habit_years = ARGS.users * ARGS.habits * ARGS.years
+        result = {
+            'database': db.engine.dialect.name,
+            'params': {key: getattr(ARGS, key) for key in ('users', 'habits', 'years', 'requests')},
+            'hot_start': boundary.isoformat(),
+            'compaction': {'habits': habits, 'rows': moved, 'seconds': round(compact_seconds, 2)},
+            'before': before,
+            'after': after,
+            'bytes_per_archived_habit_year': {
+                'check_in': round(before['storage']['check_in_bytes'] / habit_years)
+                if before['storage']['check_in_bytes'] else None,
+                'archive_data': round(after['storage']['archive_data_bytes'] / after['storage']['archive_rows'])
+                if after['storage']['archive_rows'] else None,
+            },
+            'export_and_stats_unchanged': consistent,
+        }
+        if ARGS.database_url:
+            datagen.cleanup()
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""Коммиты на запрос при всплесках переключений: обычная запись против write-behind.
+
+Запуск: python benchmarks/bench_write_behind.py [--users 8] [--habits 10]
+        [--bursts 200] [--interval-ms 250]
+Каждый поток — отдельный пользователь, который серией быстрых кликов переключает
+сегодняшний день случайной привычки (1–6 кликов подряд, как двойные клики
+и передумывания). Считаются все COMMIT — и в запросах, и в фоновом сбросе;
+после прогона итоговые отметки сверяются с ожидаемыми по чётности кликов.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import datagen  # noqa: E402
+from app import CheckIn, Habit, User, app, db, write_behind  # noqa: E402
+from common import percentile  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+BURST_SIZES = (1, 1, 1, 2, 2, 3, 4, 6)
+
+commits = 0
+commit_lock = threading.Lock()
+
+
+@event.listens_for(Session, 'after_commit')
+def _count_commit(session):
+    global commits
+    with commit_lock:
+        commits += 1
+
+
+def user_habits(email):
+    with app.app_context():
+        user_id = db.session.query(User.id).filter_by(email=email).scalar()
+        return [habit_id for habit_id, in db.session.query(Habit.id).filter_by(user_id=user_id)]
+
+
+def final_states(habit_ids):
+    with app.app_context():
+        rows = db.session.query(CheckIn.habit_id, CheckIn.completed).filter(
+            CheckIn.habit_id.in_(habit_ids), CheckIn.day == date.today())
+        return {habit_id: completed for habit_id, completed in rows}
+
+
+def run(mode, emails, bursts, seed):
+    global commits
+    write_behind.enabled = mode == 'write_behind'
+    clients = []
+    for email in emails:
+        client = app.test_client()
+        client.post('/login', data={'email': email, 'password': datagen.PASSWORD})
+        clients.append((client, user_habits(email)))
+    habit_ids = [habit_id for _, habits in clients for habit_id in habits]
+    before = final_states(habit_ids)
+    clicks = {habit_id: 0 for habit_id in habit_ids}
+    timings = []
+    lock = threading.Lock()
+
+    def worker(number, client, habits):
+        rng = random.Random(seed + number)
+        local = []
+        for _ in range(bursts // len(clients)):
+            habit_id = rng.choice(habits)
+            for _ in range(rng.choice(BURST_SIZES)):
+                started = time.perf_counter()
+                response = client.post(f'/habit/{habit_id}/update', json={'date': date.today().isoformat()})
+                local.append((time.perf_counter() - started) * 1000)
+                assert response.status_code == 200, response.get_data(as_text=True)
+                with lock:
+                    clicks[habit_id] += 1
+                time.sleep(rng.uniform(0, 0.03))
+        with lock:
+            timings.extend(local)
+
+    commits = 0
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(number, client, habits))
+               for number, (client, habits) in enumerate(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    write_behind.flush()
+
+    after = final_states(habit_ids)
+    mismatches = sum(
+        bool(after.get(habit_id)) != (bool(before.get(habit_id)) ^ (count % 2 == 1))
+        for habit_id, count in clicks.items()
+    )
+    requests = len(timings)
+    return {
+        'requests': requests,
+        'commits': commits,
+        'commits_per_request': round(commits / requests, 3),
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'throughput_rps': round(requests / elapsed, 1),
+        'mismatches': mismatches,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=8)
+    parser.add_argument('--habits', type=int, default=10)
+    parser.add_argument('--bursts', type=int, default=200)
+    parser.add_argument('--interval-ms', type=int, default=250)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    emails = datagen.seed(users=args.users, habits=args.habits, years=1, frequencies=('daily',))
+    write_behind.interval = args.interval_ms / 1000
+    results = {mode: run(mode, emails, args.bursts, args.seed) for mode in ('direct', 'write_behind')}
+    results['write_behind']['stats'] = write_behind.stats()
+    saved = results['direct']['commits'] - results['write_behind']['commits']
+    results['commits_saved_per_request'] = round(saved / results['write_behind']['requests'], 3)
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
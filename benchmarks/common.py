@@ -0,0 +1,19 @@
+"""Общие расчёты бенчмарков.
+
+Модуль без побочных эффектов: в отличие от datagen, его можно импортировать
+до настройки окружения и до app (например, в родительском процессе).
+"""
+import math
+
+
+def percentile(values, p):
+    """Перцентиль p (0–100) методом ближайшего ранга; None для пустой выборки.
+
+    Результат — одно из значений выборки: наименьшее, не меньше которого
+    p% значений. Для малых выборок p95 совпадает с максимумом, а не
+    занижается до одного из нижних значений.
+    """
+    values = sorted(values)
+    if not values:
+        return None
+    return values[max(math.ceil(len(values) * p / 100), 1) - 1]
@@ -0,0 +1,87 @@
+"""Генератор синтетических данных для бенчмарков: пользователи × привычки × годы истории.
+
+Данные создаются через модели приложения (User, Habit, upsert_checkins,
+recalculate_stats), поэтому агрегаты и версии согласованы так же, как
+в рабочей базе. Генерация детерминирована параметром random_seed.
+
+Модуль настраивает окружение при импорте: используется временная база
+SQLite либо база из BENCH_DATABASE_URL (DATABASE_URL окружения намеренно
+игнорируется, чтобы не засорить рабочую базу). Импортировать его нужно до app.
+"""
+import os
+import random
+import sys
+import tempfile
+from datetime import date, datetime, timedelta
+
+os.environ['DATABASE_URL'] = os.environ.get('BENCH_DATABASE_URL') or \
+    f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+os.environ.setdefault('SECRET_KEY', 'bench')
+os.environ['FLASK_WTF_CSRF_ENABLED'] = 'false'
+os.environ.setdefault('LOGGING_LEVEL', 'WARNING')
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import CheckIn, CheckInArchive, Habit, User, app, db, upsert_checkins  # noqa: E402
+
+PASSWORD = 'benchpassword'
+FREQUENCIES = ('daily', 'weekly', 'monthly')
+# Шаг отметок в днях для каждой частоты
+STEPS = {'daily': 1, 'weekly': 7, 'monthly': 30}
+BATCH_SIZE = 5000
+
+
+def email(number, prefix='bench'):
+    return f'{prefix}{number}@example.com'
+
+
+def seed(users=1, habits=10, years=1, completion=0.7, frequencies=FREQUENCIES, prefix='bench', random_seed=0):
+    """Создаёт пользователей с привычками и историей; возвращает список email.
+
+    Пароль всех пользователей — PASSWORD (хеш вычисляется один раз).
+    Существующие пользователи с теми же email пересоздаются.
+    """
+    rng = random.Random(random_seed)
+    today = date.today()
+    days = 365 * years
+    with app.app_context():
+        db.create_all()
+        cleanup(prefix)
+        template = User()
+        template.set_password(PASSWORD)
+        emails = []
+        for number in range(users):
+            user = User(email=email(number, prefix), password_hash=template.password_hash)
+            db.session.add(user)
+            db.session.flush()
+            rows = []
+            for index in range(habits):
+                frequency = frequencies[index % len(frequencies)]
+                habit = Habit(title=f'Привычка {index}', frequency=frequency, user_id=user.id,
+                              created_at=datetime.utcnow() - timedelta(days=days))
+                db.session.add(habit)
+                db.session.flush()
+                rows += [
+                    {'habit_id': habit.id, 'day': today - timedelta(days=offset), 'completed': rng.random() < completion}
+                    # Сегодня не отмечено: бенчмарки переключают текущий день
+                    for offset in range(1, days, STEPS[frequency])
+                ]
+                if len(rows) >= BATCH_SIZE:
+                    upsert_checkins(rows)
+                    rows = []
+            upsert_checkins(rows)
+            for habit in user.habits:
+                habit.recalculate_stats()
+            db.session.commit()
+            emails.append(user.email)
+        return emails
+
+
+def cleanup(prefix='bench'):
+    """Удаляет пользователей бенчмарка вместе с привычками и отметками"""
+    user_ids = db.session.query(User.id).filter(User.email.like(f'{prefix}%@example.com'))
+    habit_ids = db.session.query(Habit.id).filter(Habit.user_id.in_(user_ids.scalar_subquery()))
+    CheckIn.query.filter(CheckIn.habit_id.in_(habit_ids.scalar_subquery())).delete(synchronize_session=False)
+    CheckInArchive.query.filter(CheckInArchive.habit_id.in_(habit_ids.scalar_subquery())).delete(synchronize_session=False)
+    Habit.query.filter(Habit.user_id.in_(user_ids.scalar_subquery())).delete(synchronize_session=False)
+    User.query.filter(User.email.like(f'{prefix}%@example.com')).delete(synchronize_session=False)
+    db.session.commit()
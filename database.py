@@ -0,0 +1,78 @@
+"""Настройка движков SQLAlchemy: пул соединений и чтение с реплики.
+
+Параметры пула берутся из конфигурации приложения (DB_POOL_*). В режиме
+DB_PGBOUNCER пулом управляет PgBouncer, а приложение открывает соединение
+на каждую транзакцию (NullPool). Реплика подключается как bind 'replica':
+представления, помеченные для чтения с реплики, выполняют на ней только
+SELECT без FOR UPDATE — flush, INSERT/UPDATE/DELETE и блокирующие чтения
+всегда идут на основную базу.
+"""
+import os
+
+from flask_sqlalchemy.session import Session
+from sqlalchemy import Select
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool, QueuePool
+
+REPLICA_BIND = 'replica'
+
+
+def engine_options(url, config):
+    """Параметры create_engine для URL с учётом настроек пула"""
+    url = make_url(url)
+    if url.get_backend_name() == 'sqlite':
+        # Пулом SQLite управляет Flask-SQLAlchemy; размеры пула к файлу неприменимы
+        return {'pool_pre_ping': bool(config['DB_POOL_PRE_PING'])}
+    if config['DB_PGBOUNCER']:
+        options = {'poolclass': NullPool}
+        if url.get_driver_name() == 'psycopg':
+            # В транзакционном режиме PgBouncer подготовленные выражения не переживают транзакцию
+            options['connect_args'] = {'prepare_threshold': None}
+        return options
+    return {
+        'pool_size': int(config['DB_POOL_SIZE']),
+        'max_overflow': int(config['DB_MAX_OVERFLOW']),
+        'pool_timeout': float(config['DB_POOL_TIMEOUT']),
+        'pool_recycle': int(config['DB_POOL_RECYCLE']),
+        'pool_pre_ping': bool(config['DB_POOL_PRE_PING']),
+    }
+
+
+class RoutingSession(Session):
+    """Сессия, отправляющая чтение на реплику при session.info['use_replica']"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and self.info.get('use_replica') and not self._flushing
+                and isinstance(clause, Select) and clause._for_update_arg is None):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def dispose_after_fork(engines):
+    """Дочерний процесс pre-fork сервера не должен использовать соединения родителя"""
+    engines = list(engines)
+
+    def dispose():
+        for engine in engines:
+            engine.dispose(close=False)
+
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=dispose)
+
+
+def pool_metrics(engines):
+    """Состояние пулов для /metrics: [(имя, тип, описание, значение)]"""
+    metrics = []
+    for name, engine in engines.items():
+        pool = engine.pool
+        if not isinstance(pool, QueuePool):
+            continue
+        bind = name or 'primary'
+        metrics += [
+            (f'db_pool_{bind}_checked_out', 'gauge', f'Пул {bind}: выданные соединения', pool.checkedout()),
+            (f'db_pool_{bind}_idle', 'gauge', f'Пул {bind}: свободные соединения', pool.checkedin()),
+            (f'db_pool_{bind}_overflow', 'gauge', f'Пул {bind}: соединения сверх pool_size (отрицательное — незанятые места пула)', pool.overflow()),
+        ]
+    return metrics
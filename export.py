@@ -0,0 +1,87 @@
+"""Потоковая выгрузка истории привычек в NDJSON и CSV.
+
+Функции принимают итератор строк (habit_id, title, frequency, created_at,
+day, completed), упорядоченных по привычке и дню, и отдают байтовые
+куски ограниченного размера — память не зависит от объёма истории.
+"""
+import csv
+import io
+import json
+import zlib
+
+# Размер куска, отдаваемого клиенту
+CHUNK_SIZE = 64 * 1024
+
+CSV_COLUMNS = ('habit_id', 'title', 'frequency', 'created_at', 'date', 'completed')
+
+FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv', 'csv'),
+}
+
+
+def _chunked(pieces):
+    """Склеивает мелкие строки в куски около CHUNK_SIZE байт"""
+    buffer, size = [], 0
+    for piece in pieces:
+        data = piece.encode('utf-8')
+        buffer.append(data)
+        size += len(data)
+        if size >= CHUNK_SIZE:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def _ndjson_lines(rows):
+    current = None
+    for habit_id, title, frequency, created_at, day, completed in rows:
+        if habit_id != current:
+            current = habit_id
+            yield json.dumps({
+                'type': 'habit',
+                'id': habit_id,
+                'title': title,
+                'frequency': frequency,
+                'created_at': created_at.isoformat() if created_at else None
+            }, ensure_ascii=False) + '\n'
+        if day is not None:
+            yield json.dumps({
+                'type': 'checkin',
+                'habit_id': habit_id,
+                'date': day.isoformat(),
+                'completed': bool(completed)
+            }) + '\n'
+
+
+def _csv_lines(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for habit_id, title, frequency, created_at, day, completed in rows:
+        writer.writerow((
+            habit_id, title, frequency,
+            created_at.isoformat() if created_at else '',
+            day.isoformat() if day else '',
+            '' if day is None else int(bool(completed))
+        ))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def encode(rows, export_format):
+    """Байтовые куски выгрузки в формате ndjson или csv"""
+    lines = _ndjson_lines(rows) if export_format == 'ndjson' else _csv_lines(rows)
+    return _chunked(lines)
+
+
+def gzip_chunks(chunks):
+    """Сжатие потока кусков в формат gzip на лету"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
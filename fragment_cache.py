@@ -0,0 +1,50 @@
+"""Кэш отрендеренных фрагментов страниц (карточек привычек на dashboard).
+
+Ключ фрагмента включает версию объекта и дату, поэтому явная очистка не
+нужна: после изменения привычки её старый фрагмент просто перестаёт
+запрашиваться и вытесняется по LRU или TTL.
+"""
+import os
+import tempfile
+
+from user_cache import BACKENDS, NullBackend
+
+
+class FragmentCache:
+    """Расширение Flask: настройки FRAGMENT_CACHE_BACKEND (memory, sqlite, none),
+    FRAGMENT_CACHE_SIZE, FRAGMENT_CACHE_TTL (секунды), FRAGMENT_CACHE_PATH."""
+
+    def __init__(self, app=None):
+        self.backend = NullBackend()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('FRAGMENT_CACHE_BACKEND', 'memory')
+        app.config.setdefault('FRAGMENT_CACHE_SIZE', 4096)
+        app.config.setdefault('FRAGMENT_CACHE_TTL', 24 * 3600)
+        app.config.setdefault('FRAGMENT_CACHE_PATH', None)
+        name = app.config['FRAGMENT_CACHE_BACKEND']
+        if name not in BACKENDS:
+            raise ValueError(f"Неизвестный бэкенд кэша фрагментов: {name}")
+        kwargs = {
+            'maxsize': int(app.config['FRAGMENT_CACHE_SIZE']),
+            'ttl': float(app.config['FRAGMENT_CACHE_TTL']),
+        }
+        if name == 'sqlite':
+            kwargs['path'] = app.config['FRAGMENT_CACHE_PATH'] or os.path.join(
+                tempfile.gettempdir(), 'habitminder-fragment-cache.sqlite')
+        self.backend = BACKENDS[name](**kwargs)
+        app.extensions['fragment_cache'] = self
+
+    def get(self, key):
+        return self.backend.get(key)
+
+    def set(self, key, fragment):
+        self.backend.set(key, fragment)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        return self.backend.stats()
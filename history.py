@@ -0,0 +1,170 @@
+"""Компактное представление истории привычки: по одному битовому полю на год.
+
+Бит с номером N в поле года соответствует (N+1)-му дню года,
+установленный бит — привычка выполнена в этот день. Год занимает 46 байт
+вместо десятков байт на каждую дату в JSON-словаре.
+"""
+import calendar
+from datetime import date, timedelta
+
+# int.bit_count появился в Python 3.10
+_popcount = getattr(int, 'bit_count', lambda value: bin(value).count('1'))
+
+
+def days_in_year(year):
+    return 366 if calendar.isleap(year) else 365
+
+
+def _day_index(day):
+    return day.timetuple().tm_yday - 1
+
+
+class HabitHistory:
+    """Множество выполненных дней привычки, упакованное в битовые поля по годам"""
+
+    __slots__ = ('years',)
+
+    def __init__(self, years=None):
+        self.years = {year: bits for year, bits in (years or {}).items() if bits}
+
+    # Конвертация
+
+    @classmethod
+    def from_days(cls, days):
+        history = cls()
+        for day in days:
+            history.set(day)
+        return history
+
+    @classmethod
+    def from_progress(cls, progress):
+        """Из прежнего JSON-формата {'YYYY-MM-DD': bool}; невыполненные дни не хранятся"""
+        return cls.from_days(date.fromisoformat(key) for key, completed in progress.items() if completed)
+
+    def to_progress(self):
+        return {day.isoformat(): True for day in self.days()}
+
+    @classmethod
+    def from_bytes(cls, data_by_year):
+        """Из словаря {год: bytes}, полученного через to_bytes"""
+        return cls({year: int.from_bytes(data, 'little') for year, data in data_by_year.items()})
+
+    def to_bytes(self):
+        """Словарь {год: bytes} длиной 46 байт на год — для хранения и передачи"""
+        return {
+            year: bits.to_bytes((days_in_year(year) + 7) // 8, 'little')
+            for year, bits in sorted(self.years.items())
+        }
+
+    # Изменение и точечные запросы
+
+    def set(self, day, completed=True):
+        bit = 1 << _day_index(day)
+        bits = self.years.get(day.year, 0)
+        bits = bits | bit if completed else bits & ~bit
+        if bits:
+            self.years[day.year] = bits
+        else:
+            self.years.pop(day.year, None)
+
+    def is_completed(self, day):
+        return bool(self.years.get(day.year, 0) >> _day_index(day) & 1)
+
+    __contains__ = is_completed
+
+    def __bool__(self):
+        return bool(self.years)
+
+    def __eq__(self, other):
+        return isinstance(other, HabitHistory) and self.years == other.years
+
+    def first_day(self):
+        if not self.years:
+            return None
+        year = min(self.years)
+        bits = self.years[year]
+        return date(year, 1, 1) + timedelta(days=(bits & -bits).bit_length() - 1)
+
+    def last_day(self):
+        if not self.years:
+            return None
+        year = max(self.years)
+        return date(year, 1, 1) + timedelta(days=self.years[year].bit_length() - 1)
+
+    def days(self, start=None, end=None):
+        """Выполненные дни по возрастанию, с необязательными границами [start, end]"""
+        for year in sorted(self.years):
+            if (start and year < start.year) or (end and year > end.year):
+                continue
+            bits = self.years[year]
+            first = date(year, 1, 1)
+            while bits:
+                low = bits & -bits
+                day = first + timedelta(days=low.bit_length() - 1)
+                bits ^= low
+                if start and day < start:
+                    continue
+                if end and day > end:
+                    return
+                yield day
+
+    # Агрегаты
+
+    def _span(self, start, end):
+        """Биты периода [start, end] одним целым числом: бит 0 — день start"""
+        span = 0
+        for year in range(start.year, end.year + 1):
+            bits = self.years.get(year, 0)
+            if not bits:
+                continue
+            offset = (date(year, 1, 1) - start).days
+            span |= bits << offset if offset >= 0 else bits >> -offset
+        return span & ((1 << ((end - start).days + 1)) - 1)
+
+    def _bounds(self, start, end):
+        return start or date(min(self.years), 1, 1), end or date(max(self.years), 12, 31)
+
+    def window_bits(self, start, end):
+        """Биты периода [start, end] одним целым числом: бит 0 — день start"""
+        if start > end:
+            return 0
+        return self._span(start, end)
+
+    def window_bytes(self, start, end):
+        """Биты периода в виде bytes (little-endian) — компактная передача окна календаря"""
+        length = (end - start).days + 1 if end >= start else 0
+        return self.window_bits(start, end).to_bytes((length + 7) // 8, 'little')
+
+    def count(self, start=None, end=None):
+        """Количество выполненных дней в периоде [start, end]"""
+        if not self.years:
+            return 0
+        if start is None and end is None:
+            return sum(_popcount(bits) for bits in self.years.values())
+        start, end = self._bounds(start, end)
+        if start > end:
+            return 0
+        return _popcount(self._span(start, end))
+
+    def longest_run(self, start=None, end=None):
+        """Самая длинная серия подряд выполненных дней в периоде"""
+        if not self.years:
+            return 0
+        start, end = self._bounds(start, end)
+        if start > end:
+            return 0
+        bits = self._span(start, end)
+        run = 0
+        while bits:
+            bits &= bits >> 1
+            run += 1
+        return run
+
+    def current_run(self, day):
+        """Длина серии выполненных дней, заканчивающейся в day (0, если day не выполнен)"""
+        if not self.is_completed(day):
+            return 0
+        start = date(min(self.years), 1, 1)
+        length = (day - start).days + 1
+        gaps = ~self._span(start, day) & ((1 << length) - 1)
+        return length - gaps.bit_length()
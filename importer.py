@@ -0,0 +1,84 @@
+"""Разбор файлов импорта истории: CSV и NDJSON в формате выгрузки (см. export.py).
+
+Разбор потоковый: файл читается построчно, каждая строка превращается
+либо в ImportRecord, либо в RowError с номером строки — ошибка
+одной строки не прерывает обработку файла.
+"""
+import csv
+import json
+from collections import namedtuple
+from datetime import date
+
+FORMATS = ('csv', 'ndjson')
+
+# habit_id — id привычки или None, тогда привычка ищется по title
+ImportRecord = namedtuple('ImportRecord', 'line habit_id title day completed')
+RowError = namedtuple('RowError', 'line message')
+
+_TRUE = {'1', 'true', 'yes', 'y', 'да', '+'}
+_FALSE = {'0', 'false', 'no', 'n', 'нет', '-'}
+
+
+def _parse_completed(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    raise ValueError(f"Неверное значение completed: {value!r}")
+
+
+def _parse_habit_id(value):
+    if value in (None, ''):
+        return None
+    if isinstance(value, bool):
+        raise ValueError("Неверный habit_id")
+    return int(value)
+
+
+def _record(line, habit_id, title, day, completed):
+    habit_id = _parse_habit_id(habit_id)
+    if habit_id is None and not title:
+        raise ValueError("Нужен habit_id или title")
+    if not isinstance(day, str) or len(day) != 10:
+        raise ValueError("Неверный формат даты. Используйте YYYY-MM-DD")
+    return ImportRecord(line, habit_id, title or None, date.fromisoformat(day), _parse_completed(completed))
+
+
+def parse_csv(lines):
+    """CSV с заголовком: habit_id и/или title, date, completed (остальные колонки игнорируются)"""
+    reader = csv.DictReader(lines)
+    missing = {'date', 'completed'} - set(reader.fieldnames or ())
+    if missing or not {'habit_id', 'title'} & set(reader.fieldnames or ()):
+        yield RowError(1, "Заголовок CSV должен содержать habit_id или title, date и completed")
+        return
+    for row in reader:
+        line = reader.line_num
+        if not row.get('date'):
+            continue  # привычка без отметок в выгрузке
+        try:
+            yield _record(line, row.get('habit_id'), row.get('title'), row['date'], row['completed'])
+        except (ValueError, TypeError) as e:
+            yield RowError(line, str(e))
+
+
+def parse_ndjson(lines):
+    """NDJSON: строки {"type": "checkin", "habit_id", "date", "completed"}; строки привычек пропускаются"""
+    for line, text in enumerate(lines, start=1):
+        if not text.strip():
+            continue
+        try:
+            item = json.loads(text)
+            if not isinstance(item, dict):
+                raise ValueError("Строка должна быть JSON-объектом")
+            if item.get('type', 'checkin') != 'checkin':
+                continue
+            yield _record(line, item.get('habit_id'), item.get('title'), item.get('date'), item.get('completed', True))
+        except (ValueError, TypeError) as e:
+            yield RowError(line, str(e))
+
+
+def parse(lines, import_format):
+    return parse_csv(lines) if import_format == 'csv' else parse_ndjson(lines)
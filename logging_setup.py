@@ -0,0 +1,79 @@
+"""Настройка логирования: записи уходят в очередь и пишутся фоновым потоком.
+
+Поток запроса только кладёт запись в очередь (QueueHandler), а
+форматирование и запись в поток или файл выполняет QueueListener.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from datetime import datetime, timezone
+
+# Стандартные атрибуты LogRecord, которые не считаются дополнительными полями
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись — одна строка JSON; поля из extra= попадают в объект как есть"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler без предварительного форматирования: запись отдаётся слушателю целиком"""
+
+    def prepare(self, record):
+        # Аргументы подставляются сразу, чтобы изменяемые объекты не поменялись до записи
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def configure_logging(level='INFO', log_format='json', log_file=None):
+    """Перенастраивает корневой логгер; безопасно вызывать повторно"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+
+    if log_file:
+        target = logging.FileHandler(log_file, encoding='utf-8')
+    else:
+        target = logging.StreamHandler(sys.stderr)
+    if log_format == 'json':
+        target.setFormatter(JsonFormatter())
+    else:
+        target.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(_QueueHandler(log_queue))
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+
+    _listener = logging.handlers.QueueListener(log_queue, target, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+@atexit.register
+def _stop_listener():
+    """Дописывает накопленные записи при завершении процесса"""
+    if _listener is not None:
+        _listener.stop()
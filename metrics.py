@@ -0,0 +1,248 @@
+"""Метрики производительности запросов в формате Prometheus.
+
+Для каждого endpoint собираются гистограммы времени ответа, времени
+рендеринга шаблонов, количества SQL-запросов и суммарного времени SQL.
+Метрики хранятся в памяти процесса: при нескольких WSGI-воркерах каждый
+отдаёт свои значения, а суммирует их Prometheus по метке instance.
+
+Endpoint /metrics раскрывает трафик и задержки по маршрутам, поэтому
+регистрируется, только если задан доступ: токен (METRICS_TOKEN, заголовок
+Authorization: Bearer) и/или список адресов (METRICS_ALLOWED_IPS — адреса
+и сети через запятую). Заданы оба — проверяются оба.
+"""
+import hmac
+import ipaddress
+import logging
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, g, has_request_context, request, template_rendered, before_render_template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+# Максимум SQL-запросов, сохраняемых для журнала медленных запросов
+MAX_LOGGED_STATEMENTS = 50
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self):
+        """Кумулятивные значения корзин вместе с +Inf"""
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            yield _format_bound(bound), total
+        yield '+Inf', self.count
+
+
+def _format_bound(value):
+    return repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class RequestStats:
+    """Счётчики одного запроса, хранятся в flask.g"""
+
+    __slots__ = ('started', 'render_time', 'render_started', 'sql_count', 'sql_time', 'statements')
+
+    def __init__(self, collect_statements):
+        self.started = time.perf_counter()
+        self.render_time = 0.0
+        self.render_started = None
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.statements = [] if collect_statements else None
+
+
+class Metrics:
+    """Расширение Flask: сбор метрик и endpoint /metrics.
+
+    Настройки: METRICS_ENABLED, METRICS_PREFIX,
+    METRICS_SLOW_REQUEST_MS (0 — журнал медленных запросов выключен),
+    METRICS_TOKEN и METRICS_ALLOWED_IPS (доступ к /metrics).
+    """
+
+    HISTOGRAMS = (
+        ('request_duration_seconds', 'Время обработки запроса', TIME_BUCKETS),
+        ('template_render_seconds', 'Время рендеринга шаблонов за запрос', TIME_BUCKETS),
+        ('db_statements', 'Количество SQL-запросов за запрос', COUNT_BUCKETS),
+        ('db_time_seconds', 'Суммарное время SQL-запросов за запрос', TIME_BUCKETS),
+    )
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._requests = {}
+        self._collectors = []
+        self.prefix = 'habitminder'
+        self.slow_request_seconds = 0
+        self.token = None
+        self.allowed_networks = ()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_ENABLED', True)
+        app.config.setdefault('METRICS_PREFIX', 'habitminder')
+        app.config.setdefault('METRICS_SLOW_REQUEST_MS', 0)
+        app.config.setdefault('METRICS_TOKEN', None)
+        app.config.setdefault('METRICS_ALLOWED_IPS', None)
+        app.extensions['metrics'] = self
+        if not app.config['METRICS_ENABLED']:
+            return
+
+        self.prefix = app.config['METRICS_PREFIX']
+        self.slow_request_seconds = float(app.config['METRICS_SLOW_REQUEST_MS']) / 1000
+        self.token = str(app.config['METRICS_TOKEN']) if app.config['METRICS_TOKEN'] else None
+        allowed = app.config['METRICS_ALLOWED_IPS'] or ()
+        if isinstance(allowed, str):
+            allowed = allowed.split(',')
+        self.allowed_networks = tuple(ipaddress.ip_network(value.strip(), strict=False)
+                                      for value in allowed if value.strip())
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        if self.token or self.allowed_networks:
+            app.add_url_rule('/metrics', 'metrics', self.view)
+        else:
+            logger.info("Endpoint /metrics не зарегистрирован: задайте METRICS_TOKEN или METRICS_ALLOWED_IPS")
+
+    def register_collector(self, callback):
+        """Дополнительные метрики: callback() возвращает [(имя, тип, описание, значение)]"""
+        self._collectors.append(callback)
+
+    # Сбор
+
+    def _before_request(self):
+        g.request_stats = RequestStats(collect_statements=self.slow_request_seconds > 0)
+
+    def _before_render(self, sender, template, context, **extra):
+        stats = g.get('request_stats')
+        if stats is not None:
+            stats.render_started = time.perf_counter()
+
+    def _after_render(self, sender, template, context, **extra):
+        stats = g.get('request_stats')
+        if stats is not None and stats.render_started is not None:
+            stats.render_time += time.perf_counter() - stats.render_started
+            stats.render_started = None
+
+    def _after_request(self, response):
+        stats = g.pop('request_stats', None)
+        endpoint = request.endpoint or 'unknown'
+        if stats is None or endpoint == 'metrics':
+            return response
+        duration = time.perf_counter() - stats.started
+        values = (duration, stats.render_time, stats.sql_count, stats.sql_time)
+        with self._lock:
+            histograms = self._histograms.get(endpoint)
+            if histograms is None:
+                histograms = self._histograms[endpoint] = [Histogram(buckets) for _, _, buckets in self.HISTOGRAMS]
+            for histogram, value in zip(histograms, values):
+                histogram.observe(value)
+            key = (endpoint, response.status_code)
+            self._requests[key] = self._requests.get(key, 0) + 1
+
+        if self.slow_request_seconds and duration >= self.slow_request_seconds:
+            logger.warning(
+                "Медленный запрос %s %s (%s): %.1f мс, шаблоны %.1f мс, SQL %d за %.1f мс%s",
+                request.method, request.path, endpoint, duration * 1000, stats.render_time * 1000,
+                stats.sql_count, stats.sql_time * 1000,
+                ''.join(f"\n  {elapsed * 1000:.1f} мс: {statement}" for statement, elapsed in stats.statements)
+            )
+        return response
+
+    # Экспорт
+
+    def render(self):
+        """Текстовый формат Prometheus 0.0.4"""
+        lines = []
+        with self._lock:
+            name = f'{self.prefix}_requests_total'
+            lines += [f'# HELP {name} Количество запросов', f'# TYPE {name} counter']
+            for (endpoint, status), value in sorted(self._requests.items()):
+                lines.append(f'{name}{{endpoint="{_escape(endpoint)}",status="{status}"}} {value}')
+            for index, (suffix, help_text, _) in enumerate(self.HISTOGRAMS):
+                name = f'{self.prefix}_{suffix}'
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+                for endpoint, histograms in sorted(self._histograms.items()):
+                    histogram = histograms[index]
+                    label = f'endpoint="{_escape(endpoint)}"'
+                    for bound, value in histogram.samples():
+                        lines.append(f'{name}_bucket{{{label},le="{bound}"}} {value}')
+                    lines.append(f'{name}_sum{{{label}}} {histogram.sum}')
+                    lines.append(f'{name}_count{{{label}}} {histogram.count}')
+        for callback in self._collectors:
+            for suffix, metric_type, help_text, value in callback():
+                name = f'{self.prefix}_{suffix}'
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {metric_type}', f'{name} {value}']
+        return '\n'.join(lines) + '\n'
+
+    def allowed(self):
+        """Код ответа при отказе в доступе к /metrics или None"""
+        if self.allowed_networks:
+            try:
+                address = ipaddress.ip_address(request.remote_addr or '')
+            except ValueError:
+                return 403
+            if not any(address in network for network in self.allowed_networks):
+                return 403
+        if self.token:
+            header = request.headers.get('Authorization', '')
+            scheme, _, token = header.partition(' ')
+            if scheme.lower() != 'bearer' or not hmac.compare_digest(token.strip().encode(), self.token.encode()):
+                return 401
+        return None
+
+    def view(self):
+        status = self.allowed()
+        if status == 401:
+            return Response('Unauthorized\n', 401, {'WWW-Authenticate': 'Bearer'}, content_type='text/plain')
+        if status:
+            return Response('Forbidden\n', status, content_type='text/plain')
+        return Response(self.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info['query_started'] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not has_request_context():
+        return
+    stats = g.get('request_stats')
+    if stats is None:
+        return
+    elapsed = time.perf_counter() - conn.info.pop('query_started', time.perf_counter())
+    stats.sql_count += 1
+    stats.sql_time += elapsed
+    if stats.statements is not None and len(stats.statements) < MAX_LOGGED_STATEMENTS:
+        stats.statements.append((' '.join(statement.split()), elapsed))
@@ -0,0 +1,102 @@
+"""Move Habit.progress JSON into check_in table
+
+Revision ID: 3f9a1c2e7b41
+Revises: dac17978d687
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9a1c2e7b41'
+down_revision = 'dac17978d687'
+branch_labels = None
+depends_on = None
+
+# Количество привычек, переносимых за один проход
+BATCH_SIZE = 500
+
+habit_table = sa.table(
+    'habit',
+    sa.column('id', sa.Integer),
+    sa.column('progress', sa.JSON),
+)
+
+check_in_table = sa.table(
+    'check_in',
+    sa.column('habit_id', sa.Integer),
+    sa.column('day', sa.Date),
+    sa.column('completed', sa.Boolean),
+)
+
+
+def _iter_habit_batches(connection, columns):
+    """Постраничный обход таблицы habit по первичному ключу"""
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(*columns)
+            .where(habit_table.c.id > last_id)
+            .order_by(habit_table.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        yield rows
+        last_id = rows[-1][0]
+
+
+def upgrade():
+    connection = op.get_bind()
+    # Таблица могла быть уже создана через db.create_all() при старте приложения
+    if not sa.inspect(connection).has_table('check_in'):
+        op.create_table('check_in',
+            sa.Column('habit_id', sa.Integer(), nullable=False),
+            sa.Column('day', sa.Date(), nullable=False),
+            sa.Column('completed', sa.Boolean(), nullable=False),
+            sa.ForeignKeyConstraint(['habit_id'], ['habit.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('habit_id', 'day')
+        )
+
+    # Перенос существующих данных пачками
+    for rows in _iter_habit_batches(connection, [habit_table.c.id, habit_table.c.progress]):
+        checkins = []
+        for habit_id, progress in rows:
+            for date_str, completed in (progress or {}).items():
+                try:
+                    day = date.fromisoformat(date_str)
+                except (TypeError, ValueError):
+                    continue
+                checkins.append({'habit_id': habit_id, 'day': day, 'completed': bool(completed)})
+        if checkins:
+            connection.execute(check_in_table.insert(), checkins)
+
+    with op.batch_alter_table('habit', schema=None) as batch_op:
+        batch_op.drop_column('progress')
+
+
+def downgrade():
+    with op.batch_alter_table('habit', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('progress', sa.JSON(), nullable=True))
+
+    # Сборка JSON обратно из отметок
+    connection = op.get_bind()
+    for rows in _iter_habit_batches(connection, [habit_table.c.id]):
+        habit_ids = [row[0] for row in rows]
+        progress = {habit_id: {} for habit_id in habit_ids}
+        checkins = connection.execute(
+            sa.select(check_in_table.c.habit_id, check_in_table.c.day, check_in_table.c.completed)
+            .where(check_in_table.c.habit_id.in_(habit_ids))
+        )
+        for habit_id, day, completed in checkins:
+            progress[habit_id][day.isoformat()] = completed
+        for habit_id, value in progress.items():
+            connection.execute(
+                habit_table.update().where(habit_table.c.id == habit_id).values(progress=value)
+            )
+
+    op.drop_table('check_in')
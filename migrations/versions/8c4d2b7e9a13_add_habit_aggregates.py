@@ -0,0 +1,97 @@
+"""Add stored aggregates to habit
+
+Revision ID: 8c4d2b7e9a13
+Revises: 3f9a1c2e7b41
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from datetime import timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c4d2b7e9a13'
+down_revision = '3f9a1c2e7b41'
+branch_labels = None
+depends_on = None
+
+# Количество привычек, пересчитываемых за один проход
+BATCH_SIZE = 500
+
+habit_table = sa.table(
+    'habit',
+    sa.column('id', sa.Integer),
+    sa.column('completed_days', sa.Integer),
+    sa.column('tracked_days', sa.Integer),
+    sa.column('current_streak', sa.Integer),
+    sa.column('longest_streak', sa.Integer),
+    sa.column('last_checkin_on', sa.Date),
+)
+
+check_in_table = sa.table(
+    'check_in',
+    sa.column('habit_id', sa.Integer),
+    sa.column('day', sa.Date),
+    sa.column('completed', sa.Boolean),
+)
+
+
+def upgrade():
+    with op.batch_alter_table('habit', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('completed_days', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('tracked_days', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('current_streak', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('longest_streak', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('last_checkin_on', sa.Date(), nullable=True))
+
+    # Заполнение агрегатов по существующим отметкам
+    connection = op.get_bind()
+    last_id = 0
+    while True:
+        habit_ids = connection.execute(
+            sa.select(habit_table.c.id)
+            .where(habit_table.c.id > last_id)
+            .order_by(habit_table.c.id)
+            .limit(BATCH_SIZE)
+        ).scalars().all()
+        if not habit_ids:
+            break
+        stats = {
+            habit_id: {'completed_days': 0, 'tracked_days': 0, 'current_streak': 0,
+                       'longest_streak': 0, 'last_checkin_on': None}
+            for habit_id in habit_ids
+        }
+        rows = connection.execute(
+            sa.select(check_in_table.c.habit_id, check_in_table.c.day, check_in_table.c.completed)
+            .where(check_in_table.c.habit_id.in_(habit_ids))
+            .order_by(check_in_table.c.habit_id, check_in_table.c.day)
+        )
+        for habit_id, day, completed in rows:
+            item = stats[habit_id]
+            item['tracked_days'] += 1
+            if not completed:
+                continue
+            item['completed_days'] += 1
+            if item['last_checkin_on'] == day - timedelta(days=1):
+                item['current_streak'] += 1
+            else:
+                item['current_streak'] = 1
+            item['last_checkin_on'] = day
+            item['longest_streak'] = max(item['longest_streak'], item['current_streak'])
+        for habit_id, values in stats.items():
+            if values['tracked_days']:
+                connection.execute(
+                    habit_table.update().where(habit_table.c.id == habit_id).values(**values)
+                )
+        last_id = habit_ids[-1]
+
+
+def downgrade():
+    with op.batch_alter_table('habit', schema=None) as batch_op:
+        batch_op.drop_column('last_checkin_on')
+        batch_op.drop_column('longest_streak')
+        batch_op.drop_column('current_streak')
+        batch_op.drop_column('tracked_days')
+        batch_op.drop_column('completed_days')
@@ -0,0 +1,97 @@
+"""Add stored period aggregates to weekly and monthly habits
+
+Revision ID: a4f2d8c6e0b9
+Revises: e3a7c9f1b5d8
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+import archive
+import periods
+from history import HabitHistory
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4f2d8c6e0b9'
+down_revision = 'e3a7c9f1b5d8'
+branch_labels = None
+depends_on = None
+
+# Количество привычек, пересчитываемых за один проход
+BATCH_SIZE = 500
+
+habit_table = sa.table(
+    'habit',
+    sa.column('id', sa.Integer),
+    sa.column('frequency', sa.String),
+    sa.column('created_at', sa.DateTime),
+    sa.column('completed_periods', sa.Integer),
+    sa.column('period_streak', sa.Integer),
+    sa.column('longest_period_streak', sa.Integer),
+    sa.column('last_period', sa.Integer),
+)
+
+check_in_table = sa.table(
+    'check_in',
+    sa.column('habit_id', sa.Integer),
+    sa.column('day', sa.Date),
+    sa.column('completed', sa.Boolean),
+)
+
+archive_table = sa.table(
+    'check_in_archive',
+    sa.column('habit_id', sa.Integer),
+    sa.column('year', sa.Integer),
+    sa.column('data', sa.LargeBinary),
+)
+
+
+def upgrade():
+    with op.batch_alter_table('habit', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('completed_periods', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('period_streak', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('longest_period_streak', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('last_period', sa.Integer(), nullable=True))
+
+    # Заполнение агрегатов недельных и месячных привычек по check_in и архиву
+    connection = op.get_bind()
+    last_id = 0
+    while True:
+        habits = connection.execute(
+            sa.select(habit_table.c.id, habit_table.c.frequency, habit_table.c.created_at)
+            .where(habit_table.c.id > last_id, habit_table.c.frequency.in_(periods.PERIODIC))
+            .order_by(habit_table.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not habits:
+            break
+        years = {habit_id: {} for habit_id, _, _ in habits}
+        for habit_id, year, data in connection.execute(
+            sa.select(archive_table.c.habit_id, archive_table.c.year, archive_table.c.data)
+            .where(archive_table.c.habit_id.in_(years))
+        ):
+            years[habit_id][year] = archive.decode(year, data)[0]
+        histories = {habit_id: HabitHistory(bits) for habit_id, bits in years.items()}
+        for habit_id, day, completed in connection.execute(
+            sa.select(check_in_table.c.habit_id, check_in_table.c.day, check_in_table.c.completed)
+            .where(check_in_table.c.habit_id.in_(years))
+        ):
+            histories[habit_id].set(day, completed)
+        for habit_id, frequency, created_at in habits:
+            runs = periods.period_runs(histories[habit_id], frequency, created_at.date())
+            if runs.completed:
+                connection.execute(habit_table.update().where(habit_table.c.id == habit_id).values(
+                    completed_periods=runs.completed, last_period=runs.last,
+                    period_streak=runs.run, longest_period_streak=runs.longest
+                ))
+        last_id = habits[-1][0]
+
+
+def downgrade():
+    with op.batch_alter_table('habit', schema=None) as batch_op:
+        batch_op.drop_column('last_period')
+        batch_op.drop_column('longest_period_streak')
+        batch_op.drop_column('period_streak')
+        batch_op.drop_column('completed_periods')
@@ -0,0 +1,32 @@
+"""Add habit.version and user.dashboard_version
+
+Revision ID: b2e6f0a4c8d5
+Revises: 8c4d2b7e9a13
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2e6f0a4c8d5'
+down_revision = '8c4d2b7e9a13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('habit', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='0', nullable=False))
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('dashboard_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('dashboard_version')
+
+    with op.batch_alter_table('habit', schema=None) as batch_op:
+        batch_op.drop_column('version')
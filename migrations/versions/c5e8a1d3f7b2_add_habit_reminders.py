@@ -0,0 +1,37 @@
+"""Add habit reminder time and indexed next_reminder_at
+
+Revision ID: c5e8a1d3f7b2
+Revises: b2e6f0a4c8d5
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e8a1d3f7b2'
+down_revision = 'b2e6f0a4c8d5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('habit', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('reminder_time', sa.Time(), nullable=True))
+        batch_op.add_column(sa.Column('next_reminder_at', sa.DateTime(), nullable=True))
+
+    # Частичный индекс: привычки без напоминаний в него не попадают
+    op.create_index(
+        'ix_habit_next_reminder_at', 'habit', ['next_reminder_at'],
+        postgresql_where=sa.text('next_reminder_at IS NOT NULL'),
+        sqlite_where=sa.text('next_reminder_at IS NOT NULL'),
+    )
+
+
+def downgrade():
+    op.drop_index('ix_habit_next_reminder_at', table_name='habit')
+
+    with op.batch_alter_table('habit', schema=None) as batch_op:
+        batch_op.drop_column('next_reminder_at')
+        batch_op.drop_column('reminder_time')
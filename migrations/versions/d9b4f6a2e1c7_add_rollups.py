@@ -0,0 +1,61 @@
+"""Add analytics rollup tables and user.is_admin
+
+Revision ID: d9b4f6a2e1c7
+Revises: c5e8a1d3f7b2
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9b4f6a2e1c7'
+down_revision = 'c5e8a1d3f7b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('is_admin', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+    op.create_table(
+        'rollup_day',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('frequency', sa.String(length=20), nullable=False),
+        sa.Column('checkins', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('habits', sa.Integer(), server_default='0', nullable=False),
+        sa.PrimaryKeyConstraint('day', 'frequency')
+    )
+    op.create_table(
+        'rollup_activity',
+        sa.Column('scope', sa.String(length=5), nullable=False),
+        sa.Column('start', sa.Date(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('checkins', sa.Integer(), server_default='0', nullable=False),
+        sa.PrimaryKeyConstraint('scope', 'start', 'user_id')
+    )
+    op.create_table(
+        'rollup_active',
+        sa.Column('scope', sa.String(length=5), nullable=False),
+        sa.Column('start', sa.Date(), nullable=False),
+        sa.Column('active_users', sa.Integer(), server_default='0', nullable=False),
+        sa.PrimaryKeyConstraint('scope', 'start')
+    )
+    op.create_table(
+        'rollup_dirty',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.PrimaryKeyConstraint('day')
+    )
+    # Агрегаты за существующую историю заполняет flask rebuild-rollups
+
+
+def downgrade():
+    op.drop_table('rollup_dirty')
+    op.drop_table('rollup_active')
+    op.drop_table('rollup_activity')
+    op.drop_table('rollup_day')
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('is_admin')
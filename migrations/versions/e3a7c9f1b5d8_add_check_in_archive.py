@@ -0,0 +1,33 @@
+"""Add check_in_archive for compressed yearly history
+
+Revision ID: e3a7c9f1b5d8
+Revises: d9b4f6a2e1c7
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3a7c9f1b5d8'
+down_revision = 'd9b4f6a2e1c7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'check_in_archive',
+        sa.Column('habit_id', sa.Integer(), nullable=False),
+        sa.Column('year', sa.Integer(), nullable=False),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.ForeignKeyConstraint(['habit_id'], ['habit.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('habit_id', 'year')
+    )
+    # Старые отметки переносит в архив flask compact-history
+
+
+def downgrade():
+    # Перед откатом верните архив в check_in: иначе история старше горизонта пропадёт
+    op.drop_table('check_in_archive')
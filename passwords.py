@@ -0,0 +1,146 @@
+"""Хеширование паролей в ограниченном пуле потоков.
+
+scrypt и PBKDF2 из hashlib отпускают GIL, поэтому хеш считается в отдельном
+потоке, не блокируя остальные запросы воркера. Пул ограничен
+PASSWORD_HASH_WORKERS потоками, а ожидать своей очереди могут не больше
+PASSWORD_HASH_QUEUE задач: при всплеске входов хеширование занимает не
+больше заданного числа ядер, а лишние попытки сразу получают отказ
+(PasswordHasherBusy) вместо того, чтобы держать воркеры.
+
+Метод и стоимость задаются PASSWORD_HASH_METHOD в формате Werkzeug
+('scrypt', 'scrypt:65536:8:1', 'pbkdf2:sha256:600000'); хеши со старыми
+параметрами пересчитываются при успешном входе.
+"""
+import os
+import threading
+from concurrent import futures
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+# Параметры по умолчанию, которые Werkzeug дописывает к сокращённому методу
+METHOD_DEFAULTS = {
+    'scrypt': ('32768', '8', '1'),
+    'pbkdf2': ('sha256', str(DEFAULT_PBKDF2_ITERATIONS)),
+}
+
+
+class PasswordHasherBusy(Exception):
+    """Очередь хеширования заполнена или ожидание превысило PASSWORD_HASH_TIMEOUT"""
+
+
+def normalize_method(method):
+    """Полная запись метода, как её сохраняет Werkzeug: 'scrypt' -> 'scrypt:32768:8:1'"""
+    name, *args = method.split(':')
+    if name not in METHOD_DEFAULTS:
+        raise ValueError(f"Неизвестный метод хеширования паролей: {method}")
+    defaults = METHOD_DEFAULTS[name]
+    return ':'.join([name, *args, *defaults[len(args):]])
+
+
+class PasswordHasher:
+    """Расширение Flask: PASSWORD_HASH_METHOD, PASSWORD_SALT_LENGTH,
+    PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE, PASSWORD_HASH_TIMEOUT"""
+
+    def __init__(self, app=None):
+        self.method = normalize_method('scrypt')
+        self.salt_length = 16
+        self.workers = 1
+        self.queue = 16
+        self.timeout = 10.0
+        self._executor = None
+        self._slots = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.counters = {'hashed': 0, 'verified': 0, 'rehashed': 0, 'rejected': 0}
+        self._pending = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PASSWORD_HASH_METHOD', 'scrypt')
+        app.config.setdefault('PASSWORD_SALT_LENGTH', 16)
+        # По умолчанию хешированию отдаётся половина ядер, остальные обслуживают прочие запросы
+        app.config.setdefault('PASSWORD_HASH_WORKERS', max(1, (os.cpu_count() or 2) // 2))
+        app.config.setdefault('PASSWORD_HASH_QUEUE', 16)
+        app.config.setdefault('PASSWORD_HASH_TIMEOUT', 10)
+        self.method = normalize_method(app.config['PASSWORD_HASH_METHOD'])
+        self.salt_length = int(app.config['PASSWORD_SALT_LENGTH'])
+        self.workers = int(app.config['PASSWORD_HASH_WORKERS'])
+        self.queue = int(app.config['PASSWORD_HASH_QUEUE'])
+        self.timeout = float(app.config['PASSWORD_HASH_TIMEOUT'])
+        app.extensions['password_hasher'] = self
+
+    # Операции
+
+    def hash(self, password):
+        """Хеш пароля с текущими параметрами"""
+        result = self._run(generate_password_hash, password, self.method, self.salt_length)
+        self._count('hashed')
+        return result
+
+    def verify(self, pwhash, password):
+        """Проверка пароля; пустой хеш (пользователь без пароля) не совпадает ни с чем"""
+        if not pwhash:
+            return False
+        result = self._run(check_password_hash, pwhash, password)
+        self._count('verified')
+        return result
+
+    def needs_rehash(self, pwhash):
+        """True, если хеш вычислен с другим методом, стоимостью или длиной соли"""
+        method, _, rest = pwhash.partition('$')
+        salt = rest.partition('$')[0]
+        try:
+            return normalize_method(method) != self.method or len(salt) != self.salt_length
+        except ValueError:
+            return True
+
+    def rehashed(self):
+        self._count('rehashed')
+
+    # Пул
+
+    def _run(self, func, *args):
+        executor = self._ensure_executor()
+        if not self._slots.acquire(blocking=False):
+            self._count('rejected')
+            raise PasswordHasherBusy()
+        try:
+            future = executor.submit(func, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._pending += 1
+        future.add_done_callback(self._done)
+        try:
+            return future.result(self.timeout)
+        except futures.TimeoutError:
+            # Ещё не начатая задача снимается; начатая досчитается и освободит место
+            future.cancel()
+            self._count('rejected')
+            raise PasswordHasherBusy() from None
+
+    def _done(self, future):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def _ensure_executor(self):
+        # Потоки пула не переживают fork — в дочернем процессе создаём свой пул
+        if self._executor is not None and self._pid == os.getpid():
+            return self._executor
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._slots = threading.BoundedSemaphore(self.workers + self.queue)
+                self._executor = futures.ThreadPoolExecutor(self.workers, thread_name_prefix='password-hash')
+                self._pid = os.getpid()
+            return self._executor
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, pending=self._pending)
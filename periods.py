@@ -0,0 +1,103 @@
+"""Периоды привычек: день, ISO-неделя (с понедельника) или календарный месяц.
+
+Отметки хранятся по дням (HabitHistory); период считается выполненным,
+если в нём есть хотя бы один выполненный день. Периоды нумеруются целыми
+числами подряд, поэтому серии считаются по номерам без обхода дат.
+"""
+import calendar
+from collections import namedtuple
+from datetime import date, timedelta
+
+FREQUENCIES = ('daily', 'weekly', 'monthly')
+# Частоты, которые считаются по периодам длиннее дня
+PERIODIC = ('weekly', 'monthly')
+
+# status: completed, missed, current, future или inactive (до создания привычки)
+Period = namedtuple('Period', 'index start end status')
+PeriodStats = namedtuple('PeriodStats', 'completed_periods total_periods current_streak longest_streak period_completed')
+# Агрегаты, которые хранятся у привычки: выполненных периодов, номер последнего
+# выполненного, серия, заканчивающаяся в нём, и самая длинная серия
+PeriodRuns = namedtuple('PeriodRuns', 'completed last run longest')
+
+
+def period_index(day, frequency):
+    """Номер периода, содержащего day; соседние периоды отличаются на 1"""
+    if frequency == 'weekly':
+        return (day.toordinal() - 1) // 7  # date(1, 1, 1) — понедельник
+    if frequency == 'monthly':
+        return day.year * 12 + day.month - 1
+    return day.toordinal()
+
+
+def period_bounds(index, frequency):
+    """Первый и последний день периода с номером index"""
+    if frequency == 'weekly':
+        start = date.fromordinal(index * 7 + 1)
+        return start, start + timedelta(days=6)
+    if frequency == 'monthly':
+        year, month = divmod(index, 12)
+        return date(year, month + 1, 1), date(year, month + 1, calendar.monthrange(year, month + 1)[1])
+    day = date.fromordinal(index)
+    return day, day
+
+
+def completed_periods(history, frequency, start=None, end=None):
+    """Номера периодов по возрастанию, в которых есть выполненные дни из [start, end]"""
+    indexes = []
+    for day in history.days(start, end):
+        index = period_index(day, frequency)
+        if not indexes or indexes[-1] != index:
+            indexes.append(index)
+    return indexes
+
+
+def period_runs(history, frequency, created, end=None):
+    """Хранимые агрегаты периодов (PeriodRuns) по истории с периода создания привычки до end"""
+    first = period_index(created, frequency)
+    indexes = completed_periods(history, frequency, period_bounds(first, frequency)[0], end)
+    longest = run = 0
+    previous = None
+    for index in indexes:
+        run = run + 1 if previous == index - 1 else 1
+        longest = max(longest, run)
+        previous = index
+    return PeriodRuns(len(indexes), previous, run, longest)
+
+
+def period_stats(runs, frequency, created, today):
+    """Выполнение и серии на сегодня по агрегатам PeriodRuns — без чтения истории.
+
+    Текущий невыполненный период не прерывает серию: он ещё не закончился.
+    """
+    first, current = period_index(created, frequency), period_index(today, frequency)
+    period_completed = runs.last == current
+    current_streak = runs.run if runs.last is not None and runs.last >= current - 1 else 0
+    return PeriodStats(runs.completed, max(current - first + 1, 0), current_streak, runs.longest, period_completed)
+
+
+def summarize(history, frequency, created, today):
+    """Выполнение и серии по периодам с периода создания привычки до текущего"""
+    return period_stats(period_runs(history, frequency, created, today), frequency, created, today)
+
+
+def calendar_periods(history, frequency, created, today, first, length):
+    """Ячейки календаря: length периодов начиная с номера first"""
+    current = period_index(today, frequency)
+    created_index = period_index(created, frequency)
+    start = period_bounds(first, frequency)[0]
+    end = period_bounds(first + length - 1, frequency)[1]
+    done = set(completed_periods(history, frequency, start, end))
+    cells = []
+    for index in range(first, first + length):
+        if index > current:
+            status = 'future'
+        elif index in done:
+            status = 'completed'
+        elif index < created_index:
+            status = 'inactive'
+        elif index == current:
+            status = 'current'
+        else:
+            status = 'missed'
+        cells.append(Period(index, *period_bounds(index, frequency), status))
+    return cells
@@ -0,0 +1,126 @@
+"""Напоминания о привычках.
+
+У привычки с напоминанием (reminder_time — время суток) в индексированной
+колонке next_reminder_at хранится момент ближайшего напоминания; все
+времена, как и остальные даты приложения, в UTC. Ежедневная привычка
+напоминает каждый день, еженедельная — в понедельник, ежемесячная — первого
+числа (начало периода, см. periods). Планировщик (flask run-reminders)
+выбирает только наступившие напоминания, поэтому стоимость тика зависит
+от их числа, а не от общего числа привычек.
+
+Напоминание не отправляется, если период уже выполнен. После простоя
+планировщика пропущенные напоминания не досылаются: отправляется только
+последнее наступившее, если его период ещё не закончился. Доставка — не
+менее одного раза: при сбое пачка повторяется целиком.
+"""
+import logging
+import threading
+from collections import namedtuple
+from datetime import datetime
+
+from werkzeug.utils import import_string
+
+import periods
+
+logger = logging.getLogger(__name__)
+
+Reminder = namedtuple('Reminder', 'habit_id user_id email title frequency due_at')
+
+
+def next_reminder(frequency, reminder_time, after):
+    """Ближайшее время напоминания строго позже after"""
+    index = periods.period_index(after.date(), frequency)
+    due = datetime.combine(periods.period_bounds(index, frequency)[0], reminder_time)
+    if due <= after:
+        due = datetime.combine(periods.period_bounds(index + 1, frequency)[0], reminder_time)
+    return due
+
+
+def previous_reminder(frequency, reminder_time, now):
+    """Последнее время напоминания не позже now"""
+    index = periods.period_index(now.date(), frequency)
+    due = datetime.combine(periods.period_bounds(index, frequency)[0], reminder_time)
+    if due > now:
+        due = datetime.combine(periods.period_bounds(index - 1, frequency)[0], reminder_time)
+    return due
+
+
+def reminder_state(frequency, due_at, last_checkin_on, now):
+    """'send', 'completed' (период уже выполнен) или 'stale' (период закончился)"""
+    index = periods.period_index(due_at.date(), frequency)
+    if index != periods.period_index(now.date(), frequency):
+        return 'stale'
+    if last_checkin_on is not None and periods.period_index(last_checkin_on, frequency) == index:
+        return 'completed'
+    return 'send'
+
+
+class LogNotifier:
+    """Пишет напоминания в журнал — заглушка для разработки"""
+
+    def send(self, reminders):
+        for reminder in reminders:
+            logger.info("Напоминание для %s: «%s»", reminder.email, reminder.title)
+
+
+class MemoryNotifier:
+    """Собирает напоминания в списке sent — для тестов и бенчмарков"""
+
+    def __init__(self):
+        self.sent = []
+
+    def send(self, reminders):
+        self.sent.extend(reminders)
+
+
+NOTIFIERS = {'log': LogNotifier, 'memory': MemoryNotifier}
+
+
+class Reminders:
+    """Расширение Flask: REMINDER_NOTIFIER, REMINDER_BATCH_SIZE, REMINDER_TICK_SECONDS, REMINDER_LEASE_SECONDS.
+
+    REMINDER_NOTIFIER — имя из NOTIFIERS или путь к классу ('package.module:Class'),
+    у экземпляра которого есть метод send(reminders) для пачки Reminder.
+    """
+
+    def __init__(self, app=None):
+        self.notifier = LogNotifier()
+        self.batch_size = 500
+        self.tick = 60.0
+        self.lease = 300
+        self._lock = threading.Lock()
+        self.counters = {'sent': 0, 'completed': 0, 'stale': 0, 'batches': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('REMINDER_NOTIFIER', 'log')
+        app.config.setdefault('REMINDER_BATCH_SIZE', 500)
+        app.config.setdefault('REMINDER_TICK_SECONDS', 60)
+        # Без SKIP LOCKED пачка захватывается сдвигом next_reminder_at на это время
+        app.config.setdefault('REMINDER_LEASE_SECONDS', 300)
+        name = app.config['REMINDER_NOTIFIER']
+        if name in NOTIFIERS:
+            self.notifier = NOTIFIERS[name]()
+        elif ':' in name or '.' in name:
+            self.notifier = import_string(name)()
+        else:
+            raise ValueError(f"Неизвестный способ отправки напоминаний: {name}")
+        self.batch_size = int(app.config['REMINDER_BATCH_SIZE'])
+        self.tick = float(app.config['REMINDER_TICK_SECONDS'])
+        self.lease = int(app.config['REMINDER_LEASE_SECONDS'])
+        app.extensions['reminders'] = self
+
+    def deliver(self, reminders, completed=0, stale=0):
+        """Отправляет пачку и учитывает пропущенные напоминания"""
+        if reminders:
+            self.notifier.send(reminders)
+        with self._lock:
+            self.counters['sent'] += len(reminders)
+            self.counters['completed'] += completed
+            self.counters['stale'] += stale
+            self.counters['batches'] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters)
@@ -0,0 +1,59 @@
+"""Агрегаты отметок для аналитики по всем пользователям.
+
+Таблицы (модели в app.py):
+- rollup_day — выполненные отметки и число привычек за день по частотам;
+- rollup_activity — выполненные отметки пользователя за день и за месяц;
+- rollup_active — активные пользователи (хотя бы одна выполненная отметка)
+  за день и за месяц;
+- rollup_dirty — дни, которые нужно пересчитать из истории (check_in и архива).
+
+Переключения отметок копят изменения в сессии (RollupDeltas) и применяют
+их перед фиксацией той же транзакции. Импорт и удаление привычек меняют
+много дней сразу, поэтому только помечают дни в rollup_dirty; их
+пересчитывает flask rollup-catch-up, оно же записывает число привычек за
+прошедшие дни. Месячные показатели складываются из дневных строк — не
+больше 31 строки на частоту, независимо от объёма истории.
+"""
+import calendar
+from collections import Counter
+
+DAY = 'day'
+MONTH = 'month'
+
+# Длина периода в днях для нормировки доли выполнения (месяц — по календарю)
+PERIOD_DAYS = {'daily': 1, 'weekly': 7}
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def month_end(day):
+    return day.replace(day=calendar.monthrange(day.year, day.month)[1])
+
+
+class RollupDeltas:
+    """Изменения агрегатов, накопленные за транзакцию"""
+
+    def __init__(self):
+        self.checkins = Counter()  # (день, частота) -> изменение
+        self.activity = Counter()  # (DAY/MONTH, начало, user_id) -> изменение
+
+    def add(self, day, frequency, user_id, delta):
+        self.checkins[day, frequency] += delta
+        self.activity[DAY, day, user_id] += delta
+        self.activity[MONTH, month_start(day), user_id] += delta
+
+    def __bool__(self):
+        return any(self.checkins.values()) or any(self.activity.values())
+
+
+def completion_rate(frequency, checkins, habit_days, day):
+    """Выполненные отметки относительно ожидаемых: одна за период на привычку.
+
+    habit_days — сумма по дням числа существовавших привычек. Значение больше 1
+    означает, что еженедельные или ежемесячные привычки отмечали чаще периода.
+    """
+    period = PERIOD_DAYS.get(frequency) or calendar.monthrange(day.year, day.month)[1]
+    expected = habit_days / period
+    return round(checkins / expected, 4) if expected else None
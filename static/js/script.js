@@ -1,41 +1,179 @@
 document.addEventListener('DOMContentLoaded', () => {
-    // Инициализация тултипов
-    const tooltipTriggerList = document.querySelectorAll('[data-bs-toggle="tooltip"]');
-    const tooltipList = [...tooltipTriggerList].map(el => new bootstrap.Tooltip(el, {
+    // Один делегированный тултип на всю страницу вместо экземпляра на каждую ячейку
+    new bootstrap.Tooltip(document.body, {
+        selector: '[data-bs-toggle="tooltip"]',
         boundary: 'window',
         customClass: 'habit-tooltip'
-    }));
-
-    // Наблюдатель за изменениями в календаре
-    const observer = new MutationObserver(mutations => {
-        mutations.forEach(mutation => {
-            if (mutation.type === 'attributes' && mutation.attributeName === 'class') {
-                const habitId = mutation.target.closest('.habit-calendar').dataset.habitId;
-                updateProgressBar(habitId);
-            }
-        });
     });
 
-    // Функция обновления прогресс-бара
-    const updateProgressBar = (habitId) => {
-        const card = document.querySelector(`.habit-calendar[data-habit-id="${habitId}"]`).closest('.card');
-        const progressBar = card.querySelector('.progress-bar');
-        const completedDays = card.querySelectorAll('.day.bg-success').length;
-        const totalDays = card.querySelectorAll('.day').length;
-        
-        if (totalDays > 0) {
-            const percentage = (completedDays / totalDays) * 100;
-            progressBar.style.width = `${percentage}%`;
-            progressBar.textContent = `${Math.round(percentage)}%`;
+    // Один обработчик кликов по дням календаря
+    document.addEventListener('click', event => {
+        const day = event.target.closest('.habit-calendar .day.clickable');
+        if (day && typeof handleDayClick === 'function') {
+            handleDayClick(day.closest('.habit-calendar').dataset.habitId, day.dataset.date, day);
         }
-    };
-
-    // Инициализация наблюдателя для всех календарей
-    document.querySelectorAll('.habit-calendar').forEach(calendar => {
-        observer.observe(calendar, {
-            attributes: true,
-            subtree: true,
-            attributeFilter: ['class']
-        });
     });
-});
\ No newline at end of file
+
+    HabitCalendar.init();
+});
+
+// Подпись ячейки календаря; экземпляр тултипа появляется только при наведении
+function setDayTooltip(element, text) {
+    element.setAttribute('data-bs-title', text);
+    element.removeAttribute('title');
+    const tooltip = bootstrap.Tooltip.getInstance(element);
+    if (tooltip) tooltip.setContent({'.tooltip-inner': text});
+}
+
+// Листание календарей по данным /api/habits без перезагрузки страницы.
+// Периоды и статусы считаются так же, как в periods.py и calendar_window (app.py)
+const HabitCalendar = {
+    LAYOUT: {daily: [14, 30], weekly: [8, 12], monthly: [8, 12]},  // периодов до текущего, всего ячеек
+    STATUS_TEXT: {
+        completed: '✅ Выполнено',
+        missed: '❌ Пропущено',
+        current: '🕒 Сегодня',
+        future: '',
+        inactive: 'Привычка ещё не создана'
+    },
+    MONTHS: ['Январь', 'Февраль', 'Март', 'Апрель', 'Май', 'Июнь',
+             'Июль', 'Август', 'Сентябрь', 'Октябрь', 'Ноябрь', 'Декабрь'],
+    MONTHS_GENITIVE: ['января', 'февраля', 'марта', 'апреля', 'мая', 'июня',
+                      'июля', 'августа', 'сентября', 'октября', 'ноября', 'декабря'],
+    page: 0,
+
+    init() {
+        this.nav = document.getElementById('calendarNav');
+        if (!this.nav) return;
+        this.nav.addEventListener('click', event => {
+            const button = event.target.closest('[data-calendar-shift]');
+            if (!button) return;
+            const shift = Number(button.dataset.calendarShift);
+            this.page = shift === 0 ? 0 : this.page + shift;
+            this.load();
+        });
+    },
+
+    statusText(status, frequency) {
+        return status === 'current' && frequency !== 'daily' ? '🕒 Текущий период' : this.STATUS_TEXT[status];
+    },
+
+    // Даты обрабатываются в UTC, чтобы часовой пояс не сдвигал дни
+    parse(iso) {
+        const [year, month, day] = iso.split('-').map(Number);
+        return new Date(Date.UTC(year, month - 1, day));
+    },
+    format(date) {
+        return date.toISOString().slice(0, 10);
+    },
+    addDays(iso, days) {
+        const date = this.parse(iso);
+        date.setUTCDate(date.getUTCDate() + days);
+        return this.format(date);
+    },
+    today() {
+        const now = new Date();
+        return this.format(new Date(Date.UTC(now.getFullYear(), now.getMonth(), now.getDate())));
+    },
+
+    // Номер периода: соседние дни, недели (с понедельника) или месяцы отличаются на 1
+    periodIndex(iso, frequency) {
+        const date = this.parse(iso);
+        if (frequency === 'monthly') return date.getUTCFullYear() * 12 + date.getUTCMonth();
+        const days = date / 86400000;
+        return frequency === 'weekly' ? Math.floor((days + 3) / 7) : days;  // 01.01.1970 — четверг
+    },
+    periodBounds(index, frequency) {
+        if (frequency === 'monthly') {
+            const year = Math.floor(index / 12), month = index % 12;
+            return [this.format(new Date(Date.UTC(year, month, 1))), this.format(new Date(Date.UTC(year, month + 1, 0)))];
+        }
+        const start = this.format(new Date((frequency === 'weekly' ? index * 7 - 3 : index) * 86400000));
+        return [start, frequency === 'weekly' ? this.addDays(start, 6) : start];
+    },
+    firstPeriod(container, today) {
+        const frequency = container.dataset.frequency;
+        const [lookback, length] = this.LAYOUT[frequency];
+        let first = this.periodIndex(today, frequency) - lookback;
+        if (frequency === 'daily') first = Math.max(first, this.periodIndex(container.dataset.created, frequency));
+        return first + this.page * length;
+    },
+
+    // Один запрос на каждую частоту: окно покрывает календари всех её привычек
+    async load() {
+        const today = this.today();
+        const groups = {};
+        document.querySelectorAll('.habit-calendar').forEach(container => {
+            const frequency = container.dataset.frequency;
+            const first = this.firstPeriod(container, today);
+            const last = first + this.LAYOUT[frequency][1] - 1;
+            const group = groups[frequency] || (groups[frequency] = {first, last});
+            group.first = Math.min(group.first, first);
+            group.last = Math.max(group.last, last);
+        });
+        try {
+            const ranges = await Promise.all(Object.entries(groups).map(async ([frequency, group]) => {
+                const from = this.periodBounds(group.first, frequency)[0];
+                const to = this.periodBounds(group.last, frequency)[1];
+                const response = await fetch(`/api/habits?frequency=${frequency}&from=${from}&to=${to}`,
+                                             {headers: {'Accept': 'application/json'}});
+                const data = await response.json();
+                if (!response.ok) throw new Error(data.message || 'Ошибка сервера');
+                this.render(data, frequency, today);
+                return `${from.split('-').reverse().join('.')} — ${to.split('-').reverse().join('.')}`;
+            }));
+            document.getElementById('calendarRange').textContent = this.page ? ranges.join(' · ') : '';
+        } catch (error) {
+            console.error('Ошибка:', error);
+            alert(error.message);
+        }
+    },
+
+    render(data, frequency, today) {
+        const current = this.periodIndex(data.today, frequency);
+        const origin = this.parse(data.from);
+        data.habits.forEach(habit => {
+            const container = document.querySelector(`.habit-calendar[data-habit-id="${habit.id}"]`);
+            if (!container) return;
+            const bits = Uint8Array.from(atob(habit.bits), c => c.charCodeAt(0));
+            const created = this.periodIndex(habit.created_at, frequency);
+            const first = this.firstPeriod(container, today);
+            const cells = document.createDocumentFragment();
+            for (let index = first; index < first + this.LAYOUT[frequency][1]; index++) {
+                const [start, end] = this.periodBounds(index, frequency);
+                // Период выполнен, если выполнен любой его день
+                let completed = false;
+                for (let i = (this.parse(start) - origin) / 86400000; i <= (this.parse(end) - origin) / 86400000 && !completed; i++) {
+                    completed = i >= 0 && ((bits[i >> 3] >> (i & 7)) & 1) === 1;
+                }
+                let status;
+                if (index > current) status = 'future';
+                else if (completed) status = 'completed';
+                else if (index < created) status = 'inactive';
+                else if (index === current) status = 'current';
+                else status = 'missed';
+                cells.appendChild(this.cell(frequency, start, end, status, data.today));
+            }
+            container.replaceChildren(cells);
+        });
+    },
+
+    label(frequency, start, end) {
+        const [year, month, day] = start.split('-');
+        if (frequency === 'weekly') return `${day}.${month} — ${end.split('-').reverse().join('.')}`;
+        if (frequency === 'monthly') return `${this.MONTHS[month - 1]} ${year}`;
+        return `${day} ${this.MONTHS_GENITIVE[month - 1]} ${year}`;
+    },
+
+    cell(frequency, start, end, status, today) {
+        const day = document.createElement('div');
+        const color = {completed: 'bg-success', missed: 'bg-danger'}[status] || 'bg-light';
+        const isCurrent = start <= today && today <= end;
+        day.className = `day ${color} ${isCurrent ? 'clickable' : 'locked'}`;
+        day.dataset.date = isCurrent ? today : start;
+        day.dataset.label = this.label(frequency, start, end);
+        day.dataset.bsToggle = 'tooltip';
+        day.dataset.bsTitle = `${day.dataset.label}\n${this.statusText(status, frequency)}`.trim();
+        return day;
+    }
+};
@@ -0,0 +1,47 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Модули приложения лежат в корне репозитория
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+# Приложение настраивается при импорте app, поэтому окружение задаётся до
+# сбора тестов. База — временный файл SQLite, а не DATABASE_URL из .env;
+# TEST_DATABASE_URL и TEST_DATABASE_REPLICA_URL задают свои базы (см.
+# test_replica_routing, где сценарии запускаются отдельным процессом)
+DIRECTORY = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = os.environ.get('TEST_DATABASE_URL') or f"sqlite:///{os.path.join(DIRECTORY, 'test.db')}"
+if os.environ.get('TEST_DATABASE_REPLICA_URL'):
+    os.environ['DATABASE_REPLICA_URL'] = os.environ['TEST_DATABASE_REPLICA_URL']
+else:
+    os.environ.pop('DATABASE_REPLICA_URL', None)
+os.environ.update({
+    'SECRET_KEY': 'test',
+    'FLASK_WTF_CSRF_ENABLED': 'false',
+    'FLASK_INIT_DB_ON_STARTUP': 'false',
+})
+os.environ.setdefault('LOGGING_LEVEL', 'WARNING')
+
+
+@pytest.fixture
+def application():
+    """Приложение с пустой схемой; контекст не держится открытым — у каждого запроса своя сессия"""
+    from app import app, db, fragment_cache, user_cache
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.drop_all()
+    fragment_cache.clear()
+    user_cache.clear()
+
+
+@pytest.fixture
+def session(application):
+    """Сессия в контексте приложения на время теста"""
+    from app import db
+    with application.app_context():
+        yield db.session
+        db.session.remove()
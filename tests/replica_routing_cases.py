@@ -0,0 +1,109 @@
+"""Сценарии маршрутизации чтения на реплику: две базы SQLite вместо основной и реплики.
+
+Запускаются из test_replica_routing отдельным процессом pytest, где
+TEST_DATABASE_URL и TEST_DATABASE_REPLICA_URL указывают на два файла.
+Реплика — копия файла основной базы без репликации, поэтому по содержимому
+ответа видно, из какой базы он прочитан.
+"""
+import os
+import shutil
+import time
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from app import Habit, app, db
+from database import REPLICA_BIND
+
+PASSWORD = 'password123'
+PRIMARY = make_url(os.environ['TEST_DATABASE_URL']).database
+REPLICA = make_url(os.environ['TEST_DATABASE_REPLICA_URL']).database
+
+
+@pytest.fixture(scope='module')
+def engines():
+    """Схема и пользователь с привычкой в основной базе, реплика — её копия"""
+    with app.app_context():
+        db.create_all()
+        client = app.test_client()
+        client.post('/register', data={'email': 'replica@example.com', 'password': PASSWORD, 'confirm': PASSWORD})
+        client.post('/login', data={'email': 'replica@example.com', 'password': PASSWORD})
+        client.post('/habit/create', data={'title': 'Бег', 'frequency': 'daily'})
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+        engines = {'primary': db.engines[None], 'replica': db.engines[REPLICA_BIND]}
+    shutil.copy(PRIMARY, REPLICA)
+    # Контекст приложения не держится открытым: у каждого запроса своя сессия
+    return engines
+
+
+@pytest.fixture
+def client(engines):
+    client = app.test_client()
+    client.post('/login', data={'email': 'replica@example.com', 'password': PASSWORD})
+    # Вход пишет в базу и включает чтение с основной; сбрасываем окно
+    with client.session_transaction() as session:
+        session.pop('db_primary_until', None)
+    return client
+
+
+@pytest.fixture
+def statements(engines):
+    """Число запросов к каждой базе за время теста"""
+    counts = {'primary': 0, 'replica': 0}
+    listeners = []
+    for name, engine in engines.items():
+        def count(*args, name=name):
+            counts[name] += 1
+        event.listen(engine, 'before_cursor_execute', count)
+        listeners.append((engine, count))
+    yield counts
+    for engine, count in listeners:
+        event.remove(engine, 'before_cursor_execute', count)
+
+
+def titles(client):
+    response = client.get('/api/habits')
+    assert response.status_code == 200
+    return [habit['title'] for habit in response.get_json()['habits']]
+
+
+def rename(client, title):
+    with app.app_context():
+        habit_id = db.session.query(Habit.id).scalar()
+    response = client.post(f'/habit/{habit_id}/update_meta', data={'title': title})
+    assert response.status_code == 302
+
+
+def primary_title():
+    with app.app_context():
+        return db.session.query(Habit.title).scalar()
+
+
+def test_read_view_uses_replica(client, statements):
+    assert titles(client) == ['Бег']
+    assert statements['replica'] > 0
+
+
+def test_writes_go_to_primary_and_reads_stick_to_it(client, statements):
+    rename(client, 'Бег утром')
+    assert primary_title() == 'Бег утром'
+    replica_before = statements['replica']
+    # Сразу после записи чтение идёт с основной базы: реплика не обновлялась
+    assert titles(client) == ['Бег утром']
+    assert statements['replica'] == replica_before
+
+    # Окно закончилось — снова реплика, на которой старое название
+    with client.session_transaction() as session:
+        assert session['db_primary_until'] > time.time()
+        session['db_primary_until'] = time.time() - 1
+    assert titles(client) == ['Бег']
+    assert statements['replica'] > replica_before
+
+
+def test_views_without_decorator_read_primary(client, statements):
+    response = client.get('/habit/create')
+    assert response.status_code == 200
+    assert statements['replica'] == 0
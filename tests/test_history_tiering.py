@@ -0,0 +1,81 @@
+"""После compact-history панель, переключения и API читают только горячую таблицу check_in"""
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+import periods
+from app import CheckInArchive, Habit, compact_history, db, fragment_cache, hot_history_start, set_checkin
+
+PASSWORD = 'password123'
+
+
+@pytest.fixture
+def client(application):
+    """Пользователь с ежедневной, недельной и месячной привычками и историей за три года в архиве"""
+    client = application.test_client()
+    client.post('/register', data={'email': 'tiering@example.com', 'password': PASSWORD, 'confirm': PASSWORD})
+    client.post('/login', data={'email': 'tiering@example.com', 'password': PASSWORD})
+    for frequency in periods.FREQUENCIES:
+        client.post('/habit/create', data={'title': frequency, 'frequency': frequency})
+
+    today = date.today()
+    with application.app_context():
+        for habit in Habit.query.all():
+            habit.created_at = datetime(today.year - 3, 1, 1)
+            for offset in range(1, 3 * 365, 3):
+                set_checkin(habit, today - timedelta(days=offset), True)
+        db.session.commit()
+        compact_history(hot_history_start())
+        assert CheckInArchive.query.count() > 0
+    return client
+
+
+@pytest.fixture
+def statements(application):
+    """Тексты SQL-запросов за время теста"""
+    executed = []
+
+    def record(connection, cursor, statement, *args):
+        executed.append(statement)
+
+    with application.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    yield executed
+    event.remove(engine, 'before_cursor_execute', record)
+
+
+def full_history_stats(application):
+    """Статистика привычек после пересчёта по обоим уровням истории"""
+    with application.app_context():
+        stats = {}
+        for habit in Habit.query.order_by(Habit.id):
+            habit.recalculate_stats()
+            stats[habit.id] = habit.stats()
+        db.session.rollback()
+        return stats
+
+
+def test_hot_paths_skip_archive(application, client, statements):
+    today = date.today().isoformat()
+    fragment_cache.clear()
+    assert client.get('/dashboard').status_code == 200
+    with application.app_context():
+        habit_ids = [habit_id for habit_id, in db.session.query(Habit.id).order_by(Habit.id)]
+    for habit_id in habit_ids:
+        assert client.post(f'/habit/{habit_id}/update', json={'date': today}).status_code == 200
+    response = client.post('/habits/checkins', json={'operations': [
+        {'habit_id': habit_id, 'date': today, 'status': True} for habit_id in habit_ids
+    ]})
+    assert response.status_code == 200
+    api = client.get('/api/habits')
+    assert api.status_code == 200
+
+    assert statements
+    assert not [statement for statement in statements if 'check_in_archive' in statement]
+
+    # Агрегаты учитывают и архивную часть истории
+    expected = full_history_stats(application)
+    for habit in api.get_json()['habits']:
+        assert {key: habit[key] for key in expected[habit['id']]} == expected[habit['id']]
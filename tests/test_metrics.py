@@ -0,0 +1,41 @@
+"""Доступ к /metrics: без настроек endpoint не регистрируется"""
+from flask import Flask
+
+from metrics import Metrics
+
+
+def client(**config):
+    app = Flask(__name__)
+    app.config.update(config)
+    Metrics(app)
+    return app.test_client()
+
+
+def test_metrics_not_registered_without_access_settings():
+    assert client().get('/metrics').status_code == 404
+
+
+def test_metrics_token():
+    metrics = client(METRICS_TOKEN='secret')
+    response = metrics.get('/metrics')
+    assert response.status_code == 401
+    assert response.headers['WWW-Authenticate'] == 'Bearer'
+    assert metrics.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    response = metrics.get('/metrics', headers={'Authorization': 'Bearer secret'})
+    assert response.status_code == 200
+    assert b'habitminder_requests_total' in response.data
+
+
+def test_metrics_allowed_ips():
+    metrics = client(METRICS_ALLOWED_IPS='10.0.0.0/8, 192.168.1.5')
+    assert metrics.get('/metrics', environ_base={'REMOTE_ADDR': '10.1.2.3'}).status_code == 200
+    assert metrics.get('/metrics', environ_base={'REMOTE_ADDR': '192.168.1.5'}).status_code == 200
+    assert metrics.get('/metrics', environ_base={'REMOTE_ADDR': '192.168.1.6'}).status_code == 403
+
+
+def test_metrics_token_and_ips_both_required():
+    metrics = client(METRICS_TOKEN='secret', METRICS_ALLOWED_IPS=['127.0.0.1'])
+    headers = {'Authorization': 'Bearer secret'}
+    assert metrics.get('/metrics', headers=headers, environ_base={'REMOTE_ADDR': '10.0.0.1'}).status_code == 403
+    assert metrics.get('/metrics', environ_base={'REMOTE_ADDR': '127.0.0.1'}).status_code == 401
+    assert metrics.get('/metrics', headers=headers, environ_base={'REMOTE_ADDR': '127.0.0.1'}).status_code == 200
@@ -0,0 +1,70 @@
+"""Хранимые агрегаты недельных и месячных привычек против пересчёта по истории"""
+import random
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import periods
+from app import Habit, User, set_checkin
+
+TODAY = date(2024, 3, 20)
+
+
+def create_habit(session, frequency, created):
+    user = User(email=f'{frequency}@example.com')
+    session.add(user)
+    session.flush()
+    habit = Habit(title='Тест', frequency=frequency, user_id=user.id,
+                  created_at=datetime.combine(created, datetime.min.time()))
+    session.add(habit)
+    session.commit()
+    return habit
+
+
+def expected(habit):
+    return periods.summarize(habit.load_history(), habit.period, habit.created_at.date(), TODAY)
+
+
+@pytest.mark.parametrize('frequency', periods.PERIODIC)
+def test_aggregates_follow_random_toggles(session, frequency):
+    created = date(2023, 1, 1)
+    habit = create_habit(session, frequency, created)
+    rng = random.Random(frequency)
+    span = (TODAY - created).days
+    # Отметки в основном в конце истории, чтобы чаще попадать в быстрые ветки
+    for _ in range(300):
+        day = TODAY - timedelta(days=min(int(rng.expovariate(1 / 40)), span))
+        set_checkin(habit, day, rng.random() < 0.7)
+        session.commit()
+        assert habit.period_summary(TODAY) == expected(habit), day
+
+
+def test_monthly_toggles_update_streaks(session):
+    habit = create_habit(session, 'monthly', date(2024, 1, 1))
+    set_checkin(habit, date(2024, 1, 10), True)
+    set_checkin(habit, date(2024, 2, 5), True)
+    set_checkin(habit, date(2024, 3, 1), True)
+    session.commit()
+    assert habit.period_summary(TODAY) == periods.PeriodStats(3, 3, 3, 3, True)
+
+    # Второй выполненный день месяца и его снятие не меняют периодов
+    set_checkin(habit, date(2024, 3, 2), True)
+    set_checkin(habit, date(2024, 3, 1), False)
+    session.commit()
+    assert habit.period_summary(TODAY) == periods.PeriodStats(3, 3, 3, 3, True)
+
+    # Снятие последнего дня месяца укорачивает и серию, и рекорд
+    set_checkin(habit, date(2024, 3, 2), False)
+    session.commit()
+    assert habit.period_summary(TODAY) == periods.PeriodStats(2, 3, 2, 2, False)
+    assert habit.period_summary(TODAY) == expected(habit)
+
+
+def test_recalculate_matches_incremental(session):
+    habit = create_habit(session, 'weekly', date(2023, 12, 1))
+    for day in (date(2023, 12, 25), date(2024, 1, 1), date(2024, 1, 3), date(2024, 1, 15), date(2024, 3, 18)):
+        set_checkin(habit, day, True)
+    session.commit()
+    stored = (habit.completed_periods, habit.last_period, habit.period_streak, habit.longest_period_streak)
+    habit.recalculate_stats()
+    assert (habit.completed_periods, habit.last_period, habit.period_streak, habit.longest_period_streak) == stored
@@ -0,0 +1,124 @@
+"""Периоды на границах: ISO-недели 52/53 → 1, конец месяца, 31.12 → 1.01, 29 февраля"""
+from datetime import date, timedelta
+
+import pytest
+
+from history import HabitHistory
+from periods import calendar_periods, period_bounds, period_index, summarize
+
+
+def history(*days):
+    return HabitHistory.from_days(days)
+
+
+@pytest.mark.parametrize('last, first', [
+    (date(2020, 12, 31), date(2021, 1, 4)),  # 2020 — год с 53-й неделей, она заканчивается 3 января
+    (date(2018, 12, 30), date(2018, 12, 31)),  # неделя 52 → неделя 1 следующего ISO-года
+    (date(2015, 12, 31), date(2016, 1, 4)),  # неделя 53 → 1
+])
+def test_weekly_index_crosses_iso_year(last, first):
+    assert period_index(first, 'weekly') == period_index(last, 'weekly') + 1
+    start, end = period_bounds(period_index(first, 'weekly'), 'weekly')
+    assert start == first and start.isocalendar()[1:] == (1, 1)
+    assert end == first + timedelta(days=6)
+
+
+def test_week_53_bounds_span_new_year():
+    index = period_index(date(2020, 12, 31), 'weekly')
+    assert period_bounds(index, 'weekly') == (date(2020, 12, 28), date(2021, 1, 3))
+    assert period_index(date(2021, 1, 3), 'weekly') == index
+    assert date(2020, 12, 28).isocalendar()[:2] == (2020, 53)
+
+
+def test_weekly_index_matches_iso_calendar():
+    day = date(2014, 12, 1)
+    while day < date(2027, 2, 1):
+        start, end = period_bounds(period_index(day, 'weekly'), 'weekly')
+        assert start.isocalendar()[:2] == day.isocalendar()[:2]
+        assert start.weekday() == 0 and start <= day <= end
+        day += timedelta(days=1)
+
+
+@pytest.mark.parametrize('last, first', [
+    (date(2021, 1, 31), date(2021, 2, 1)),
+    (date(2023, 2, 28), date(2023, 3, 1)),
+    (date(2024, 2, 29), date(2024, 3, 1)),
+    (date(2020, 12, 31), date(2021, 1, 1)),
+])
+def test_monthly_index_at_month_end(last, first):
+    assert period_index(first, 'monthly') == period_index(last, 'monthly') + 1
+    assert period_bounds(period_index(last, 'monthly'), 'monthly')[1] == last
+    assert period_bounds(period_index(first, 'monthly'), 'monthly')[0] == first
+
+
+def test_february_bounds_in_leap_and_common_years():
+    assert period_bounds(period_index(date(2024, 2, 10), 'monthly'), 'monthly') == (date(2024, 2, 1), date(2024, 2, 29))
+    assert period_bounds(period_index(date(2023, 2, 10), 'monthly'), 'monthly') == (date(2023, 2, 1), date(2023, 2, 28))
+    assert period_index(date(2024, 3, 1), 'daily') == period_index(date(2024, 2, 29), 'daily') + 1
+    assert period_bounds(period_index(date(2024, 2, 29), 'daily'), 'daily') == (date(2024, 2, 29), date(2024, 2, 29))
+
+
+def test_daily_index_crosses_new_year():
+    assert period_index(date(2021, 1, 1), 'daily') == period_index(date(2020, 12, 31), 'daily') + 1
+    assert period_index(date(2021, 1, 1), 'unknown') == period_index(date(2021, 1, 1), 'daily')
+
+
+def test_summarize_weekly_streak_across_week_53():
+    days = history(date(2020, 12, 22), date(2020, 12, 31), date(2021, 1, 5))
+    stats = summarize(days, 'weekly', date(2020, 12, 21), date(2021, 1, 6))
+    assert stats.completed_periods == 3
+    assert stats.total_periods == 3
+    assert stats.current_streak == stats.longest_streak == 3
+    assert stats.period_completed
+
+
+def test_summarize_streak_survives_unfinished_current_period():
+    days = history(date(2020, 12, 30), date(2021, 1, 4))
+    # Среда второй недели 2021 года ещё не отмечена — серия из двух недель сохраняется
+    stats = summarize(days, 'weekly', date(2020, 12, 28), date(2021, 1, 13))
+    assert stats.current_streak == 2
+    assert not stats.period_completed
+    assert stats.total_periods == 3
+
+
+def test_summarize_streak_breaks_after_missed_period():
+    days = history(date(2020, 12, 30))
+    stats = summarize(days, 'weekly', date(2020, 12, 28), date(2021, 1, 13))
+    assert stats.current_streak == 0
+    assert stats.longest_streak == 1
+
+
+def test_summarize_monthly_streak_across_new_year_and_february():
+    days = history(date(2023, 11, 30), date(2023, 12, 31), date(2024, 1, 1), date(2024, 2, 29))
+    stats = summarize(days, 'monthly', date(2023, 11, 1), date(2024, 3, 1))
+    assert stats.completed_periods == 4
+    assert stats.total_periods == 5
+    assert stats.current_streak == 4  # март только начался
+    assert not stats.period_completed
+
+
+def test_summarize_daily_streak_across_new_year():
+    days = history(date(2020, 12, 30), date(2020, 12, 31))
+    stats = summarize(days, 'daily', date(2020, 12, 30), date(2021, 1, 1))
+    assert stats.current_streak == 2  # 1 января ещё не закончилось
+    assert stats.total_periods == 3
+
+
+def test_calendar_periods_weekly_around_new_year():
+    today = date(2021, 1, 6)
+    current = period_index(today, 'weekly')
+    cells = calendar_periods(history(date(2020, 12, 31)), 'weekly', date(2020, 12, 21), today, current - 3, 5)
+    assert [cell.status for cell in cells] == ['inactive', 'missed', 'completed', 'current', 'future']
+    assert (cells[2].start, cells[2].end) == (date(2020, 12, 28), date(2021, 1, 3))
+    assert cells[3].start == date(2021, 1, 4)
+
+
+def test_calendar_periods_monthly_leap_february():
+    today = date(2024, 3, 1)
+    current = period_index(today, 'monthly')
+    cells = calendar_periods(history(date(2024, 2, 29)), 'monthly', date(2024, 1, 15), today, current - 2, 3)
+    assert [(cell.start, cell.end, cell.status) for cell in cells] == [
+        (date(2024, 1, 1), date(2024, 1, 31), 'missed'),
+        (date(2024, 2, 1), date(2024, 2, 29), 'completed'),
+        (date(2024, 3, 1), date(2024, 3, 31), 'current'),
+    ]
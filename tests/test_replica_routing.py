@@ -0,0 +1,26 @@
+"""Маршрутизация чтения на реплику.
+
+Приложение настраивается при импорте app, и в этом процессе app мог быть
+уже импортирован другими тестами с одной базой. Поэтому сценарии
+(replica_routing_cases.py) выполняются отдельным процессом pytest, где
+основная база и реплика — два файла SQLite.
+"""
+import os
+import subprocess
+import sys
+
+CASES = os.path.join(os.path.dirname(__file__), 'replica_routing_cases.py')
+
+
+def test_replica_routing(tmp_path):
+    env = {
+        **os.environ,
+        'TEST_DATABASE_URL': f"sqlite:///{tmp_path / 'primary.db'}",
+        'TEST_DATABASE_REPLICA_URL': f"sqlite:///{tmp_path / 'replica.db'}",
+    }
+    result = subprocess.run(
+        [sys.executable, '-m', 'pytest', '-q', '-p', 'no:cacheprovider', CASES],
+        cwd=os.path.dirname(os.path.dirname(CASES)), env=env, capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert ' passed' in result.stdout and 'skipped' not in result.stdout, result.stdout
@@ -0,0 +1,203 @@
+"""Кэш идентичности пользователей для Flask-Login.
+
+Хранит только словарь колонок пользователя (без хеша пароля), поэтому
+одинаково работает и в памяти процесса, и в общем для нескольких
+WSGI-воркеров хранилище на локальном диске.
+"""
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+class MemoryBackend:
+    """LRU-кэш в памяти процесса с ограничением размера и временем жизни"""
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._items[key]
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._items)}
+
+
+class SQLiteBackend:
+    """Общий для процессов одной машины кэш в файле SQLite.
+
+    Счётчики попаданий и промахов тоже хранятся в файле, поэтому
+    stats() показывает суммарные значения по всем воркерам.
+    """
+
+    def __init__(self, path=None, maxsize=1024, ttl=300):
+        self.path = path or os.path.join(tempfile.gettempdir(), 'habitminder-user-cache.sqlite')
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._local = threading.local()
+        with self._connect() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS users ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL, used REAL NOT NULL)'
+            )
+            connection.execute('CREATE INDEX IF NOT EXISTS users_used ON users (used)')
+            connection.execute('CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+            connection.execute("INSERT OR IGNORE INTO counters VALUES ('hits', 0), ('misses', 0)")
+
+    def _connect(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def _count(self, connection, name):
+        connection.execute('UPDATE counters SET value = value + 1 WHERE name = ?', (name,))
+
+    def get(self, key):
+        now = time.time()
+        connection = self._connect()
+        row = connection.execute('SELECT value, expires FROM users WHERE key = ?', (str(key),)).fetchone()
+        if row is None or row[1] < now:
+            self._count(connection, 'misses')
+            return None
+        connection.execute('UPDATE users SET used = ? WHERE key = ?', (now, str(key)))
+        self._count(connection, 'hits')
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        now = time.time()
+        connection = self._connect()
+        connection.execute(
+            'INSERT OR REPLACE INTO users VALUES (?, ?, ?, ?)',
+            (str(key), json.dumps(value), now + self.ttl, now)
+        )
+        connection.execute(
+            'DELETE FROM users WHERE key IN ('
+            'SELECT key FROM users ORDER BY used DESC LIMIT -1 OFFSET ?)',
+            (self.maxsize,)
+        )
+
+    def delete(self, key):
+        self._connect().execute('DELETE FROM users WHERE key = ?', (str(key),))
+
+    def clear(self):
+        connection = self._connect()
+        connection.execute('DELETE FROM users')
+        connection.execute('UPDATE counters SET value = 0')
+
+    def stats(self):
+        connection = self._connect()
+        stats = dict(connection.execute('SELECT name, value FROM counters'))
+        stats['size'] = connection.execute('SELECT COUNT(*) FROM users').fetchone()[0]
+        return stats
+
+
+class NullBackend:
+    """Кэш выключен: каждый запрос идёт в базу"""
+
+    def __init__(self, **kwargs):
+        self.misses = 0
+
+    def get(self, key):
+        self.misses += 1
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+    def stats(self):
+        return {'hits': 0, 'misses': self.misses, 'size': 0}
+
+
+BACKENDS = {
+    'memory': MemoryBackend,
+    'sqlite': SQLiteBackend,
+    'none': NullBackend,
+}
+
+
+class UserCache:
+    """Расширение Flask: кэш для login_manager.user_loader с выбираемым бэкендом.
+
+    Настройки: USER_CACHE_BACKEND (memory, sqlite, none), USER_CACHE_SIZE,
+    USER_CACHE_TTL (секунды), USER_CACHE_PATH (файл для sqlite).
+    """
+
+    def __init__(self, app=None):
+        self.backend = NullBackend()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('USER_CACHE_BACKEND', 'memory')
+        app.config.setdefault('USER_CACHE_SIZE', 1024)
+        app.config.setdefault('USER_CACHE_TTL', 300)
+        app.config.setdefault('USER_CACHE_PATH', None)
+        name = app.config['USER_CACHE_BACKEND']
+        if name not in BACKENDS:
+            raise ValueError(f"Неизвестный бэкенд кэша пользователей: {name}")
+        kwargs = {
+            'maxsize': int(app.config['USER_CACHE_SIZE']),
+            'ttl': float(app.config['USER_CACHE_TTL']),
+        }
+        if name == 'sqlite':
+            kwargs['path'] = app.config['USER_CACHE_PATH']
+        self.backend = BACKENDS[name](**kwargs)
+        app.extensions['user_cache'] = self
+
+    def get(self, user_id):
+        return self.backend.get(int(user_id))
+
+    def set(self, user_id, values):
+        self.backend.set(int(user_id), values)
+
+    def invalidate(self, user_id):
+        self.backend.delete(int(user_id))
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        return self.backend.stats()
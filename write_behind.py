@@ -0,0 +1,180 @@
+"""Отложенная запись переключений отметок (write-behind).
+
+Переключение применяется к состоянию в памяти процесса и сразу получает
+ответ; в базу изменения пишутся фоновым потоком пачками — по таймеру
+WRITE_BEHIND_INTERVAL_MS или при накоплении WRITE_BEHIND_MAX_PENDING
+изменений. Для каждой пары (привычка, день) хранится значение в базе на
+момент первого переключения и итоговое значение, поэтому серия кликов
+схлопывается в одну запись, а чётное число переключений не пишется вовсе.
+
+Гарантии:
+- подтверждённое переключение попадает в базу не позже чем через интервал
+  сброса; при штатной остановке процесса очередь сбрасывается (atexit),
+  при аварийном завершении теряются изменения последнего интервала;
+- ответ на переключение учитывает все изменения, ожидающие в этом процессе;
+  страницы и API читают базу и видят изменения после сброса;
+- записываются абсолютные значения: если одну отметку одновременно
+  переключают через разные процессы, побеждает последний сброс;
+- при ошибке записи изменения возвращаются в очередь, если их не
+  перекрыли более новые переключения.
+"""
+import atexit
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class Pending:
+    """Ожидающее изменение одной отметки: base — значение в базе (None — строки нет)"""
+
+    __slots__ = ('base', 'value', 'user_id')
+
+    def __init__(self, base, value, user_id):
+        self.base = base
+        self.value = value
+        self.user_id = user_id
+
+
+class WriteBehind:
+    """Расширение Flask: WRITE_BEHIND_ENABLED, WRITE_BEHIND_INTERVAL_MS, WRITE_BEHIND_MAX_PENDING.
+
+    Запись выполняет функция, переданная в register_writer: она получает
+    {(habit_id, day): Pending} и должна применить изменения одной транзакцией.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.interval = 0.25
+        self.max_pending = 1000
+        self._app = None
+        self._writer = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pending = {}
+        self._inflight = {}
+        self._thread = None
+        self._pid = None
+        self.counters = {'toggles': 0, 'dropped': 0, 'written': 0, 'flushes': 0, 'failures': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('WRITE_BEHIND_ENABLED', False)
+        app.config.setdefault('WRITE_BEHIND_INTERVAL_MS', 250)
+        app.config.setdefault('WRITE_BEHIND_MAX_PENDING', 1000)
+        self.enabled = bool(app.config['WRITE_BEHIND_ENABLED'])
+        self.interval = float(app.config['WRITE_BEHIND_INTERVAL_MS']) / 1000
+        self.max_pending = int(app.config['WRITE_BEHIND_MAX_PENDING'])
+        self._app = app
+        app.extensions['write_behind'] = self
+        if self.enabled:
+            atexit.register(self.flush)
+
+    def register_writer(self, writer):
+        self._writer = writer
+
+    # Очередь
+
+    def get(self, key):
+        """Ожидающее значение отметки или None, если изменений нет"""
+        with self._lock:
+            pending = self._pending.get(key) or self._inflight.get(key)
+            return None if pending is None else pending.value
+
+    def apply(self, key, user_id, read_base, status=None):
+        """Переключает (status=None) или устанавливает отметку; возвращает (base, новое значение).
+
+        read_base() читает текущее значение из базы; вызывается без блокировки
+        и только если отметки нет ни в очереди, ни в записываемой пачке.
+        """
+        while True:
+            with self._lock:
+                known = key in self._pending or key in self._inflight
+            base = None if known else read_base()
+            with self._lock:
+                pending = self._pending.get(key)
+                if pending is None:
+                    inflight = self._inflight.get(key)
+                    if inflight is not None:
+                        # Пачка ещё пишется: её значение станет значением в базе
+                        base = inflight.value
+                    elif known:
+                        continue  # пачку успели записать — перечитываем базу
+                    pending = Pending(base, base, user_id)
+                value = (not pending.value) if status is None else status
+                pending.value = value
+                self.counters['toggles'] += 1
+                if value == bool(pending.base):
+                    # Изменения взаимно погасились (отсутствие строки равно невыполненному дню)
+                    self._pending.pop(key, None)
+                    self.counters['dropped'] += 1
+                else:
+                    self._pending[key] = pending
+                size = len(self._pending)
+                base = pending.base
+            break
+        self._ensure_thread()
+        if size >= self.max_pending:
+            self._wakeup.set()
+        return base, value
+
+    # Сброс
+
+    def flush(self):
+        """Записывает накопленные изменения; возвращает их количество"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch, self._pending = self._pending, {}
+                self._inflight = batch
+            try:
+                with self._app.app_context():
+                    self._writer(batch)
+            except Exception:
+                logger.exception("Ошибка записи %s отложенных отметок", len(batch))
+                with self._lock:
+                    for key, pending in batch.items():
+                        newer = self._pending.get(key)
+                        if newer is None:
+                            self._pending[key] = pending
+                        elif newer.value == bool(pending.base):
+                            del self._pending[key]
+                        else:
+                            # Новые переключения поверх незаписанной пачки считаются от её исходного значения
+                            newer.base = pending.base
+                    self._inflight = {}
+                    self.counters['failures'] += 1
+                raise
+            with self._lock:
+                self._inflight = {}
+                self.counters['written'] += len(batch)
+                self.counters['flushes'] += 1
+            return len(batch)
+
+    def _ensure_thread(self):
+        # После fork поток родителя в дочернем процессе не работает — запускаем свой
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                pass  # уже записано в журнал, изменения вернулись в очередь
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, pending=len(self._pending))